@@ -0,0 +1,146 @@
+import time
+
+from SAYAC_ISA import AssemblySyntaxError, lexLines, parseInstructionTokens
+from SAYAC_Labels import resolveLabels
+from SAYAC_Preprocessor import preprocess
+
+# In-process API of the assembler and the simulator: nothing is read from or written to files, nothing is printed and
+# every error is raised as a SayacError. Only SAYAC_ISA (the instruction tables) is loaded on import, the image
+# formats and the simulator are imported by the first call that needs them.
+
+
+class SayacError(Exception):
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+
+class AssemblyError(SayacError):
+    # line: source line of the error, None if it is not about one line (e.g. an unclosed comment)
+    def __init__(self, message: str, line: int = None):
+        super().__init__(message)
+        self.line = line
+
+
+class DecodeError(SayacError):
+    # address and value of the word that is not an instruction
+    def __init__(self, message: str, address: int = None, word: int = None):
+        super().__init__(message)
+        self.address = address
+        self.word = word
+
+
+class SimulationError(SayacError):
+    # pc of the failing instruction and the machine state at that point
+    def __init__(self, message: str, pc: int = None, state: dict = None):
+        super().__init__(message)
+        self.pc = pc
+        self.state = state
+
+
+class StepLimitError(SimulationError):
+    pass
+
+
+class TimeLimitError(SimulationError):
+    pass
+
+
+TIME_CHECK_STEPS = 4096  # instructions between two checks of the time limit
+
+
+def parseSource(source, directory: str = None):
+    # source text (or its lines) --> [(line, spec, operands)]
+    # .include is only allowed with a directory: the included files are relative to it and have to be inside it
+    if isinstance(source, str):
+        source = source.splitlines()
+    statements = []
+    try:
+        for line, tokens in resolveLabels(preprocess(lexLines(source), directory, root=directory)):
+            try:
+                spec, operands = parseInstructionTokens(tokens, line)
+            except KeyError as e:
+                raise AssemblyError(f"Instruction {e} not supported yet", line) from None
+            except AssemblySyntaxError as e:
+                raise AssemblyError(e.message, line) from None
+            statements.append((line, spec, operands))
+    except AssemblySyntaxError as e:
+        raise AssemblyError(e.message, e.line) from None
+    return statements
+
+
+def assemble(source, imageFormat: str = None, directory: str = None):
+    # SAYAC Assembly source --> [word], or the bytes of an image when imageFormat is given (see SAYAC_Image)
+    words = [spec.encode(operands) for line, spec, operands in parseSource(source, directory)]
+    if imageFormat is None:
+        return words
+    from SAYAC_Image import IMAGE_FORMATS, formatImage
+    if imageFormat not in IMAGE_FORMATS:
+        raise ValueError(f"invalid image format '{imageFormat}' (use {', '.join(IMAGE_FORMATS)})")
+    return formatImage(words, imageFormat)
+
+
+def decodeWords(words, imageFormat: str = None):
+    # [word] or the bytes of an image --> [(spec, operands)], every distinct word is decoded once
+    from SAYAC_Image import IMAGE_AUTO, InvalidWordError, parseImage, decodeImage
+    try:
+        if isinstance(words, (bytes, bytearray)):
+            words = parseImage(bytes(words), imageFormat or IMAGE_AUTO)
+        return decodeImage(words)
+    except InvalidWordError as e:
+        raise DecodeError(e.message, e.address, e.word) from None
+    except AssemblySyntaxError as e:
+        raise DecodeError(e.message) from None
+
+
+def disassemble(words, imageFormat: str = None):
+    # [word] or the bytes of an image --> [instruction text]
+    return [spec.formatInstruction(operands) for spec, operands in decodeWords(words, imageFormat)]
+
+
+def runLimited(sayac, program: list, maxSteps: int = None, timeLimit: float = None):
+    # runProgram() that stops after maxSteps instructions or timeLimit seconds
+    programLength = len(program)
+    deadline = time.perf_counter() + timeLimit if timeLimit is not None else None
+    steps = 0
+    while 0 <= sayac.PC < programLength:
+        if maxSteps is not None and steps >= maxSteps:
+            raise StepLimitError(f"Step limit of {maxSteps} reached", sayac.PC, sayac.state())
+        if deadline is not None and time.perf_counter() > deadline:
+            raise TimeLimitError(f"Time limit of {timeLimit} s reached", sayac.PC, sayac.state())
+        limit = steps + TIME_CHECK_STEPS
+        if maxSteps is not None:
+            limit = min(limit, maxSteps)
+        while steps < limit and 0 <= sayac.PC < programLength:
+            program[sayac.PC]()
+            sayac.PC += 1
+            steps += 1
+
+
+def simulate(program, initialState: dict = None, maxSteps: int = None, timeLimit: float = None,
+             imageFormat: str = None, directory: str = None):
+    # program: SAYAC Assembly source, [word] or the bytes of an image
+    # initialState: the .sayac.json layout, every key optional --> final state in the .sayac.json layout
+    from SAYAC_Assembler import Sayac, bindProgram, runProgram
+    if isinstance(program, str):
+        decoded = [(spec.execute, operands) for line, spec, operands in parseSource(program, directory)]
+    else:
+        decoded = [(spec.execute, operands) for spec, operands in decodeWords(program, imageFormat)]
+    sayac = Sayac()
+    if initialState is not None:
+        try:
+            sayac.loadState(initialState)
+        except (KeyError, ValueError, TypeError, IndexError) as e:
+            raise SimulationError(f"Invalid initial state --> [{e}]") from None
+    boundProgram = bindProgram(decoded, sayac)
+    try:
+        if maxSteps is None and timeLimit is None:
+            runProgram(sayac, boundProgram)
+        else:
+            runLimited(sayac, boundProgram, maxSteps, timeLimit)
+    except SayacError:
+        raise
+    except Exception as e:
+        # the state keeps the PC of the failing instruction, as the state file does
+        raise SimulationError(f"{type(e).__name__}: {e}", sayac.PC, sayac.state()) from None
+    return sayac.state(sayac.PC - 1)
@@ -1,180 +1,241 @@
 import sys
 import os
 import json
-import re
+import array
+import functools
+
+from SAYAC_ISA import AssemblySyntaxError, lexLines, baseNumberToInt, parseInstructionFields, parseInstructionTokens
+from SAYAC_ISA import FIB_FLAGS, FLAG_BIT_GT, FLAG_BIT_GT_EQ, FLAG_BIT_EQ, FLAG_BIT_NEQ, FLAG_BIT_LT, FLAG_BIT_LT_EQ
+from SAYAC_ISA import FLAGS_EQUAL, FLAGS_GREATER, FLAGS_LESS, FLAG_NAMES, WORD_MASK
+from SAYAC_Image import IMAGE_AUTO, IMAGE_FORMATS, IMAGE_EXTENSIONS, loadImage, decodeImage
+from SAYAC_Labels import resolveLabels
+from SAYAC_Preprocessor import preprocess
+from SAYAC_JIT import BlockJIT
+from SAYAC_Profiler import Profiler
+from SAYAC_Timing import TimingModel, loadTimingModel
+from SAYAC_Trace import TraceWriter
+from SAYAC_Debugger import Debugger
+from SAYAC_Checkpoint import CHECKPOINT_INTERVAL, CHECKPOINT_RING_SIZE, Checkpoints
+from SAYAC_Peripherals import IOBus, parseDevice
 
 # constants
 VERSION = "v1.0.0-alpha03"
 
-INS_LdR = "ldr"  # load from memory
-INS_LdRio = "ldrio"  # load from I/O peripheral
-INS_STR = "str"  # Store to memory
-INS_STRio = "strio"  # Store to I/O peripheral
-INS_JMR = "jmr"  # Jump to address
-INS_JMRs = "jmrs"  # Jump to address & save PC
-INS_JMI = "jmi"  # Jump to immediate address
-INS_ANR = "anr"  # Logical AND operation
-INS_AND = "and"  # Logical AND operation # TODO: remove this line (instruction is not in the ISR)
-INS_ANI = "ani"  # Logical AND operation with immediate value
-INS_MSI = "msi"  # Move low sign extended immediate to register
-INS_MHI = "mhi"  # Move high immediate to register
-INS_SLR = "slr"  # Logical Left/Right shift
-INS_SAR = "sar"  # Arithmetic Left/Right shift
-INS_ADD = "add"  # Adding two registers
-INS_ADR = "adr"  # Adding two registers
-INS_SUB = "sub"  # Subtracting two registers
-INS_SUR = "sur"  # Subtracting two registers
-INS_ADI = "adi"  # Adding Immediate to register
-INS_SUI = "sui"  # Subtracting Immediate from register
-INS_MUL = "mul"  # Multiplying two registers
-INS_DIV = "div"  # Dividing two registers
-INS_CMR = "cmr"  # Comparing two registers
-INS_CMI = "cmi"  # Comparing register and Immediate value
-INS_BRC = "brc"  # Branch Registered with Condition
-INS_BRR = "brr"  # Branch Registered Relative with Condition
-INS_SHI = "shi"  # Arithmetic Logical shift with immediate
-INS_SHIla = "shila"  # Arithmetic Logical shift with immediate
-INS_NTR = "ntr"  # Logical NOT
-INS_NTR2c = "ntr2c"  # Logical NOT 2's complement
-INS_NTD = "ntd"  # Logical NOT
-INS_NTD2c = "ntd2c"  # Logical NOT 2's complement
-
-INS_REQUIRED_ARGS_COUNT = {
-    INS_LdR: 2,
-    INS_LdRio: 2,
-    INS_STR: 2,
-    INS_STRio: 2,
-    INS_JMR: 2,
-    INS_JMRs: 2,
-    INS_JMI: 2,
-    INS_ANR: 3,
-    INS_AND: 3,
-    INS_ANI: 2,
-    INS_MSI: 2,
-    INS_MHI: 2,
-    INS_SLR: 3,
-    INS_SAR: 3,
-    INS_ADD: 3,
-    INS_ADR: 3,
-    INS_SUB: 3,
-    INS_SUR: 3,
-    INS_ADI: 2,
-    INS_SUI: 2,
-    INS_MUL: 3,
-    INS_DIV: 3,
-    INS_CMR: 2,
-    INS_CMI: 2,
-    INS_BRC: 2,
-    INS_BRR: 2,
-    INS_SHI: 2,
-    INS_SHIla: 2,
-    INS_NTR: 2,
-    INS_NTR2c: 2,
-    INS_NTD: 1,
-    INS_NTD2c: 1,
-}
-
-
-def commentRemover(lines: list):
-    text = ""
-    for line in lines:
-        text += line + ";"
-
-    def replacer(match):
-        s = match.group(0)
-        if s.startswith('/'):
-            return " "  # note: a space and not an empty string
-        else:
-            return s
 
-    pattern = re.compile(
-        r'//.*?$|/\*.*?\*/|\'(?:\\.|[^\\\'])*\'|"(?:\\.|[^\\"])*"',
-        re.DOTALL | re.MULTILINE
-    )
-    newText = re.sub(pattern, replacer, text)
-    newList = newText.split(";")
-    newList = [line.strip() for line in newList if line.strip() != ""]
-    return newList
+MEMORY_SIZE = 1 << 16  # 16-bit address space
+INITIAL_WORDS = array.array("H", range(0, MEMORY_SIZE))  # copied by every new memory
+
+
+class WordMemory:
+    # flat 64K x 16-bit memory, untouched cells read back their own address
+    def __init__(self):
+        self.words = INITIAL_WORDS[:]
+        self.dirty = bytearray(MEMORY_SIZE)
+        self.dirtyAddresses = []  # in the order of their first write
+
+    def read(self, address: int):
+        return self.words[address]
+
+    def write(self, address: int, value: int):
+        self.words[address] = value
+        if not self.dirty[address]:
+            self.dirty[address] = 1
+            self.dirtyAddresses.append(address)
+
+    def changed(self):
+        words = self.words
+        return {address: words[address] for address in self.dirtyAddresses}
 
 
 class Sayac:
     def __init__(self):
-        self.registers: list = [i for i in range(0, 16)]
-        self.memory = {}
-        self.memoryIO = {}
-        # Flags
-        self.FLAG_GT: bool = False
-        self.FLAG_GT_EQ: bool = False
-        self.FLAG_EQ: bool = False
-        self.FLAG_NEQ: bool = True
-        self.FLAG_LT: bool = False
-        self.FLAG_LT_EQ: bool = False
+        self.registers = array.array("H", range(0, 16))
+        self.memory = WordMemory()
+        self.memoryIO = WordMemory()
+        # FLAG_BIT_* of the last compare
+        self.flagBits: int = FLAG_BIT_NEQ
         self.PC: int = 0
+        # (fromIO, address, value) of every memory write, only recorded when set to a list
+        self.writeLog = None
+
+    # Flags
+    @property
+    def FLAG_GT(self):
+        return self.flagBits & FLAG_BIT_GT != 0
+
+    @property
+    def FLAG_GT_EQ(self):
+        return self.flagBits & FLAG_BIT_GT_EQ != 0
+
+    @property
+    def FLAG_EQ(self):
+        return self.flagBits & FLAG_BIT_EQ != 0
+
+    @property
+    def FLAG_NEQ(self):
+        return self.flagBits & FLAG_BIT_NEQ != 0
+
+    @property
+    def FLAG_LT(self):
+        return self.flagBits & FLAG_BIT_LT != 0
+
+    @property
+    def FLAG_LT_EQ(self):
+        return self.flagBits & FLAG_BIT_LT_EQ != 0
+
+    def flags(self):
+        return {
+            "gt": self.FLAG_GT,
+            "gt_eq": self.FLAG_GT_EQ,
+            "eq": self.FLAG_EQ,
+            "neq": self.FLAG_NEQ,
+            "lt": self.FLAG_LT,
+            "lt_eq": self.FLAG_LT_EQ,
+        }
 
-    def createAssemblerOutJsonFile(self, name: str):
-        f = open(f"{name}.sayac.json", "w")
-        content = {
-            "PC": self.PC,
-            "registers": self.registers,
-            "memory": self.memory,
-            "memoryIO": self.memoryIO,
-            "flags": {
-                "gt": self.FLAG_GT,
-                "gt_eq": self.FLAG_GT_EQ,
-                "eq": self.FLAG_EQ,
-                "neq": self.FLAG_NEQ,
-                "lt": self.FLAG_LT,
-                "lt_eq": self.FLAG_LT_EQ,
-            }
+    def state(self, pc: int = None):
+        # the content of the state file
+        return {
+            "PC": self.PC if pc is None else pc,
+            "registers": self.registers.tolist(),
+            "memory": self.memory.changed(),
+            "memoryIO": self.memoryIO.changed(),
+            "flags": self.flags()
         }
-        f.write(json.dumps(content))
+
+    def loadState(self, state: dict):
+        # state: the .sayac.json layout, every key optional (see SAYAC_Batch.BatchSayac.loadState)
+        registers = state.get("registers", {})
+        if isinstance(registers, list):
+            registers = dict(enumerate(registers))
+        for register, value in registers.items():
+            self.registers[int(register)] = baseNumberToInt(str(value)) & WORD_MASK
+        for key, memory in (("memory", self.memory), ("memoryIO", self.memoryIO)):
+            for address, value in state.get(key, {}).items():
+                # loaded cells count as changed, so saving the state again keeps them
+                memory.write(baseNumberToInt(str(address)), baseNumberToInt(str(value)) & WORD_MASK)
+        if "flags" in state:
+            flagBits = 0
+            for flag, value in state["flags"].items():
+                if value:
+                    flagBits |= FLAG_NAMES[flag]
+            self.flagBits = flagBits
+        self.PC = state.get("PC", 0)
+
+    def createAssemblerOutJsonFile(self, name: str, pc: int = None):
+        f = open(f"{name}.sayac.json", "w")
+        f.write(json.dumps(self.state(pc)))
         f.close()
 
     def FIBtoFlag(self, fib5bit: str):
         if len(fib5bit) != 5:
             raise Exception("FIB must be 5 bit")
-        fib = fib5bit[2:]
-        if fib == "000":
-            return self.FLAG_EQ
-        elif fib == "001":
-            return self.FLAG_LT
-        elif fib == "010":
-            return self.FLAG_GT
-        elif fib == "011":
-            return self.FLAG_GT_EQ
-        elif fib == "100":
-            return self.FLAG_LT_EQ
-        elif fib == "101":
-            return self.FLAG_NEQ
-        else:
+        fib = int(fib5bit[2:], 2)
+        if fib not in FIB_FLAGS:
             raise Exception("Invalid FIB")
+        return self.flagBits & FIB_FLAGS[fib] != 0
 
     def readMemory(self, address: int, fromIO: bool = False):
-        memory = self.memoryIO if fromIO else self.memory
-        if address in memory:
-            return memory[address]
-        return address
+        return (self.memoryIO if fromIO else self.memory).words[address]
 
     def writeMemory(self, address: int, value: int, fromIO: bool = False):
-        memory = self.memoryIO if fromIO else self.memory
-        memory[address] = value
+        (self.memoryIO if fromIO else self.memory).write(address, value)
+        if self.writeLog is not None:
+            self.writeLog.append((fromIO, address, value))
 
     def setFlags(self, val1: int, val2: int):
-        self.FLAG_GT = False
-        self.FLAG_GT_EQ = False
-        self.FLAG_EQ = False
-        self.FLAG_NEQ = True
-        self.FLAG_LT = False
-        self.FLAG_LT_EQ = False
         if val1 == val2:
-            self.FLAG_EQ = True
-            self.FLAG_NEQ = False
-            self.FLAG_LT_EQ = True
-            self.FLAG_GT_EQ = True
-        if val1 > val2:
-            self.FLAG_GT = True
-        if val1 < val2:
-            self.FLAG_LT = True
+            self.flagBits = FLAGS_EQUAL
+        elif val1 > val2:
+            self.flagBits = FLAGS_GREATER
+        else:
+            self.flagBits = FLAGS_LESS
+
+
+SNAPSHOT_END = "end"  # write the state file once, when the program finishes
+SNAPSHOT_EVERY = "every"  # write the state file every N executed instructions
+SNAPSHOT_ON_HALT = "on-halt"  # write the state file whenever execution stops (each step in line-by-line mode)
+SNAPSHOT_ON_CHANGE = "on-change"  # write the state file after instructions that changed registers, memory or flags
+
+
+def parseSnapshotMode(mode: str):
+    # "end" | "every:N" | "on-halt" | "on-change" --> (mode, interval)
+    if mode in (SNAPSHOT_END, SNAPSHOT_ON_HALT, SNAPSHOT_ON_CHANGE):
+        return mode, 0
+    if mode.startswith(SNAPSHOT_EVERY + ":"):
+        interval = baseNumberToInt(mode.split(":", 1)[1])
+        if interval > 0:
+            return SNAPSHOT_EVERY, interval
+    raise ValueError(f"invalid snapshot mode '{mode}' (use end, every:N, on-halt or on-change)")
+
+
+class StateRecorder:
+    def __init__(self, sayac: Sayac, name: str, mode: str = SNAPSHOT_END, deltaLogFileName: str = None):
+        self.sayac = sayac
+        self.name = name
+        self.mode, self.interval = parseSnapshotMode(mode)
+        self.steps = 0
+        self.deltaLog = open(deltaLogFileName, "w") if deltaLogFileName is not None else None
+        # the end mode without a delta log never needs to look at single steps
+        self.perStep = self.mode in (SNAPSHOT_EVERY, SNAPSHOT_ON_CHANGE) or self.deltaLog is not None
+        self.lastRegisters = list(sayac.registers)
+        self.lastFlags = sayac.flags()
+        self.lastFlagBits = sayac.flagBits
+        if self.mode == SNAPSHOT_ON_CHANGE or self.deltaLog is not None:
+            sayac.writeLog = []
+
+    def step(self, pc: int):
+        # called after the instruction at pc has been executed
+        sayac = self.sayac
+        self.steps += 1
+        changed = False
+        if self.deltaLog is not None or self.mode == SNAPSHOT_ON_CHANGE:
+            changed = self.logDelta(pc)
+        if self.mode == SNAPSHOT_EVERY:
+            if self.steps % self.interval == 0:
+                sayac.createAssemblerOutJsonFile(self.name)
+        elif self.mode == SNAPSHOT_ON_CHANGE and changed:
+            sayac.createAssemblerOutJsonFile(self.name)
+
+    def logDelta(self, pc: int):
+        sayac = self.sayac
+        registers = {i: value for i, value in enumerate(sayac.registers) if value != self.lastRegisters[i]}
+        flags = {}
+        if sayac.flagBits != self.lastFlagBits:
+            flags = {flag: value for flag, value in sayac.flags().items() if value != self.lastFlags[flag]}
+            self.lastFlagBits = sayac.flagBits
+        writes = sayac.writeLog
+        if not (registers or flags or writes):
+            if self.deltaLog is not None:
+                self.deltaLog.write(json.dumps({"step": self.steps, "PC": pc}) + "\n")
+            return False
+        self.lastRegisters = list(sayac.registers)
+        self.lastFlags.update(flags)
+        if self.deltaLog is not None:
+            delta = {"step": self.steps, "PC": pc}
+            if registers:
+                delta["registers"] = registers
+            memory = {address: value for fromIO, address, value in writes if not fromIO}
+            if memory:
+                delta["memory"] = memory
+            memoryIO = {address: value for fromIO, address, value in writes if fromIO}
+            if memoryIO:
+                delta["memoryIO"] = memoryIO
+            if flags:
+                delta["flags"] = flags
+            self.deltaLog.write(json.dumps(delta) + "\n")
+        sayac.writeLog = []
+        return True
+
+    def halt(self):
+        # called whenever execution stops and the user can inspect the machine
+        if self.mode == SNAPSHOT_ON_HALT:
+            self.sayac.createAssemblerOutJsonFile(self.name)
+
+    def finish(self, pc: int):
+        self.sayac.createAssemblerOutJsonFile(self.name, pc)
+        if self.deltaLog is not None:
+            self.deltaLog.close()
 
 
 def main():
@@ -188,10 +249,96 @@ def main():
     # get file name from terminal
     insFileName = sys.argv[1]
     lineByLine = False
-    if len(sys.argv) > 2:
-        if sys.argv[2] == "--line":
+    snapshotMode = SNAPSHOT_END
+    deltaLogFileName = None
+    jit = False
+    profile = False
+    debug = False
+    checkpointInterval = CHECKPOINT_INTERVAL
+    checkpointRingSize = CHECKPOINT_RING_SIZE
+    bus = None
+    devices = []
+    timed = False
+    timingFileName = None
+    timing = None
+    traceFileName = None
+    trace = None
+    # .bin (.hex, .memh, .memb) files are assembled images, everything else is SAYAC assembly source
+    imageFormat = IMAGE_AUTO if insFileName.endswith(tuple(IMAGE_EXTENSIONS.values())) else None
+    for arg in sys.argv[2:]:
+        if arg == "--line":
             lineByLine = True
-    assemble(insFileName, lineByLine)
+        elif arg == "--jit":
+            jit = True
+        elif arg == "--profile":
+            profile = True
+        elif arg == "--debug":
+            debug = True
+        elif arg == "--timing" or arg.startswith("--timing="):
+            timed = True
+            timingFileName = arg.split("=", 1)[1] if "=" in arg else None
+        elif arg == "--trace" or arg.startswith("--trace="):
+            traceFileName = arg.split("=", 1)[1] if "=" in arg else insFileName.rsplit(".", 1)[0] + ".trace"
+        elif arg.startswith("--device="):
+            try:
+                devices.append(parseDevice(arg.split("=", 1)[1]))
+            except (ValueError, OSError) as e:
+                print(f"Error: {e}")
+                exit(1)
+        elif arg.startswith("--checkpoint-every=") or arg.startswith("--checkpoint-ring="):
+            try:
+                value = baseNumberToInt(arg.split("=", 1)[1])
+            except ValueError:
+                value = 0
+            if value < 1:
+                print(f"Error: Invalid number --> [{arg}]")
+                exit(1)
+            if arg.startswith("--checkpoint-every="):
+                checkpointInterval = value
+            else:
+                checkpointRingSize = value
+        elif arg == "--image":
+            imageFormat = IMAGE_AUTO
+        elif arg.startswith("--image="):
+            imageFormat = arg.split("=", 1)[1]
+            if imageFormat not in (IMAGE_AUTO,) + IMAGE_FORMATS:
+                print(f"Error: Invalid image format --> [{imageFormat}]")
+                exit(1)
+        elif arg.startswith("--snapshot="):
+            snapshotMode = arg.split("=", 1)[1]
+        elif arg.startswith("--delta-log="):
+            deltaLogFileName = arg.split("=", 1)[1]
+        else:
+            print(f"Error: Invalid argument --> [{arg}]")
+            exit(1)
+    if debug:
+        # the debugger runs the program itself: it does not count cycles, going back would not undo what the devices
+        # did, and the step loop that profiles, times, traces and records the states never runs
+        others = [option for option, active in (("--line", lineByLine), ("--profile", profile), ("--timing", timed),
+                                                ("--trace", traceFileName is not None), ("--device", devices),
+                                                (f"--snapshot={snapshotMode}", snapshotMode != SNAPSHOT_END),
+                                                ("--delta-log", deltaLogFileName is not None))
+                  if active]
+        if others:
+            print(f"Error: {', '.join(others)} can not be used with --debug")
+            exit(1)
+    try:
+        parseSnapshotMode(snapshotMode)
+        if devices:
+            # LDRio/STRio on the device addresses go to the peripherals
+            bus = IOBus(devices)
+        if timed:
+            timing = loadTimingModel(timingFileName)
+        if traceFileName is not None:
+            trace = TraceWriter(traceFileName)
+    except FileNotFoundError:
+        print(f"Error: File not found --> ['{timingFileName}' does not exists]")
+        exit(1)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+    assemble(insFileName, lineByLine, snapshotMode, deltaLogFileName, imageFormat, jit, profile, debug,
+             checkpointInterval, checkpointRingSize, bus, timing, trace)
 
 
 def extractInt(cmd: str, excludeLetter: str):
@@ -202,7 +349,7 @@ def extractInt(cmd: str, excludeLetter: str):
 def exeRegisterCommand(sayac: Sayac, cmd: str):
     try:
         if cmd == "r":
-            print(sayac.registers)
+            print(sayac.registers.tolist())
         else:
             print(f"{cmd} = {sayac.registers[extractInt(cmd, 'r')]}")
     except ValueError:
@@ -212,7 +359,7 @@ def exeRegisterCommand(sayac: Sayac, cmd: str):
 def exeMemoryCommand(sayac: Sayac, cmd: str):
     try:
         if cmd == "m":
-            print(sayac.memory)
+            print(sayac.memory.changed())
         else:
             print(f"{cmd} = {sayac.readMemory(extractInt(cmd, 'm'))}")
     except ValueError:
@@ -228,307 +375,200 @@ def exeFlagCommand(sayac: Sayac):
     print(f"LT_EQ: {sayac.FLAG_LT_EQ}")
 
 
+def exeCommand(sayac: Sayac, cmd: str):
+    # runs one inspection command, False if cmd is not one
+    if cmd.startswith("r"):
+        exeRegisterCommand(sayac, cmd)
+    elif cmd.startswith("m"):
+        exeMemoryCommand(sayac, cmd)
+    elif cmd == "f":
+        exeFlagCommand(sayac)
+    elif cmd == "a":
+        print("Registers:")
+        exeRegisterCommand(sayac, "r")
+        print("Memory:")
+        exeMemoryCommand(sayac, "m")
+        print("Flags:")
+        exeFlagCommand(sayac)
+    else:
+        return False
+    return True
+
+
 def getInput(sayac: Sayac):
-    try:
+    # inspection commands until a blank line (or the end of the input)
+    while True:
         print("sayac>>> ", end="")
-        cmd = input().strip()
+        try:
+            cmd = input().strip()
+        except EOFError:
+            print()
+            return
         if cmd == "":
             return
-        elif cmd.startswith("r"):
-            exeRegisterCommand(sayac, cmd)
-        elif cmd.startswith("m"):
-            exeMemoryCommand(sayac, cmd)
-        elif cmd == "f":
-            exeFlagCommand(sayac)
-        elif cmd == "a":
-            print("Registers:")
-            exeRegisterCommand(sayac, "r")
-            print("Memory:")
-            exeMemoryCommand(sayac, "m")
-            print("Flags:")
-            exeFlagCommand(sayac)
-        else:
-            print("Invalid command")
-        getInput(sayac)
-    except Exception as e:
-        print(f"Invalid command: {e}")
-        getInput(sayac)
+        try:
+            if not exeCommand(sayac, cmd):
+                print("Invalid command")
+        except Exception as e:
+            print(f"Invalid command: {e}")
 
 
-# Exceptions
-class AssemblySyntaxError(Exception):
-    def __init__(self, message):
-        self.message = message
+def decodeInstruction(ins, line):
+    spec, operands = parseInstructionFields(ins, line)
+    return spec.execute, operands
 
 
-def hexToInt(num: str):
-    if num.startswith("0x"):
-        return int(num, 0)
-    return int(num, 16)
+def decodeProgram(insLines: list):
+    # decode every line once, so the execution loop only dispatches on (handler, operands)
+    return [decodeInstruction(insLines[lineIndex], lineIndex + 1) for lineIndex in range(0, len(insLines))]
 
 
-def intToBin(num: int, n: int):
-    binNum = bin(int(num)).replace("0b", "")[-n:]
-    while len(binNum) < n:
-        binNum = "0" + binNum
-    if len(binNum) > n:
-        return binNum[-n:]
-    return binNum
+def bindProgram(program: list, sayac: Sayac):
+    # pre-bind the machine and operands, so each step is a single call without argument unpacking
+    return [functools.partial(handler, sayac, *operands) for handler, operands in program]
 
 
-def baseNumberToInt(num: str):
-    if num.startswith("0x"):
-        return hexToInt(num)
-    elif num.startswith("0b"):
-        return int(num, 2)
-    return int(num)
+def decodeSourceProgram(statements):
+    # (source line number, tokens) of every instruction (see lexLines) --> (program, listing, source line numbers)
+    program = []
+    listing = []
+    lineNumbers = []
+    for line, tokens in statements:
+        spec, operands = parseInstructionTokens(tokens, line)
+        program.append((spec.execute, operands))
+        listing.append(" ".join(tokens))
+        lineNumbers.append(line)
+    return program, listing, lineNumbers
 
 
-def parseInstruction(ins, line, sayac: Sayac):
-    insSplitted = ins.strip().split(" ")
-    if len(insSplitted) < 1:
-        raise AssemblySyntaxError(f"No instruction on line {line}")
-    insType = insSplitted[0].lower()
-    if INS_REQUIRED_ARGS_COUNT[insType] != (len(insSplitted) - 1):
-        raise AssemblySyntaxError(f"Not enough argument for instruction '{insType}'")
-    if insType == INS_LdR:
-        # LdR rd rs1
-        # rd <- mem[rs1]
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.readMemory(sayac.registers[int(rs1)])
-    elif insType == INS_LdRio:
-        # LdRio rd rs1
-        # rd <- memio[rs1]
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.readMemory(sayac.registers[int(rs1)], True)
-    elif insType == INS_STR:
-        # STR rd rs1
-        # mem[rd] <- rs1
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.writeMemory(sayac.registers[int(rd)], sayac.registers[int(rs1)])
-    elif insType == INS_STRio:
-        # STRio rd rs1
-        # memio[rd] <- rs1
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.writeMemory(sayac.registers[int(rd)], sayac.registers[int(rs1)], True)
-    elif insType == INS_JMR:
-        # JMR rd rs1
-        # PC <- PC + rs1
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.PC += sayac.registers[int(rs1)] - 1
-    elif insType == INS_JMRs:
-        # JMRs rd rs1
-        # PC <- PC + rs1
-        # rd <- PC + 1
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.PC + 1
-        sayac.PC += sayac.registers[int(rs1)] - 1
-    elif insType == INS_JMI:
-        # JMI rd imm
-        # PC <- PC + imm
-        # rd <- PC + 1
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        sayac.registers[int(rd)] = sayac.PC + 1
-        sayac.PC += baseNumberToInt(imm) - 1
-    elif insType == INS_ANR:
-        # ANR rd rs1 rs2
-        # rd <- rs1 & rs2
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.registers[int(rs1)] & sayac.registers[int(rs2)]
-    elif insType == INS_AND:
-        # ANR rd rs1 rs2
-        # rd <- rs1 & rs2
-        # TODO: remove this instruction
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.registers[int(rs1)] & sayac.registers[int(rs2)]
-    elif insType == INS_ANI:
-        # ANI rd imm
-        # rd <- rd & imm
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        sayac.registers[int(rd)] = sayac.registers[int(rd)] & baseNumberToInt(imm)
-    elif insType == INS_MSI:
-        # MSI rd imm
-        # rd[7:0] <- SE(imm)
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        sayac.registers[int(rd)] = baseNumberToInt(imm)
-    elif insType == INS_MHI:
-        # TODO: check the operation
-        # MHI rd imm
-        # rd[15:8] <- imm
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        sayac.registers[int(rd)] = baseNumberToInt(imm) << 8
-    elif insType == INS_SLR:
-        # SLR rd rs1 rs2
-        # rd <- rs1 << (+- rs2[4:0])
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        rs2_4to0 = intToBin(sayac.registers[int(rs2)], 5)
-        if rs2_4to0[0] == "0":
-            sayac.registers[int(rd)] = abs(sayac.registers[int(rs1)]) >> int(rs2_4to0, 2)
-        else:
-            sayac.registers[int(rd)] = abs(sayac.registers[int(rs1)]) << int(rs2_4to0[1:], 2)
-    elif insType == INS_SAR:
-        # SAR rd rs1 rs2
-        # rd <- rs1 <<< (+- rs2[4:0])
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        rs2_4to0 = intToBin(sayac.registers[int(rs2)], 5)
-        if rs2_4to0[0] == "0":
-            sayac.registers[int(rd)] = sayac.registers[int(rs1)] >> int(rs2_4to0, 2)
-        else:
-            sayac.registers[int(rd)] = sayac.registers[int(rs1)] << int(rs2_4to0[1:], 2)
-    elif insType == INS_ADD:
-        # ADD rd rs1 rs2
-        # rd <- rs1 + rs2
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.registers[int(rs1)] + sayac.registers[int(rs2)]
-    elif insType == INS_ADR:
-        # ADR rd rs1 rs2
-        # rd <- rs1 + rs2
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.registers[int(rs1)] + sayac.registers[int(rs2)]
-    elif insType == INS_SUB:
-        # SUB rd rs1 rs2
-        # rd <- rs1 - rs2
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.registers[int(rs1)] - sayac.registers[int(rs2)]
-    elif insType == INS_SUR:
-        # SUR rd rs1 rs2
-        # rd <- rs1 - rs2
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.registers[int(rs1)] - sayac.registers[int(rs2)]
-    elif insType == INS_ADI:
-        # ADI rd imm
-        # rd <- rd + imm
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        sayac.registers[int(rd)] = sayac.registers[int(rd)] + baseNumberToInt(imm)
-    elif insType == INS_SUI:
-        # SUI rd imm
-        # rd <- rd - imm
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        sayac.registers[int(rd)] = sayac.registers[int(rd)] - baseNumberToInt(imm)
-    elif insType == INS_MUL:
-        # MUL rd rs1 rs2
-        # rd <- rs1 * rs2
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = sayac.registers[int(rs1)] * sayac.registers[int(rs2)]
-    elif insType == INS_DIV:
-        # DIV rd rs1 rs2
-        # rd <- rs1 / rs2
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = int(sayac.registers[int(rs1)] / sayac.registers[int(rs2)])
-    elif insType == INS_CMR:
-        # CMR rs1 rs2
-        rs1 = insSplitted[1].replace("_", "").replace("r", "")
-        rs2 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.setFlags(sayac.registers[int(rs1)], sayac.registers[int(rs2)])
-    elif insType == INS_CMI:
-        # CMI rs1 imm
-        imm = insSplitted[1]
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.setFlags(sayac.registers[int(rs1)], baseNumberToInt(imm))
-    elif insType == INS_BRC:
-        # BRC cond rd
-        # if (cond) pc <- rd
-        FIB = insSplitted[1]
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        if sayac.FIBtoFlag(intToBin(baseNumberToInt(FIB), 5)):
-            sayac.PC = sayac.registers[int(rd)] - 1
-    elif insType == INS_BRR:
-        # BRR cond rd
-        # if (cond) pc <- pc + rd
-        FIB = insSplitted[1]
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        if sayac.FIBtoFlag(intToBin(baseNumberToInt(FIB), 5)):
-            sayac.PC += sayac.registers[int(rd)] - 1
-    elif insType == INS_SHI:
-        # SHI imm rd
-        # rd <- rd << (+- imm)
-        shimm = baseNumberToInt(insSplitted[1])
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        if int(shimm) < 0:
-            sayac.registers[int(rd)] = abs(sayac.registers[int(rd)]) << int(abs(shimm))
-        else:
-            sayac.registers[int(rd)] = abs(sayac.registers[int(rd)]) >> int(shimm)
-    elif insType == INS_SHIla:
-        # SHIla imm rd
-        # rd <- rd <<< (+- imm)
-        shimm = baseNumberToInt(insSplitted[1])
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        if int(shimm) < 0:
-            sayac.registers[int(rd)] = sayac.registers[int(rd)] << int(abs(shimm))
-        else:
-            sayac.registers[int(rd)] = sayac.registers[int(rd)] >> int(shimm)
-    elif insType == INS_NTR:
-        # NTR rd rs1
-        # rd <- ~rs1
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = ~sayac.registers[int(rs1)]
-    elif insType == INS_NTR2c:
-        # NTR2c rd rs1
-        # rd <- ~rs1 + 1
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = ~sayac.registers[int(rs1)] + 1
-    elif insType == INS_NTD:
-        # NTD rd
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = ~sayac.registers[int(rd)]
-    elif insType == INS_NTD2c:
-        # NTD2c rd
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        sayac.registers[int(rd)] = ~sayac.registers[int(rd)] + 1
-    else:
-        raise Exception("Uncaught!")
+def decodeImageProgram(words):
+    # instruction words --> (program, listing, None), images have no source lines
+    program = []
+    listing = []
+    for spec, operands in decodeImage(words):
+        program.append((spec.execute, operands))
+        listing.append(spec.formatInstruction(operands))
+    return program, listing, None
 
 
-def assemble(insFileName, lineByLine: bool):
+def loadProgram(insFileName, imageFormat: str = None):
+    # SAYAC Assembly source (or an assembled image when imageFormat is given) --> (program, listing, line numbers)
+    if imageFormat is not None:
+        # the assembled instruction words (e.g. SAYAC_Inst2Bin.py output)
+        return decodeImageProgram(loadImage(insFileName, imageFormat))
+    insFile = open(insFileName, "r")
     try:
-        sayac = Sayac()
-        # open the SAYAC Assembly code from the path given
+        return decodeSourceProgram(resolveLabels(preprocess(lexLines(insFile), os.path.dirname(insFileName))))
+    finally:
+        insFile.close()
+
+
+def runProgram(sayac: Sayac, program: list):
+    # runs a bound program (see bindProgram) until the PC leaves it
+    programLength = len(program)
+    while 0 <= sayac.PC < programLength:
+        program[sayac.PC]()
+        sayac.PC += 1
+
+
+def writeProfile(profiler: Profiler, insFileName, isSource: bool):
+    # the annotated listing shows the source file itself, images are listed per instruction
+    sourceLines = None
+    if isSource:
         insFile = open(insFileName, "r")
-        insLines = insFile.readlines()
+        sourceLines = insFile.readlines()
         insFile.close()
-        insLines = commentRemover(insLines)
-        while sayac.PC in range(0, len(insLines)):
-            lineIndex = sayac.PC
-            parseInstruction(insLines[lineIndex], lineIndex + 1, sayac)
-            sayac.createAssemblerOutJsonFile(insFileName.rsplit(".", 1)[0])
-            if lineByLine:
-                print(insLines[lineIndex])
-                getInput(sayac)
-            sayac.PC += 1
+    profiler.writeReports(insFileName.rsplit(".", 1)[0], sourceLines)
+
+
+def parseInstruction(ins, line, sayac: Sayac):
+    handler, operands = decodeInstruction(ins, line)
+    handler(sayac, *operands)
+
+
+def assemble(insFileName, lineByLine: bool, snapshotMode: str = SNAPSHOT_END, deltaLogFileName: str = None,
+             imageFormat: str = None, jit: bool = False, profile: bool = False, debug: bool = False,
+             checkpointInterval: int = CHECKPOINT_INTERVAL, checkpointRingSize: int = CHECKPOINT_RING_SIZE,
+             bus: IOBus = None, timing: TimingModel = None, trace: TraceWriter = None):
+    try:
+        sayac = Sayac()
+        decodedProgram, insLines, lineNumbers = loadProgram(insFileName, imageFormat)
+        program = bindProgram(decodedProgram, sayac)
+        programLength = len(program)
+        recorder = StateRecorder(sayac, insFileName.rsplit(".", 1)[0], snapshotMode, deltaLogFileName)
+        perStep = recorder.perStep
+        if jit:
+            # the block JIT only runs in the plain loop, every other mode steps through the interpreter
+            others = [option for option, active in (("--line", lineByLine), ("--debug", debug),
+                                                    ("the per-step --snapshot/--delta-log", perStep),
+                                                    ("--device", bus is not None), ("--profile", profile),
+                                                    ("--timing", timing is not None), ("--trace", trace is not None))
+                      if active]
+            if others:
+                print(f"Warning: --jit is ignored with {', '.join(others)}")
+        if bus is not None:
+            bus.attach(sayac)
+        profiler = None
+        if profile:
+            profiler = Profiler(decodedProgram, insLines, lineNumbers)
+            profiler.attach(sayac)
+        if timing is not None:
+            timing.attach(sayac, decodedProgram)
+        if trace is not None:
+            trace.attach(sayac, decodedProgram)
+        halted = False
+        try:
+            if debug:
+                # breakpoints and watchpoints stop the run, the debugger prompt takes the commands
+                checkpoints = Checkpoints(checkpointInterval, checkpointRingSize)
+                debugger = Debugger(sayac, program, insLines, lineNumbers, exeCommand, checkpoints)
+                debugger.run()
+            else:
+                if not perStep and not lineByLine:
+                    runners = [runner for runner in (profiler, timing, trace) if runner is not None]
+                    if bus is not None:
+                        # the devices need the cycle count, profiling, timing and tracing go through the step loop
+                        if not runners:
+                            bus.run(sayac, program)
+                    elif len(runners) == 1:
+                        # one of them runs its own loop, several go through the step loop below
+                        runners[0].run(sayac, program)
+                    elif not runners:
+                        if jit:
+                            # hot basic blocks run as compiled Python functions
+                            BlockJIT(decodedProgram).run(sayac, program)
+                        runProgram(sayac, program)
+                while 0 <= sayac.PC < programLength:
+                    lineIndex = sayac.PC
+                    program[lineIndex]()
+                    if bus is not None:
+                        bus.step()
+                    if profiler is not None:
+                        profiler.step(lineIndex, sayac)
+                    if timing is not None:
+                        timing.step(lineIndex)
+                    if trace is not None:
+                        trace.step(lineIndex)
+                    if perStep:
+                        recorder.step(lineIndex)
+                    if lineByLine:
+                        recorder.halt()
+                        print(insLines[lineIndex])
+                        getInput(sayac)
+                    sayac.PC += 1
+            halted = True
+        finally:
+            # the state file keeps the PC of the last executed instruction (or of the failing one)
+            recorder.finish(sayac.PC - 1 if halted else sayac.PC)
+            if profiler is not None:
+                writeProfile(profiler, insFileName, lineNumbers is not None)
+            if timing is not None:
+                timing.writeReport(insFileName.rsplit(".", 1)[0])
+                print(timing.summary())
+            if trace is not None:
+                trace.close()
+            if bus is not None:
+                bus.close()
         print("Successfully Assembled!")
         getInput(sayac)
     except FileNotFoundError:
@@ -0,0 +1,453 @@
+import sys
+import json
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is only needed for batch simulation
+    np = None
+
+from SAYAC_ISA import AssemblySyntaxError, baseNumberToInt, WORD_MASK, FIB_FLAGS, FLAG_NAMES, FLAG_BIT_NEQ
+from SAYAC_ISA import FLAGS_EQUAL, FLAGS_GREATER, FLAGS_LESS
+from SAYAC_ISA import exeLdR, exeLdRio, exeSTR, exeSTRio, exeJMR, exeJMRs, exeJMI, exeANR, exeANI, exeMSI, exeMHI
+from SAYAC_ISA import exeSLR, exeSAR, exeADD, exeSUB, exeADI, exeSUI, exeMUL, exeDIV, exeCMR, exeCMI, exeBRC, exeBRR
+from SAYAC_ISA import exeSHI, exeSHIla, exeNTR, exeNTR2c, exeNTD, exeNTD2c
+from SAYAC_Assembler import VERSION, MEMORY_SIZE, loadProgram
+from SAYAC_Image import IMAGE_AUTO, IMAGE_FORMATS, IMAGE_EXTENSIONS
+
+# Lockstep simulation of one program on N machines: the machine state is held in NumPy arrays with one row per
+# instance, and each step executes one instruction as a vectorized operation on every instance at that PC.
+
+
+PAGE_BITS = 8  # 256-word pages
+PAGE_WORDS = 1 << PAGE_BITS
+PAGE_COUNT = MEMORY_SIZE >> PAGE_BITS
+
+
+class BatchMemory:
+    # N 64K x 16-bit memories, untouched cells read back their own address
+    # copy on write: every instance maps its pages to rows of a shared pool, a page gets its own row (and dirty bits)
+    # on its first write, so an instance costs its page map plus the pages it wrote
+    def __init__(self, count: int):
+        self.pageMap = np.full((count, PAGE_COUNT), -1, dtype=np.int32)  # instance, page --> pool row, -1 untouched
+        self.pool = np.empty((0, PAGE_WORDS), dtype=np.uint16)
+        self.dirty = np.empty((0, PAGE_WORDS), dtype=bool)
+        self.poolSize = 0  # pool rows in use
+        self.offsets = np.arange(0, PAGE_WORDS, dtype=np.uint16)
+
+    def read(self, rows, addresses):
+        addresses = np.asarray(addresses, dtype=np.int64)
+        poolRows = self.pageMap[rows, addresses >> PAGE_BITS]
+        values = addresses.astype(np.uint16)
+        mapped = poolRows >= 0
+        values[mapped] = self.pool[poolRows[mapped], addresses[mapped] & (PAGE_WORDS - 1)]
+        return values
+
+    def allocate(self, rows, pages):
+        # --> new pool rows for the (instance, page) pairs, filled with the untouched content of the pages
+        count = len(rows)
+        if self.poolSize + count > len(self.pool):
+            capacity = max(2 * len(self.pool), self.poolSize + count, 16)
+            pool = np.empty((capacity, PAGE_WORDS), dtype=np.uint16)
+            pool[:self.poolSize] = self.pool[:self.poolSize]
+            dirty = np.zeros((capacity, PAGE_WORDS), dtype=bool)
+            dirty[:self.poolSize] = self.dirty[:self.poolSize]
+            self.pool = pool
+            self.dirty = dirty
+        poolRows = np.arange(self.poolSize, self.poolSize + count, dtype=np.int32)
+        self.pool[poolRows] = (pages.astype(np.uint16) << PAGE_BITS)[:, None] + self.offsets
+        self.poolSize += count
+        self.pageMap[rows, pages] = poolRows
+        return poolRows
+
+    def write(self, rows, addresses, values):
+        # rows: distinct instances
+        rows = np.atleast_1d(rows)
+        addresses = np.atleast_1d(np.asarray(addresses, dtype=np.int64))
+        pages = addresses >> PAGE_BITS
+        poolRows = self.pageMap[rows, pages]
+        untouched = poolRows < 0
+        if untouched.any():
+            poolRows[untouched] = self.allocate(rows[untouched], pages[untouched])
+        offsets = addresses & (PAGE_WORDS - 1)
+        self.pool[poolRows, offsets] = values
+        self.dirty[poolRows, offsets] = True
+
+    def changed(self, instance: int):
+        cells = {}
+        for page in np.flatnonzero(self.pageMap[instance] >= 0).tolist():
+            poolRow = self.pageMap[instance, page]
+            offsets = np.flatnonzero(self.dirty[poolRow])
+            cells.update(zip((offsets + (page << PAGE_BITS)).tolist(), self.pool[poolRow, offsets].tolist()))
+        return cells
+
+
+class BatchSayac:
+    def __init__(self, count: int):
+        if np is None:
+            raise ImportError("batch simulation needs NumPy (pip install numpy)")
+        self.count = count
+        self.registers = np.tile(np.arange(0, 16, dtype=np.uint16), (count, 1))
+        self.memory = BatchMemory(count)
+        self._memoryIO = None  # allocated by the first IO access
+        self.flagBits = np.full(count, FLAG_BIT_NEQ, dtype=np.uint8)
+        self.PC = np.zeros(count, dtype=np.int64)
+        self.steps = np.zeros(count, dtype=np.int64)  # executed instructions
+        self.faulted = np.zeros(count, dtype=bool)
+        self.faults = {}  # instance --> error message
+        self.programLength = 0
+
+    @property
+    def memoryIO(self):
+        if self._memoryIO is None:
+            self._memoryIO = BatchMemory(self.count)
+        return self._memoryIO
+
+    def loadState(self, instance: int, state: dict):
+        # state: the .sayac.json layout, every key optional
+        #   {"PC": 0, "registers": [...] or {"3": 10}, "memory": {"1000": 5}, "memoryIO": {...}, "flags": {"eq": true}}
+        registers = state.get("registers", {})
+        if isinstance(registers, list):
+            registers = dict(enumerate(registers))
+        for register, value in registers.items():
+            self.registers[instance, int(register)] = baseNumberToInt(str(value)) & WORD_MASK
+        for key, memory in (("memory", self.memory), ("memoryIO", None)):
+            cells = state.get(key, {})
+            if cells and memory is None:
+                memory = self.memoryIO
+            for address, value in cells.items():
+                # loaded cells count as changed, so the state of the instance keeps them
+                memory.write(instance, baseNumberToInt(str(address)), baseNumberToInt(str(value)) & WORD_MASK)
+        if "flags" in state:
+            flagBits = 0
+            for flag, value in state["flags"].items():
+                if value:
+                    flagBits |= FLAG_NAMES[flag]
+            self.flagBits[instance] = flagBits
+        self.PC[instance] = state.get("PC", 0)
+
+    def fault(self, rows, message: str):
+        # the instances stop at the failing instruction, like the simulator does
+        self.faulted[rows] = True
+        self.PC[rows] -= 1
+        for instance in rows.tolist():
+            self.faults[instance] = message
+
+    def run(self, program: list, maxSteps: int = None):
+        # program: [(execute, operands)] as given by SAYAC_Assembler.decodeProgram()
+        executors = [(BATCH_EXECUTORS[execute], operands) for execute, operands in program]
+        self.programLength = programLength = len(program)
+        PC = self.PC
+        steps = self.steps
+        faulted = self.faulted
+        while True:
+            running = (PC >= 0) & (PC < programLength) & ~faulted
+            if maxSteps is not None:
+                running &= steps < maxSteps
+            if not running.any():
+                break
+            # the lowest PC runs first, so instances that took different branches meet again at the join point
+            pc = PC[running].min()
+            rows = np.flatnonzero(running & (PC == pc))
+            executor, operands = executors[pc]
+            executor(self, rows, *operands)
+            PC[rows] += 1
+            steps[rows] += 1
+
+    def halted(self):
+        return ((self.PC < 0) | (self.PC >= self.programLength)) & ~self.faulted
+
+    def statePC(self):
+        # PC of the last executed instruction (of the failing one for faulted instances), as in the state file
+        return np.where(self.faulted, self.PC, self.PC - 1)
+
+    def flags(self, instance: int):
+        flagBits = int(self.flagBits[instance])
+        return {flag: flagBits & flagBit != 0 for flag, flagBit in FLAG_NAMES.items()}
+
+    def state(self, instance: int):
+        return {
+            "PC": int(self.statePC()[instance]),
+            "registers": self.registers[instance].tolist(),
+            "memory": self.memory.changed(instance),
+            "memoryIO": self._memoryIO.changed(instance) if self._memoryIO is not None else {},
+            "flags": self.flags(instance)
+        }
+
+    def results(self):
+        # the final state of every instance as arrays
+        return {
+            "PC": self.statePC(),
+            "registers": self.registers.copy(),
+            "flagBits": self.flagBits.copy(),
+            "steps": self.steps.copy(),
+            "halted": self.halted(),
+            "faulted": self.faulted.copy(),
+        }
+
+    def createAssemblerOutJsonFiles(self, name: str):
+        # one <name>.<instance>.sayac.json per instance
+        for instance in range(0, self.count):
+            f = open(f"{name}.{instance}.sayac.json", "w")
+            f.write(json.dumps(self.state(instance)))
+            f.close()
+
+
+# Vectorized semantics, the same as the exe* functions of SAYAC_ISA on every instance in rows
+
+
+def toSignedWords(values):
+    # 16-bit words --> two's complement values
+    return values.astype(np.int16).astype(np.int64)
+
+
+def shiftAmounts(values):
+    # value[4:0] --> (isLeftShift, amount) arrays, the sign bit selects the direction
+    values = values.astype(np.int64)
+    isLeftShift = values & 0b10000 != 0
+    return isLeftShift, np.where(isLeftShift, values & 0b1111, values & 0b11111)
+
+
+def batchLdR(batch, rows, rd, rs1):
+    batch.registers[rows, rd] = batch.memory.read(rows, batch.registers[rows, rs1])
+
+
+def batchLdRio(batch, rows, rd, rs1):
+    batch.registers[rows, rd] = batch.memoryIO.read(rows, batch.registers[rows, rs1])
+
+
+def batchSTR(batch, rows, rd, rs1):
+    batch.memory.write(rows, batch.registers[rows, rd], batch.registers[rows, rs1])
+
+
+def batchSTRio(batch, rows, rd, rs1):
+    batch.memoryIO.write(rows, batch.registers[rows, rd], batch.registers[rows, rs1])
+
+
+def batchJMR(batch, rows, rd, rs1):
+    batch.PC[rows] += toSignedWords(batch.registers[rows, rs1]) - 1
+
+
+def batchJMRs(batch, rows, rd, rs1):
+    offsets = toSignedWords(batch.registers[rows, rs1])
+    batch.registers[rows, rd] = (batch.PC[rows] + 1) & WORD_MASK
+    batch.PC[rows] += offsets - 1
+
+
+def batchJMI(batch, rows, rd, imm):
+    batch.registers[rows, rd] = (batch.PC[rows] + 1) & WORD_MASK
+    batch.PC[rows] += imm - 1
+
+
+def batchANR(batch, rows, rd, rs1, rs2):
+    batch.registers[rows, rd] = batch.registers[rows, rs1] & batch.registers[rows, rs2]
+
+
+def batchANI(batch, rows, rd, imm):
+    batch.registers[rows, rd] &= imm
+
+
+def batchMSI(batch, rows, rd, imm):
+    batch.registers[rows, rd] = imm & WORD_MASK
+
+
+def batchMHI(batch, rows, rd, imm):
+    batch.registers[rows, rd] = (imm << 8) & WORD_MASK
+
+
+def batchSLR(batch, rows, rd, rs1, rs2):
+    isLeftShift, amounts = shiftAmounts(batch.registers[rows, rs2])
+    values = batch.registers[rows, rs1].astype(np.int64)
+    batch.registers[rows, rd] = np.where(isLeftShift, (values << amounts) & WORD_MASK, values >> amounts)
+
+
+def batchSAR(batch, rows, rd, rs1, rs2):
+    isLeftShift, amounts = shiftAmounts(batch.registers[rows, rs2])
+    values = toSignedWords(batch.registers[rows, rs1])
+    batch.registers[rows, rd] = np.where(isLeftShift, values << amounts, values >> amounts) & WORD_MASK
+
+
+def batchADD(batch, rows, rd, rs1, rs2):
+    batch.registers[rows, rd] = batch.registers[rows, rs1] + batch.registers[rows, rs2]
+
+
+def batchSUB(batch, rows, rd, rs1, rs2):
+    batch.registers[rows, rd] = batch.registers[rows, rs1] - batch.registers[rows, rs2]
+
+
+def batchADI(batch, rows, rd, imm):
+    batch.registers[rows, rd] = (batch.registers[rows, rd].astype(np.int64) + imm) & WORD_MASK
+
+
+def batchSUI(batch, rows, rd, imm):
+    batch.registers[rows, rd] = (batch.registers[rows, rd].astype(np.int64) - imm) & WORD_MASK
+
+
+def batchMUL(batch, rows, rd, rs1, rs2):
+    batch.registers[rows, rd] = batch.registers[rows, rs1] * batch.registers[rows, rs2]
+
+
+def batchDIV(batch, rows, rd, rs1, rs2):
+    dividends = toSignedWords(batch.registers[rows, rs1])
+    divisors = toSignedWords(batch.registers[rows, rs2])
+    byZero = divisors == 0
+    if byZero.any():
+        batch.fault(rows[byZero], "division by zero")
+        rows, dividends, divisors = rows[~byZero], dividends[~byZero], divisors[~byZero]
+    # rounded toward zero
+    quotients = np.abs(dividends) // np.abs(divisors) * np.sign(dividends) * np.sign(divisors)
+    batch.registers[rows, rd] = quotients & WORD_MASK
+
+
+def compareFlags(values1, values2):
+    return np.where(values1 == values2, FLAGS_EQUAL, np.where(values1 > values2, FLAGS_GREATER, FLAGS_LESS))
+
+
+def batchCMR(batch, rows, rs1, rs2):
+    batch.flagBits[rows] = compareFlags(toSignedWords(batch.registers[rows, rs1]),
+                                        toSignedWords(batch.registers[rows, rs2]))
+
+
+def batchCMI(batch, rows, imm, rs1):
+    batch.flagBits[rows] = compareFlags(toSignedWords(batch.registers[rows, rs1]), imm)
+
+
+def batchBRC(batch, rows, fib, rd):
+    # only the instances whose flags meet the condition branch
+    rows = rows[batch.flagBits[rows] & FIB_FLAGS[fib & 0b111] != 0]
+    batch.PC[rows] = batch.registers[rows, rd].astype(np.int64) - 1
+
+
+def batchBRR(batch, rows, fib, rd):
+    rows = rows[batch.flagBits[rows] & FIB_FLAGS[fib & 0b111] != 0]
+    batch.PC[rows] += toSignedWords(batch.registers[rows, rd]) - 1
+
+
+def batchSHI(batch, rows, shimm, rd):
+    values = batch.registers[rows, rd].astype(np.int64)
+    batch.registers[rows, rd] = (values << -shimm) & WORD_MASK if shimm < 0 else values >> shimm
+
+
+def batchSHIla(batch, rows, shimm, rd):
+    values = toSignedWords(batch.registers[rows, rd])
+    batch.registers[rows, rd] = (values << -shimm if shimm < 0 else values >> shimm) & WORD_MASK
+
+
+def batchNTR(batch, rows, rd, rs1):
+    batch.registers[rows, rd] = ~batch.registers[rows, rs1]
+
+
+def batchNTR2c(batch, rows, rd, rs1):
+    batch.registers[rows, rd] = -batch.registers[rows, rs1].astype(np.int64) & WORD_MASK
+
+
+def batchNTD(batch, rows, rd):
+    batch.registers[rows, rd] = ~batch.registers[rows, rd]
+
+
+def batchNTD2c(batch, rows, rd):
+    batch.registers[rows, rd] = -batch.registers[rows, rd].astype(np.int64) & WORD_MASK
+
+
+BATCH_EXECUTORS = {
+    exeLdR: batchLdR,
+    exeLdRio: batchLdRio,
+    exeSTR: batchSTR,
+    exeSTRio: batchSTRio,
+    exeJMR: batchJMR,
+    exeJMRs: batchJMRs,
+    exeJMI: batchJMI,
+    exeANR: batchANR,
+    exeANI: batchANI,
+    exeMSI: batchMSI,
+    exeMHI: batchMHI,
+    exeSLR: batchSLR,
+    exeSAR: batchSAR,
+    exeADD: batchADD,
+    exeSUB: batchSUB,
+    exeADI: batchADI,
+    exeSUI: batchSUI,
+    exeMUL: batchMUL,
+    exeDIV: batchDIV,
+    exeCMR: batchCMR,
+    exeCMI: batchCMI,
+    exeBRC: batchBRC,
+    exeBRR: batchBRR,
+    exeSHI: batchSHI,
+    exeSHIla: batchSHIla,
+    exeNTR: batchNTR,
+    exeNTR2c: batchNTR2c,
+    exeNTD: batchNTD,
+    exeNTD2c: batchNTD2c,
+}
+
+
+def simulateBatch(program: list, initialStates: list, maxSteps: int = None):
+    # runs program on one machine per initial state (see BatchSayac.loadState) --> BatchSayac
+    batch = BatchSayac(len(initialStates))
+    for instance, state in enumerate(initialStates):
+        batch.loadState(instance, state)
+    batch.run(program, maxSteps)
+    return batch
+
+
+def loadStates(statesFileName: str):
+    # one JSON initial state per line
+    f = open(statesFileName, "r")
+    states = [json.loads(line) for line in f if line.strip() != ""]
+    f.close()
+    return states
+
+
+def main():
+    # App info
+    print(f"SAYAC Batch Simulator {VERSION}")
+
+    if len(sys.argv) < 3:
+        print("Error: Not enough arguments --> [use <file name> <initial states file>]")
+        exit(1)
+    insFileName = sys.argv[1]
+    statesFileName = sys.argv[2]
+    maxSteps = None
+    imageFormat = IMAGE_AUTO if insFileName.endswith(tuple(IMAGE_EXTENSIONS.values())) else None
+    for arg in sys.argv[3:]:
+        if arg.startswith("--max-steps="):
+            try:
+                maxSteps = baseNumberToInt(arg.split("=", 1)[1])
+            except ValueError:
+                print(f"Error: invalid step limit --> [{arg}]")
+                exit(1)
+        elif arg == "--image":
+            imageFormat = IMAGE_AUTO
+        elif arg.startswith("--image="):
+            imageFormat = arg.split("=", 1)[1]
+            if imageFormat not in (IMAGE_AUTO,) + IMAGE_FORMATS:
+                print(f"Error: Invalid image format --> [{imageFormat}]")
+                exit(1)
+        else:
+            print(f"Error: Invalid argument --> [{arg}]")
+            exit(1)
+    try:
+        program, insLines, lineNumbers = loadProgram(insFileName, imageFormat)
+        batch = simulateBatch(program, loadStates(statesFileName), maxSteps)
+        batch.createAssemblerOutJsonFiles(insFileName.rsplit(".", 1)[0])
+    except FileNotFoundError as e:
+        print(f"Error: File not found --> ['{e.filename}' does not exists]")
+        exit(1)
+    except KeyError as e:
+        print(f"Error: Instruction {e} not supported yet")
+        exit(1)
+    except AssemblySyntaxError as e:
+        print(f"Error: {e.message}")
+        exit(1)
+    except (ImportError, ValueError) as e:
+        print(f"Error: {e}")
+        exit(1)
+    halted = int(batch.halted().sum())
+    failed = len(batch.faults)
+    print(f"{batch.count} instances: {halted} halted, {failed} failed, {batch.count - halted - failed} stopped")
+    for instance, message in sorted(batch.faults.items()):
+        print(f"Error: instance {instance} --> [{message}]")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+import sys
+import os
+import json
+import time
+import random
+import platform
+import tempfile
+import tracemalloc
+
+import SAYAC_Inst2Bin
+from SAYAC_ISA import baseNumberToInt, lexLines
+from SAYAC_Assembler import VERSION, Sayac, decodeSourceProgram, bindProgram, runProgram
+from SAYAC_JIT import BlockJIT
+
+# Throughput benchmarks of the encoder and the simulator on synthetic programs
+
+DEFAULT_SIZE = 20000  # source lines of the assembler benchmarks
+DEFAULT_STEPS = 200000  # executed instructions of the simulator benchmarks
+DEFAULT_REPEAT = 3  # the best of this many runs is reported
+DEFAULT_THRESHOLD = 10.0  # percent of throughput lost before a benchmark counts as a regression
+
+# instructions of the generated code, the loop counter and address registers (r11 to r15) are never written
+ALU_TEMPLATES = [
+    "ADD r{0} r{1} r{2}",
+    "SUB r{0} r{1} r{2}",
+    "ANR r{0} r{1} r{2}",
+    "MUL r{0} r{1} r{2}",
+    "SLR r{0} r{1} r{2}",
+    "SAR r{0} r{1} r{2}",
+    "ADI r{0} {3}",
+    "SUI r{0} {3}",
+    "ANI r{0} {4}",
+    "MSI r{0} {3}",
+    "MHI r{0} {4}",
+    "SHI {5} r{0}",
+    "NTR r{0} r{1}",
+    "NTD2c r{0}",
+    "CMR r{1} r{2}",
+    "CMI {5} r{1}",
+]
+
+
+def randomInstruction(rand: random.Random):
+    template = rand.choice(ALU_TEMPLATES)
+    return template.format(rand.randint(1, 10), rand.randint(0, 10), rand.randint(0, 10),
+                           rand.randint(-128, 127), rand.randint(0, 255), rand.randint(-16, 15))
+
+
+def straightLineProgram(size: int, seed: int = 0):
+    # size ALU instructions without any branch
+    rand = random.Random(seed)
+    return [randomInstruction(rand) for _ in range(0, size)]
+
+
+def loopProgram(iterations: int, body: list):
+    # body repeated iterations times (rounded up to a multiple of 256) by a CMR/BRR loop
+    # r12: counter, r13: limit, r14: 1, r15: offset back to the loop start
+    return [
+        "MSI r12 0",
+        f"MHI r13 {min(255, max(1, -(-iterations // 256)))}",
+        "MSI r14 1",
+        f"MSI r15 {-(len(body) + 2)}",
+    ] + body + [
+        "ADD r12 r12 r14",
+        "CMR r12 r13",
+        "BRR 5 r15",
+    ]
+
+
+def tightLoopProgram(steps: int, seed: int = 0):
+    # short loop bodies, most of the executed instructions are CMR/BRR loop overhead
+    body = straightLineProgram(4, seed)
+    return loopProgram(steps // (len(body) + 3), body)
+
+
+def memoryProgram(size: int, seed: int = 0):
+    # LDR/STR heavy code walking through memory with r11
+    rand = random.Random(seed)
+    lines = ["MSI r11 0", "MHI r11 16"]
+    while len(lines) < size:
+        value = rand.randint(1, 10)
+        lines += [f"STR r11 r{value}", f"LDR r{rand.randint(1, 10)} r11", "ADI r11 1"]
+    return lines[:size]
+
+
+def memoryLoopProgram(steps: int, seed: int = 0):
+    body = memoryProgram(30, seed)[2:]
+    return ["MSI r11 0", "MHI r11 16"] + loopProgram(steps // (len(body) + 3), body)
+
+
+def commentHeavyProgram(size: int, seed: int = 0):
+    # as many comment lines as instructions, with line comments after code and multi-line block comments
+    rand = random.Random(seed)
+    lines = []
+    for lineIndex in range(0, size // 2):
+        kind = lineIndex % 3
+        if kind == 0:
+            lines.append(f"{randomInstruction(rand)} // trailing comment {lineIndex}")
+            lines.append(f"// full line comment {lineIndex}")
+        elif kind == 1:
+            lines.append(f"/* block comment {lineIndex}")
+            lines.append(f"   still the comment */ {randomInstruction(rand)}")
+        else:
+            lines.append(f"    {randomInstruction(rand)}    /* inline */")
+            lines.append("")
+    return lines
+
+
+def countSteps(program: list):
+    # executed instructions of a decoded program, counted on a separate run
+    sayac = Sayac()
+    boundProgram = bindProgram(program, sayac)
+    steps = 0
+    while 0 <= sayac.PC < len(boundProgram):
+        boundProgram[sayac.PC]()
+        sayac.PC += 1
+        steps += 1
+    return steps
+
+
+# A benchmark setup(lines, tempDir) returns (prepare, run, work items per run, unit): prepare() builds the input of
+# one run outside of the timed part and run(prepared) is timed
+
+
+def benchParseInstruction(lines: list, tempDir: str):
+    insLines = [" ".join(tokens) for line, tokens in lexLines(lines)]
+    parseInstruction = SAYAC_Inst2Bin.parseInstruction
+
+    def run(prepared):
+        for lineIndex in range(0, len(insLines)):
+            parseInstruction(insLines[lineIndex], lineIndex + 1)
+    return lambda: None, run, len(lines), "lines/s"
+
+
+def benchAssembleFile(lines: list, tempDir: str):
+    insFileName = os.path.join(tempDir, "bench.txt")
+    f = open(insFileName, "w")
+    f.write("\n".join(lines) + "\n")
+    f.close()
+    return lambda: None, lambda prepared: SAYAC_Inst2Bin.assembleFile(insFileName), len(lines), "lines/s"
+
+
+def benchSimulate(lines: list, tempDir: str):
+    program, listing, lineNumbers = decodeSourceProgram(lexLines(lines))
+
+    def prepare():
+        sayac = Sayac()
+        return sayac, bindProgram(program, sayac)
+
+    def run(prepared):
+        runProgram(*prepared)
+    return prepare, run, countSteps(program), "instructions/s"
+
+
+def benchSimulateJIT(lines: list, tempDir: str):
+    program, listing, lineNumbers = decodeSourceProgram(lexLines(lines))
+
+    def prepare():
+        sayac = Sayac()
+        return sayac, bindProgram(program, sayac)
+
+    def run(prepared):
+        # compiling the blocks is part of the run
+        sayac, boundProgram = prepared
+        BlockJIT(program).run(sayac, boundProgram)
+        runProgram(sayac, boundProgram)
+    return prepare, run, countSteps(program), "instructions/s"
+
+
+SIZE_LINES = "lines"  # the program size is given in source lines
+SIZE_STEPS = "steps"  # the program size is given in executed instructions
+
+# benchmark name --> (setup, program generator, size kind)
+BENCHMARKS = {
+    "inst2bin.parseInstruction.straight": (benchParseInstruction, straightLineProgram, SIZE_LINES),
+    "inst2bin.assemble.straight": (benchAssembleFile, straightLineProgram, SIZE_LINES),
+    "inst2bin.assemble.memory": (benchAssembleFile, memoryProgram, SIZE_LINES),
+    "inst2bin.assemble.comments": (benchAssembleFile, commentHeavyProgram, SIZE_LINES),
+    "simulator.straight": (benchSimulate, straightLineProgram, SIZE_LINES),
+    "simulator.loop": (benchSimulate, tightLoopProgram, SIZE_STEPS),
+    "simulator.memory": (benchSimulate, memoryLoopProgram, SIZE_STEPS),
+    "simulator.jit.loop": (benchSimulateJIT, tightLoopProgram, SIZE_STEPS),
+    "simulator.jit.memory": (benchSimulateJIT, memoryLoopProgram, SIZE_STEPS),
+}
+
+
+def measure(prepare, run, repeat: int):
+    # --> (best time in seconds, peak of the Python allocations of prepare() and of prepare() and run() in bytes)
+    times = []
+    for _ in range(0, repeat):
+        prepared = prepare()
+        startTime = time.perf_counter()
+        run(prepared)
+        times.append(time.perf_counter() - startTime)
+    # tracemalloc slows the code down, the peak is taken on an extra run that is not timed; it starts before prepare()
+    # so the peak holds the input of the run (e.g. the machine state of the simulator)
+    tracemalloc.start()
+    prepared = prepare()
+    prepareMemory = tracemalloc.get_traced_memory()[1]
+    run(prepared)
+    peakMemory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), prepareMemory, peakMemory
+
+
+def runBenchmarks(names: list, size: int = DEFAULT_SIZE, steps: int = DEFAULT_STEPS, repeat: int = DEFAULT_REPEAT,
+                  seed: int = 0):
+    results = {}
+    tempDir = tempfile.mkdtemp(prefix="sayac-bench-")
+    try:
+        for name in names:
+            setup, generator, sizeKind = BENCHMARKS[name]
+            lines = generator(size if sizeKind == SIZE_LINES else steps, seed)
+            prepare, run, workItems, unit = setup(lines, tempDir)
+            seconds, prepareMemory, peakMemory = measure(prepare, run, repeat)
+            results[name] = {
+                "throughput": workItems / seconds,
+                "unit": unit,
+                "items": workItems,
+                "seconds": seconds,
+                "prepareMemory": prepareMemory,
+                "peakMemory": peakMemory,
+            }
+            print(f"{name:40} {workItems / seconds:14,.0f} {unit:16} {peakMemory / 1024:10,.0f} KiB "
+                  f"({prepareMemory / 1024:,.0f} KiB prepare)")
+    finally:
+        for fileName in os.listdir(tempDir):
+            os.remove(os.path.join(tempDir, fileName))
+        os.rmdir(tempDir)
+    return {
+        "version": VERSION,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "size": size,
+        "steps": steps,
+        "repeat": repeat,
+        "benchmarks": results,
+    }
+
+
+def compareResults(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD):
+    # --> [(name, change in percent)] of the benchmarks that lost more than threshold percent of throughput
+    regressions = []
+    for name, result in current["benchmarks"].items():
+        if name not in baseline["benchmarks"]:
+            continue
+        before = baseline["benchmarks"][name]["throughput"]
+        change = (result["throughput"] - before) / before * 100
+        marker = ""
+        if change < -threshold:
+            regressions.append((name, change))
+            marker = "  REGRESSION"
+        print(f"{name:40} {before:14,.0f} -> {result['throughput']:14,.0f} {change:+8.1f}%{marker}")
+    return regressions
+
+
+def main():
+    # App info
+    print(f"SAYAC Benchmark {VERSION}")
+
+    options = {"size": DEFAULT_SIZE, "steps": DEFAULT_STEPS, "repeat": DEFAULT_REPEAT, "seed": 0}
+    outputFileName = None
+    baselineFileName = None
+    threshold = DEFAULT_THRESHOLD
+    names = list(BENCHMARKS)
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition("=")
+        try:
+            if key[2:] in options and value != "":
+                options[key[2:]] = baseNumberToInt(value)
+            elif key == "--output":
+                outputFileName = value
+            elif key == "--compare":
+                baselineFileName = value
+            elif key == "--threshold":
+                threshold = float(value)
+            elif key == "--only":
+                names = [name for name in BENCHMARKS if any(part in name for part in value.split(","))]
+            else:
+                print(f"Error: Invalid argument --> [{arg}]")
+                exit(1)
+        except ValueError:
+            print(f"Error: Invalid number --> [{arg}]")
+            exit(1)
+
+    results = runBenchmarks(names, options["size"], options["steps"], max(1, options["repeat"]), options["seed"])
+    if outputFileName is not None:
+        f = open(outputFileName, "w")
+        f.write(json.dumps(results, indent=2))
+        f.close()
+    if baselineFileName is not None:
+        try:
+            f = open(baselineFileName, "r")
+            baseline = json.load(f)
+            f.close()
+        except FileNotFoundError:
+            print(f"Error: File not found --> ['{baselineFileName}' does not exists]")
+            exit(1)
+        print(f"Compared with {baselineFileName} ({baseline['version']}, threshold {threshold}%):")
+        regressions = compareResults(baseline, results, threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions")
+            exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+import array
+import struct
+import collections
+
+# Checkpoints of the whole machine state for stepping backwards: a checkpoint is taken every `interval` executed
+# instructions and the last `ringSize` of them are kept, so any step after the oldest one is restored by loading the
+# checkpoint before it and running forward again (the simulator is deterministic)
+
+CHECKPOINT_INTERVAL = 1000  # executed instructions between two checkpoints
+CHECKPOINT_RING_SIZE = 64  # checkpoints kept, the oldest ones are dropped
+
+# step, PC, flag bits, changed memory cells, changed memory IO cells
+CHECKPOINT_HEADER = struct.Struct("<qqBII")
+REGISTER_COUNT = 16
+
+
+def packMemory(memory):
+    # the changed cells (in the order of their first write) as two 16-bit arrays, the rest of the memory is untouched
+    addresses = array.array("H", memory.dirtyAddresses)
+    values = array.array("H", [memory.words[address] for address in memory.dirtyAddresses])
+    return addresses.tobytes() + values.tobytes()
+
+
+def restoreMemory(memory, data: bytes):
+    # untouched cells read back their own address again
+    words = memory.words
+    dirty = memory.dirty
+    for address in memory.dirtyAddresses:
+        words[address] = address
+        dirty[address] = 0
+    addresses = array.array("H")
+    values = array.array("H")
+    addresses.frombytes(data[:len(data) // 2])
+    values.frombytes(data[len(data) // 2:])
+    for index in range(0, len(addresses)):
+        words[addresses[index]] = values[index]
+        dirty[addresses[index]] = 1
+    memory.dirtyAddresses = addresses.tolist()
+
+
+def packState(sayac, step: int):
+    # machine state --> compact bytes (header, registers, changed memory and memory IO cells)
+    memory = packMemory(sayac.memory)
+    memoryIO = packMemory(sayac.memoryIO)
+    header = CHECKPOINT_HEADER.pack(step, sayac.PC, sayac.flagBits, len(memory), len(memoryIO))
+    return header + sayac.registers.tobytes() + memory + memoryIO
+
+
+def restoreState(sayac, data: bytes):
+    # --> step of the restored state
+    step, pc, flagBits, memorySize, memoryIOSize = CHECKPOINT_HEADER.unpack_from(data)
+    offset = CHECKPOINT_HEADER.size
+    registers = array.array("H")
+    registers.frombytes(data[offset:offset + REGISTER_COUNT * 2])
+    sayac.registers[:] = registers
+    offset += REGISTER_COUNT * 2
+    restoreMemory(sayac.memory, data[offset:offset + memorySize])
+    offset += memorySize
+    restoreMemory(sayac.memoryIO, data[offset:offset + memoryIOSize])
+    sayac.PC = pc
+    sayac.flagBits = flagBits
+    return step
+
+
+class Checkpoints:
+    def __init__(self, interval: int = CHECKPOINT_INTERVAL, ringSize: int = CHECKPOINT_RING_SIZE):
+        if interval < 1 or ringSize < 1:
+            raise ValueError("Checkpoint interval and ring size must be at least 1")
+        self.interval = interval
+        self.ring = collections.deque(maxlen=ringSize)  # packed states, oldest first
+        self.steps = collections.deque(maxlen=ringSize)  # their steps
+
+    def nextStep(self, step: int):
+        # the next step after step that gets a checkpoint
+        return (step // self.interval + 1) * self.interval
+
+    def take(self, sayac, step: int):
+        # only on the interval and once per step, replaying steps that already have their checkpoint keeps it
+        if step % self.interval != 0 or (self.steps and self.steps[-1] >= step):
+            return
+        self.ring.append(packState(sayac, step))
+        self.steps.append(step)
+
+    def oldestStep(self):
+        return self.steps[0] if self.steps else None
+
+    def before(self, step: int):
+        # --> index of the latest checkpoint at or before step, None if it is older than the ring
+        for index in range(len(self.steps) - 1, -1, -1):
+            if self.steps[index] <= step:
+                return index
+        return None
+
+    def restore(self, sayac, index: int):
+        # --> step of the restored checkpoint
+        return restoreState(sayac, self.ring[index])
+
+    def size(self):
+        # bytes held by the ring
+        return sum(len(data) for data in self.ring)
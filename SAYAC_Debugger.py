@@ -0,0 +1,418 @@
+import re
+
+from SAYAC_ISA import AssemblySyntaxError, baseNumberToInt, WORD_MASK
+from SAYAC_Checkpoint import Checkpoints
+
+# Run-to-breakpoint debugging: breakpoints replace the bound instruction at their PC with a trap, and watchpoints wrap
+# the memory writes of the machine, so everything else runs in the normal interpreter loop at full speed.
+
+CONDITION_TOKEN = re.compile(
+    r"\s*(?:"
+    r"(?P<register>r\d+)\b"
+    r"|m\[(?P<memoryIndex>[^\]]+)\]"
+    r"|m(?P<memory>0x[0-9a-fA-F]+|0b[01]+|\d+)\b"
+    r"|(?P<number>-?(?:0x[0-9a-fA-F]+|0b[01]+|\d+))\b"
+    r"|(?P<operator>==|!=|<=|>=|<|>|\(|\))"
+    r"|(?P<logic>and|or|not)\b"
+    r")"
+)
+
+
+def compileCondition(condition: str):
+    # "r3 == 100 and m[0x3e8] != 0" --> check(registers, memoryWords) -> bool
+    # only registers, memory cells, numbers, comparisons and and/or/not are accepted, values are 16-bit words
+    # (negative numbers are taken as their two's complement word)
+    parts = []
+    position = 0
+    condition = condition.strip()
+    while position < len(condition):
+        match = CONDITION_TOKEN.match(condition, position)
+        if match is None or match.end() == position:
+            raise AssemblySyntaxError(f"Invalid condition '{condition}' at '{condition[position:].strip()}'")
+        position = match.end()
+        if match.group("register") is not None:
+            register = int(match.group("register")[1:])
+            if register > 15:
+                raise AssemblySyntaxError(f"Invalid register '{match.group('register')}'")
+            parts.append(f"registers[{register}]")
+        elif match.group("memoryIndex") is not None or match.group("memory") is not None:
+            address = match.group("memoryIndex") or match.group("memory")
+            parts.append(f"memoryWords[{baseNumberToInt(address.strip()) & WORD_MASK}]")
+        elif match.group("number") is not None:
+            number = match.group("number")
+            if number.startswith("-"):
+                value = -baseNumberToInt(number[1:])
+            else:
+                value = baseNumberToInt(number)
+            parts.append(str(value & WORD_MASK))
+        elif match.group("operator") is not None:
+            parts.append(match.group("operator"))
+        elif match.group("logic") is not None:
+            parts.append(f" {match.group('logic')} ")
+    source = "lambda registers, memoryWords: bool(" + " ".join(parts) + ")"
+    try:
+        return eval(compile(source, "<condition>", "eval"), {"__builtins__": {"bool": bool}})
+    except SyntaxError:
+        raise AssemblySyntaxError(f"Invalid condition '{condition}'")
+
+
+class Breakpoint:
+    def __init__(self, number: int, pc: int, condition: str = None):
+        self.number = number
+        self.pc = pc
+        self.condition = condition
+        self.check = compileCondition(condition) if condition is not None else None
+
+
+class Watchpoint:
+    def __init__(self, number: int, address: int, fromIO: bool = False):
+        self.number = number
+        self.address = address
+        self.fromIO = fromIO
+
+    def describe(self):
+        return f"{'io' if self.fromIO else 'm'}[0x{self.address:04x}]"
+
+
+class BreakpointHit(Exception):
+    def __init__(self, breakpoint: Breakpoint):
+        self.breakpoint = breakpoint
+
+
+class WatchpointHit(Exception):
+    def __init__(self, watchpoint: Watchpoint, oldValue: int, value: int):
+        self.watchpoint = watchpoint
+        self.oldValue = oldValue
+        self.value = value
+
+
+class Debugger:
+    def __init__(self, sayac, program: list, listing: list, lineNumbers: list = None, exeCommand=None,
+                 checkpoints: Checkpoints = None):
+        self.sayac = sayac
+        self.program = program  # bound program, breakpoints put their traps in here
+        self.instructions = list(program)  # the bound instructions without traps
+        self.listing = listing
+        self.lineNumbers = lineNumbers  # source line of every PC, None for images
+        self.exeCommand = exeCommand  # inspection commands (r, m, f, a) of the simulator
+        self.breakpoints = {}  # number --> Breakpoint
+        self.watchpoints = {}  # number --> Watchpoint
+        self.nextNumber = 1
+        self.watchedAddresses = {}  # (fromIO, address) --> Watchpoint
+        self.writeMemory = sayac.writeMemory
+        self.steps = 0  # executed instructions
+        self.checkpoints = checkpoints if checkpoints is not None else Checkpoints()
+        self.checkpoints.take(sayac, 0)
+
+    # Breakpoints and watchpoints
+
+    def pcOfLine(self, line: int):
+        # first instruction on the line or after it
+        for pc, lineNumber in enumerate(self.lineNumbers):
+            if lineNumber >= line:
+                return pc
+        raise AssemblySyntaxError(f"No instruction on line {line} or after it")
+
+    def addBreakpoint(self, pc: int, condition: str = None):
+        if not 0 <= pc < len(self.program):
+            raise AssemblySyntaxError(f"PC {pc} is outside of the program")
+        breakpoint = Breakpoint(self.nextNumber, pc, condition)
+        self.nextNumber += 1
+        self.breakpoints[breakpoint.number] = breakpoint
+        self.updateTrap(pc)
+        return breakpoint
+
+    def addWatchpoint(self, address: int, fromIO: bool = False):
+        watchpoint = Watchpoint(self.nextNumber, address & WORD_MASK, fromIO)
+        self.nextNumber += 1
+        self.watchpoints[watchpoint.number] = watchpoint
+        self.updateWatch()
+        return watchpoint
+
+    def delete(self, number: int):
+        if number in self.breakpoints:
+            self.updateTrap(self.breakpoints.pop(number).pc)
+        elif number in self.watchpoints:
+            del self.watchpoints[number]
+            self.updateWatch()
+        else:
+            raise AssemblySyntaxError(f"No breakpoint or watchpoint {number}")
+
+    def updateTrap(self, pc: int):
+        # the instruction at pc checks its breakpoints before it runs
+        breakpoints = [breakpoint for breakpoint in self.breakpoints.values() if breakpoint.pc == pc]
+        instruction = self.instructions[pc]
+        if not breakpoints:
+            self.program[pc] = instruction
+            return
+        registers = self.sayac.registers
+        memoryWords = self.sayac.memory.words
+
+        def trap():
+            for breakpoint in breakpoints:
+                if breakpoint.check is None or breakpoint.check(registers, memoryWords):
+                    raise BreakpointHit(breakpoint)
+            instruction()
+        self.program[pc] = trap
+
+    def updateWatch(self):
+        # memory writes are only wrapped while there are watchpoints
+        self.watchedAddresses = {(watchpoint.fromIO, watchpoint.address): watchpoint
+                                 for watchpoint in self.watchpoints.values()}
+        if not self.watchedAddresses:
+            self.sayac.__dict__.pop("writeMemory", None)
+            return
+        sayac = self.sayac
+        writeMemory = self.writeMemory
+        watchedAddresses = self.watchedAddresses
+
+        def watchedWriteMemory(address: int, value: int, fromIO: bool = False):
+            watchpoint = watchedAddresses.get((fromIO, address))
+            if watchpoint is None:
+                writeMemory(address, value, fromIO)
+                return
+            oldValue = sayac.readMemory(address, fromIO)
+            writeMemory(address, value, fromIO)
+            raise WatchpointHit(watchpoint, oldValue, value)
+        sayac.writeMemory = watchedWriteMemory
+
+    # Execution
+
+    def location(self, pc: int):
+        if self.lineNumbers is None or not 0 <= pc < len(self.lineNumbers):
+            return f"pc {pc}"
+        return f"line {self.lineNumbers[pc]} (pc {pc})"
+
+    def halted(self):
+        return not 0 <= self.sayac.PC < len(self.program)
+
+    def step(self):
+        # runs the instruction at the PC, breakpoints there do not stop it --> False if a watchpoint stopped it
+        sayac = self.sayac
+        try:
+            self.instructions[sayac.PC]()
+        except WatchpointHit as hit:
+            # the write has been done, finish the instruction
+            sayac.PC += 1
+            self.steps += 1
+            self.checkpoints.take(sayac, self.steps)
+            self.reportWatchpoint(hit)
+            return False
+        sayac.PC += 1
+        self.steps += 1
+        self.checkpoints.take(sayac, self.steps)
+        return True
+
+    def cont(self):
+        # runs until a breakpoint, a watchpoint or the end of the program
+        sayac = self.sayac
+        program = self.program
+        programLength = len(program)
+        checkpoints = self.checkpoints
+        # the instruction at the PC may hold the breakpoint we stopped at
+        if not self.step():
+            return
+        steps = self.steps
+        checkpointStep = checkpoints.nextStep(steps)
+        try:
+            while 0 <= sayac.PC < programLength:
+                program[sayac.PC]()
+                sayac.PC += 1
+                steps += 1
+                if steps == checkpointStep:
+                    checkpoints.take(sayac, steps)
+                    checkpointStep += checkpoints.interval
+        except BreakpointHit as hit:
+            breakpoint = hit.breakpoint
+            condition = f" if {breakpoint.condition}" if breakpoint.condition is not None else ""
+            print(f"Breakpoint {breakpoint.number}{condition} at {self.location(breakpoint.pc)}")
+        except WatchpointHit as hit:
+            sayac.PC += 1
+            steps += 1
+            checkpoints.take(sayac, steps)
+            self.reportWatchpoint(hit)
+        finally:
+            self.steps = steps
+
+    def reportWatchpoint(self, hit: WatchpointHit):
+        print(f"Watchpoint {hit.watchpoint.number}: {hit.watchpoint.describe()} {hit.oldValue} -> {hit.value} "
+              f"at {self.location(self.sayac.PC - 1)}")
+
+    # Reverse execution: restore the checkpoint before the wanted step and run forward to it
+
+    def replay(self, step: int, hits: list = None):
+        # runs forward from the current state to step (or the end of the program) without stopping
+        # hits collects the steps at which a breakpoint or watchpoint would have stopped the run
+        sayac = self.sayac
+        instructions = self.instructions
+        programLength = len(instructions)
+        checkpoints = self.checkpoints
+        steps = self.steps
+        breakpointPCs = {}
+        written = []
+        if hits is not None:
+            for breakpoint in self.breakpoints.values():
+                breakpointPCs.setdefault(breakpoint.pc, []).append(breakpoint)
+        writeMemory = self.writeMemory
+        watchedAddresses = self.watchedAddresses
+
+        def replayWriteMemory(address: int, value: int, fromIO: bool = False):
+            if (fromIO, address) in watchedAddresses:
+                written.append(address)
+            writeMemory(address, value, fromIO)
+        sayac.writeMemory = replayWriteMemory
+        try:
+            while steps < step and 0 <= sayac.PC < programLength:
+                pc = sayac.PC
+                if pc in breakpointPCs and any(breakpoint.check is None or
+                                               breakpoint.check(sayac.registers, sayac.memory.words)
+                                               for breakpoint in breakpointPCs[pc]):
+                    hits.append(steps)
+                instructions[pc]()
+                sayac.PC += 1
+                steps += 1
+                if written:
+                    if hits is not None:
+                        hits.append(steps)
+                    written.clear()
+                checkpoints.take(sayac, steps)
+        finally:
+            self.steps = steps
+            self.updateWatch()
+
+    def goto(self, step: int):
+        # state at the given step, earlier steps are replayed from the nearest checkpoint before them
+        if step < self.steps:
+            index = self.checkpoints.before(step)
+            if index is None:
+                raise AssemblySyntaxError(f"Step {step} is older than the oldest checkpoint "
+                                          f"(step {self.checkpoints.oldestStep()})")
+            self.steps = self.checkpoints.restore(self.sayac, index)
+        self.replay(step)
+
+    def reverseContinue(self):
+        # back to the last step before the current one where a breakpoint or watchpoint would have stopped the run
+        current = self.steps
+        end = current
+        index = self.checkpoints.before(current - 1)
+        while index is not None:
+            self.steps = self.checkpoints.restore(self.sayac, index)
+            start = self.steps
+            hits = []
+            self.replay(end, hits)
+            hits = [hit for hit in hits if hit < current]
+            if hits:
+                self.goto(hits[-1])
+                print(f"Stopped at step {hits[-1]}")
+                return
+            if start == 0:
+                break
+            end = start
+            index = self.checkpoints.before(start - 1)
+        # nothing stopped the run, go as far back as the checkpoints reach
+        self.goto(self.checkpoints.oldestStep())
+        print(f"No breakpoint or watchpoint before step {current}, back at step {self.steps}")
+
+    # Commands
+
+    def printLocation(self):
+        pc = self.sayac.PC
+        if self.halted():
+            print(f"Program finished (step {self.steps})")
+        else:
+            print(f"{self.location(pc)}, step {self.steps}: {self.listing[pc]}")
+
+    def exeBreakCommand(self, args: str):
+        # "b <line> [if <condition>]" or "b pc<n> [if <condition>]"
+        target, _, condition = args.partition(" if ")
+        target = target.strip()
+        condition = condition.strip() or None
+        if target.startswith("pc"):
+            pc = baseNumberToInt(target[2:].strip())
+        elif self.lineNumbers is None:
+            # images have no source lines
+            pc = baseNumberToInt(target)
+        else:
+            pc = self.pcOfLine(baseNumberToInt(target))
+        breakpoint = self.addBreakpoint(pc, condition)
+        suffix = f" if {condition}" if condition is not None else ""
+        print(f"Breakpoint {breakpoint.number} at {self.location(pc)}{suffix}")
+
+    def exeWatchCommand(self, args: str):
+        # "w m<address>", "w m[<address>]" or "w io<address>"
+        args = args.strip()
+        fromIO = args.startswith("io")
+        address = args[2:] if fromIO else args[1:]
+        if not (fromIO or args.startswith("m")):
+            raise AssemblySyntaxError(f"Invalid watchpoint '{args}' (use m<address> or io<address>)")
+        address = address.strip().strip("[]").strip()
+        watchpoint = self.addWatchpoint(baseNumberToInt(address), fromIO)
+        print(f"Watchpoint {watchpoint.number} on writes to {watchpoint.describe()}")
+
+    def exeListCommand(self):
+        for number in sorted(list(self.breakpoints) + list(self.watchpoints)):
+            if number in self.breakpoints:
+                breakpoint = self.breakpoints[number]
+                suffix = f" if {breakpoint.condition}" if breakpoint.condition is not None else ""
+                print(f"{number}: breakpoint at {self.location(breakpoint.pc)}{suffix}")
+            else:
+                print(f"{number}: watchpoint on writes to {self.watchpoints[number].describe()}")
+
+    def prompt(self):
+        # debugger commands until one of them runs the program --> "step", "continue" or "quit"
+        while True:
+            print("sayac:debug>>> ", end="")
+            try:
+                cmd = input().strip()
+            except EOFError:
+                print()
+                return "quit"
+            command, _, args = cmd.partition(" ")
+            try:
+                if cmd == "" or cmd == "s":
+                    return "step"
+                elif cmd == "c":
+                    return "continue"
+                elif cmd == "q":
+                    return "quit"
+                elif command == "b":
+                    self.exeBreakCommand(args)
+                elif command == "w":
+                    self.exeWatchCommand(args)
+                elif command == "d":
+                    self.delete(baseNumberToInt(args.strip()))
+                elif cmd == "l":
+                    self.exeListCommand()
+                elif cmd == "p":
+                    self.printLocation()
+                elif cmd == "rs":
+                    self.goto(max(0, self.steps - 1))
+                    self.printLocation()
+                elif cmd == "rc":
+                    self.reverseContinue()
+                    self.printLocation()
+                elif command == "g":
+                    self.goto(baseNumberToInt(args.strip()))
+                    self.printLocation()
+                elif self.exeCommand is None or not self.exeCommand(self.sayac, cmd):
+                    print("Invalid command")
+            except AssemblySyntaxError as e:
+                print(f"Error: {e.message}")
+            except Exception as e:
+                print(f"Invalid command: {e}")
+
+    def run(self):
+        # --> True if the program finished, False if the user quit
+        self.printLocation()
+        while True:
+            action = self.prompt()
+            if action == "quit":
+                return False
+            if self.halted():
+                # stepping past the end closes the session, until then it can still go back
+                return True
+            if action == "step":
+                self.step()
+            else:
+                self.cont()
+            self.printLocation()
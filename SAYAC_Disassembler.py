@@ -0,0 +1,139 @@
+import sys
+import os
+
+from SAYAC_ISA import AssemblySyntaxError, decodeWord, lexLines
+from SAYAC_Image import IMAGE_AUTO, IMAGE_FORMATS, loadImage
+from SAYAC_Inst2Bin import VERSION
+from SAYAC_Labels import resolveLabels
+from SAYAC_Preprocessor import preprocess
+
+# Images (SAYAC_Inst2Bin.py output or any other 16-bit word image) back to SAYAC Assembly. Every possible word is
+# decoded once into a 65,536-entry table, so disassembling is one table lookup per word whatever the image size.
+# The output assembles again; words that are not instructions become comments and annotations are comments too.
+
+WORD_COUNT = 1 << 16
+ANNOTATION_COLUMN = 24  # instruction text is padded to this width before the annotation comment
+
+decodeTable = None  # word --> (spec, operands), None if the word is not an instruction
+textTable = None  # word --> instruction text
+annotatedTable = None  # word --> instruction text padded to the annotation comment
+
+
+def buildTables():
+    global decodeTable, textTable, annotatedTable
+    if decodeTable is not None:
+        return
+    decoded = [None] * WORD_COUNT
+    texts = [None] * WORD_COUNT
+    for word in range(0, WORD_COUNT):
+        try:
+            spec, operands = decodeWord(word)
+        except AssemblySyntaxError:
+            texts[word] = f"// invalid instruction word 0x{word:04x}"
+            continue
+        decoded[word] = (spec, operands)
+        texts[word] = spec.formatInstruction(operands)
+    decodeTable = decoded
+    textTable = texts
+    # at least one space before the comment, also after a text as wide as the column
+    annotatedTable = [f"{text:<{ANNOTATION_COLUMN - 1}} // " for text in texts]
+
+
+def disassembleWords(words, addresses: bool = False, sources: list = None):
+    # [word] --> [instruction text], annotated with the address and/or the source of every word
+    buildTables()
+    if not addresses and sources is None:
+        texts = textTable
+        return [texts[word] for word in words]
+    annotated = annotatedTable
+    if sources is None:
+        return [f"{annotated[word]}0x{address:04x}" for address, word in enumerate(words)]
+    if len(sources) < len(words):
+        # words after the end of the source have no annotation
+        sources = list(sources) + [""] * (len(words) - len(sources))
+    if not addresses:
+        return [annotated[word] + source for word, source in zip(words, sources)]
+    return [f"{annotated[word]}0x{address:04x}  {source}" for address, (word, source) in enumerate(zip(words, sources))]
+
+
+def invalidWordCount(words):
+    buildTables()
+    table = decodeTable
+    return sum(1 for word in words if table[word] is None)
+
+
+def sourceAnnotations(insFileName):
+    # SAYAC Assembly file --> "line <n>: <source text>" of every instruction word it assembles to
+    f = open(insFileName, "r")
+    try:
+        sourceLines = f.read().splitlines()
+    finally:
+        f.close()
+    statements = resolveLabels(preprocess(lexLines(sourceLines), os.path.dirname(insFileName)))
+    return [f"line {line}: {sourceLines[line - 1].strip()}" for line, tokens in statements]
+
+
+def disassembleFile(binFileName, outputFileName: str, imageFormat: str = IMAGE_AUTO, addresses: bool = False,
+                    insFileName: str = None):
+    # image file --> SAYAC Assembly file ("-" for stdout), --> (number of words, number of invalid words)
+    words = loadImage(binFileName, imageFormat)
+    sources = None
+    if insFileName is not None:
+        sources = sourceAnnotations(insFileName)
+        if len(sources) != len(words):
+            print(f"Warning: '{insFileName}' assembles to {len(sources)} words, the image has {len(words)}")
+    text = "\n".join(disassembleWords(words, addresses, sources)) + "\n"
+    if outputFileName == "-":
+        sys.stdout.write(text)
+    else:
+        outputFile = open(outputFileName, "w")
+        outputFile.write(text)
+        outputFile.close()
+    return len(words), invalidWordCount(words)
+
+
+def main():
+    # App info
+    print(f"SAYAC Disassembler {VERSION}")
+
+    if len(sys.argv) < 2:
+        print("Error: Not enough arguments --> [file name not found]")
+        exit(1)
+
+    binFileName = sys.argv[1]
+    outputFileName = binFileName.rsplit(".", maxsplit=1)[0] + ".dis.txt"
+    imageFormat = IMAGE_AUTO
+    addresses = False
+    insFileName = None
+    for arg in sys.argv[2:]:
+        if arg.startswith("--image="):
+            imageFormat = arg.split("=", 1)[1]
+            if imageFormat not in (IMAGE_AUTO,) + IMAGE_FORMATS:
+                print(f"Error: Invalid image format --> [{imageFormat}]")
+                exit(1)
+        elif arg == "--address":
+            addresses = True
+        elif arg.startswith("--source="):
+            insFileName = arg.split("=", 1)[1]
+        elif arg.startswith("--output="):
+            outputFileName = arg.split("=", 1)[1]
+        else:
+            print(f"Error: Invalid argument --> [{arg}]")
+            exit(1)
+
+    try:
+        wordCount, invalidCount = disassembleFile(binFileName, outputFileName, imageFormat, addresses, insFileName)
+    except FileNotFoundError as e:
+        print(f"Error: File not found --> ['{e.filename}' does not exists]")
+        exit(1)
+    except AssemblySyntaxError as e:
+        print(f"Error: {e.message}")
+        exit(1)
+    if invalidCount != 0:
+        print(f"Warning: {invalidCount} of {wordCount} words are not instructions")
+    if outputFileName != "-":
+        print("Successfully Disassembled!")
+
+
+if __name__ == "__main__":
+    main()
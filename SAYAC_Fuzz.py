@@ -0,0 +1,251 @@
+import sys
+import os
+import time
+import random
+import concurrent.futures
+
+import SAYAC_Inst2Bin
+import SAYAC_Batch
+from SAYAC_ISA import AssemblySyntaxError, INSTRUCTION_SET, FIB_FLAGS, baseNumberToInt, lexLines
+from SAYAC_Assembler import VERSION, Sayac, decodeSourceProgram, decodeImageProgram, bindProgram
+from SAYAC_Disassembler import disassembleWords
+from SAYAC_Image import IMAGE_AUTO, IMAGE_FORMATS, IMAGE_TEXT, IMAGE_IHEX, IMAGE_READMEMH, IMAGE_READMEMB
+from SAYAC_Image import formatImage, parseImage
+from SAYAC_JIT import BlockJIT
+from SAYAC_Labels import resolveLabels
+from SAYAC_Preprocessor import preprocess
+
+# Differential fuzzing of the encoder, the image formats and the simulators: random valid programs are assembled to
+# words, the words are written to and read from every image format and decoded back, and the program runs in the
+# interpreter, the block JIT and the batch simulator. Any difference is a mismatch:
+#   - the text encoder (SAYAC_Inst2Bin.parseInstruction) and the table encoder (encodeWords) give different words
+#   - an image (read with its format, and detected for the text formats and Intel HEX) holds other words
+#   - a word decodes to another instruction or other operands than its source line
+#   - the disassembly of the words does not assemble to the same words
+#   - the JIT (every block compiled) or the batch simulator (needs NumPy) end in another state than the interpreter
+#     (registers, flags, PC, memory, memory IO, or whether it failed); the batch simulator only runs the first
+#     BATCH_STEPS instructions
+# Every program comes from its own seed, so "--seed=<seed> --programs=1" runs a reported program again.
+
+DEFAULT_PROGRAMS = 10000  # programs of one run
+DEFAULT_LENGTH = 40  # instructions of every program
+DEFAULT_STEPS = 2000  # executed instructions before a program (e.g. an endless loop) is stopped
+BATCH_PROGRAMS = 250  # programs of one task of the process pool
+BATCH_STEPS = 200  # executed instructions compared with the batch simulator (a NumPy step costs about 50 us)
+
+REGISTER_SPELLINGS = ("r{}", "__r{}")
+DETECTED_FORMATS = (IMAGE_TEXT, IMAGE_IHEX, IMAGE_READMEMH, IMAGE_READMEMB)  # raw images can look like text
+MNEMONIC_SPELLINGS = (str.upper, str.lower)
+
+
+def randomOperand(rand: random.Random, spec, name: str):
+    shift, width, signed = spec.fields[name]
+    if name.startswith("r"):
+        return rand.choice(REGISTER_SPELLINGS).format(rand.randrange(0, 1 << width))
+    if name == "fib":
+        value = rand.randrange(0, 1 << width) & ~0b111 | rand.choice(list(FIB_FLAGS))
+    else:
+        # both the two's complement and the unsigned spelling of the field
+        value = rand.randrange(-(1 << (width - 1)), 1 << width)
+    if value < 0:
+        return str(value)
+    if signed and value >> (width - 1):
+        # the unsigned spelling of a signed field is only accepted as a bit pattern
+        return rand.choice((str(value - (1 << width)), f"0x{value:x}", f"0b{value:b}"))
+    return rand.choice(("{}", "0x{:x}", "0b{:b}")).format(value)
+
+
+def randomProgram(seed: int, length: int = DEFAULT_LENGTH):
+    # --> source lines of length random instructions (every instruction and alias, every operand spelling)
+    rand = random.Random(seed)
+    lines = []
+    for _ in range(0, length):
+        spec = rand.choice(INSTRUCTION_SET)
+        tokens = [rand.choice(MNEMONIC_SPELLINGS)(spec.mnemonic)]
+        tokens += [randomOperand(rand, spec, name) for name in spec.operands]
+        lines.append(" ".join(tokens))
+    return lines
+
+
+def machineState(sayac, failed: bool):
+    return {
+        "PC": sayac.PC,
+        "failed": failed,
+        "registers": sayac.registers.tolist(),
+        "flags": sayac.flagBits,
+        "memory": sayac.memory.changed(),
+        "memoryIO": sayac.memoryIO.changed(),
+    }
+
+
+def execute(program: list, maxSteps: int):
+    # [(execute, operands)] --> final state of a run of at most maxSteps instructions
+    sayac = Sayac()
+    boundProgram = bindProgram(program, sayac)
+    steps = 0
+    failed = False
+    try:
+        while 0 <= sayac.PC < len(boundProgram) and steps < maxSteps:
+            boundProgram[sayac.PC]()
+            sayac.PC += 1
+            steps += 1
+    except Exception:
+        failed = True
+    return machineState(sayac, failed)
+
+
+def executeJIT(program: list, maxSteps: int):
+    # [(execute, operands)] --> final state of a run of at most maxSteps instructions in the block JIT, every block is
+    # compiled on its first use
+    sayac = Sayac()
+    failed = False
+    try:
+        BlockJIT(program, hotThreshold=1).run(sayac, bindProgram(program, sayac), maxSteps)
+    except Exception:
+        failed = True
+    return machineState(sayac, failed)
+
+
+def executeBatch(program: list, maxSteps: int):
+    # [(execute, operands)] --> final state of a run of one instance of the batch simulator
+    batch = SAYAC_Batch.BatchSayac(1)
+    batch.run(program, maxSteps)
+    return {
+        "PC": int(batch.PC[0]),
+        "failed": bool(batch.faulted[0]),
+        "registers": batch.registers[0].tolist(),
+        "flags": int(batch.flagBits[0]),
+        "memory": batch.memory.changed(0),
+        "memoryIO": batch._memoryIO.changed(0) if batch._memoryIO is not None else {},
+    }
+
+
+def compareStates(name: str, expected: dict, actual: dict):
+    # --> [mismatch] of a run against the one of the interpreter
+    return [f"{key} after the {name} is {actual[key]}, after the interpreter {expected[key]}"
+            for key in expected if expected[key] != actual[key]]
+
+
+def checkProgram(lines: list, maxSteps: int = DEFAULT_STEPS):
+    # source lines --> [mismatch]
+    try:
+        statements = list(resolveLabels(preprocess(lexLines(lines))))
+        program, listing, lineNumbers = decodeSourceProgram(statements)
+        words = SAYAC_Inst2Bin.encodeWords(lines)
+    except AssemblySyntaxError as e:
+        return [f"valid program rejected: {e.message}"]
+    mismatches = []
+    for index, (line, tokens) in enumerate(statements):
+        bits = SAYAC_Inst2Bin.parseInstruction(" ".join(tokens), line)
+        if int(bits.replace("_", ""), 2) != words[index]:
+            mismatches.append(f"line {line}: '{listing[index]}' is {bits} in text and 0x{words[index]:04x} in tables")
+    for imageFormat in IMAGE_FORMATS:
+        image = formatImage(words, imageFormat)
+        readFormats = (imageFormat, IMAGE_AUTO) if imageFormat in DETECTED_FORMATS else (imageFormat,)
+        for readFormat in readFormats:
+            try:
+                imageWords = parseImage(image, readFormat)
+            except AssemblySyntaxError as e:
+                imageWords = e.message
+            if imageWords != words.tolist():
+                mismatches.append(f"the {imageFormat} image read as {readFormat} is not the words")
+    try:
+        imageProgram, imageListing, imageLines = decodeImageProgram(words)
+    except AssemblySyntaxError as e:
+        return mismatches + [f"words do not decode: {e.message}"]
+    for index in range(0, len(program)):
+        handler, operands = imageProgram[index]
+        if handler != program[index][0] or tuple(operands) != tuple(program[index][1]):
+            mismatches.append(f"line {lineNumbers[index]}: '{listing[index]}' decodes to '{imageListing[index]}'")
+    if SAYAC_Inst2Bin.encodeWords(disassembleWords(words)) != words:
+        mismatches.append("the disassembly does not assemble to the same words")
+    expected = execute(program, maxSteps)
+    mismatches += compareStates("JIT", expected, executeJIT(program, maxSteps))
+    if SAYAC_Batch.np is not None:
+        batchSteps = min(maxSteps, BATCH_STEPS)
+        if batchSteps < maxSteps:
+            expected = execute(program, batchSteps)
+        mismatches += compareStates("batch simulator", expected, executeBatch(program, batchSteps))
+    return mismatches
+
+
+def fuzzBatch(seeds: range, length: int = DEFAULT_LENGTH, maxSteps: int = DEFAULT_STEPS):
+    # --> (number of programs, [(seed, [mismatch])] of the programs with mismatches)
+    failures = []
+    for seed in seeds:
+        try:
+            mismatches = checkProgram(randomProgram(seed, length), maxSteps)
+        except Exception as e:
+            mismatches = [f"unhandled exception --> [{type(e).__name__}: {e}]"]
+        if mismatches:
+            failures.append((seed, mismatches))
+    return len(seeds), failures
+
+
+def fuzz(seed: int, programs: int = DEFAULT_PROGRAMS, length: int = DEFAULT_LENGTH, maxSteps: int = DEFAULT_STEPS,
+         jobs: int = None):
+    # --> [(seed, [mismatch])], the programs seed to seed + programs - 1 are checked on a process pool
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    batches = [range(start, min(start + BATCH_PROGRAMS, seed + programs))
+               for start in range(seed, seed + programs, BATCH_PROGRAMS)]
+    jobs = max(1, min(jobs, len(batches)))
+    failures = []
+    if jobs == 1:
+        for batch in batches:
+            failures += fuzzBatch(batch, length, maxSteps)[1]
+        return failures
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+        tasks = [pool.submit(fuzzBatch, batch, length, maxSteps) for batch in batches]
+        for task in concurrent.futures.as_completed(tasks):
+            failures += task.result()[1]
+    return sorted(failures)
+
+
+def writeFailure(seed: int, mismatches: list, length: int = DEFAULT_LENGTH):
+    # fuzz-<seed>.txt: the mismatches (as comments) and the program
+    fileName = f"fuzz-{seed}.txt"
+    f = open(fileName, "w")
+    f.write("".join(f"// {mismatch}\n" for mismatch in mismatches))
+    f.write("\n".join(randomProgram(seed, length)) + "\n")
+    f.close()
+    return fileName
+
+
+def main():
+    # App info
+    print(f"SAYAC Fuzzer {VERSION}")
+
+    options = {"programs": DEFAULT_PROGRAMS, "length": DEFAULT_LENGTH, "steps": DEFAULT_STEPS,
+               "seed": int(time.time()), "jobs": os.cpu_count() or 1}
+    for arg in sys.argv[1:]:
+        key, _, value = arg.partition("=")
+        try:
+            if key[2:] in options and value != "":
+                options[key[2:]] = baseNumberToInt(value)
+            else:
+                print(f"Error: Invalid argument --> [{arg}]")
+                exit(1)
+        except ValueError:
+            print(f"Error: Invalid number --> [{arg}]")
+            exit(1)
+    if min(options["programs"], options["length"], options["steps"], options["jobs"]) < 1 or options["seed"] < 0:
+        print("Error: Invalid number --> [programs, length, steps and jobs are at least 1, the seed at least 0]")
+        exit(1)
+
+    startTime = time.perf_counter()
+    failures = fuzz(options["seed"], options["programs"], options["length"], options["steps"], options["jobs"])
+    totalTime = time.perf_counter() - startTime
+    for seed, mismatches in failures:
+        fileName = writeFailure(seed, mismatches, options["length"])
+        print(f"Mismatch: seed {seed} ({fileName})")
+        for mismatch in mismatches:
+            print(f"    {mismatch}")
+    print(f"{options['programs']} programs from seed {options['seed']}: {len(failures)} with mismatches "
+          f"({totalTime:.2f} s, {options['programs'] / totalTime * 60:,.0f} programs/min, {options['jobs']} jobs)")
+    if failures:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
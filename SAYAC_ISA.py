@@ -0,0 +1,580 @@
+import re
+import array
+
+# SAYAC instruction set, shared by the binary converter (SAYAC_Inst2Bin.py) and the simulator (SAYAC_Assembler.py)
+
+INS_LdR = "ldr"  # load from memory
+INS_LdRio = "ldrio"  # load from I/O peripheral
+INS_STR = "str"  # Store to memory
+INS_STRio = "strio"  # Store to I/O peripheral
+INS_JMR = "jmr"  # Jump to address
+INS_JMRs = "jmrs"  # Jump to address & save PC
+INS_JMI = "jmi"  # Jump to immediate address
+INS_ANR = "anr"  # Logical AND operation
+INS_AND = "and"  # Logical AND operation # TODO: remove this line (instruction is not in the ISR)
+INS_ANI = "ani"  # Logical AND operation with immediate value
+INS_MSI = "msi"  # Move low sign extended immediate to register
+INS_MHI = "mhi"  # Move high immediate to register
+INS_SLR = "slr"  # Logical Left/Right shift
+INS_SAR = "sar"  # Arithmetic Left/Right shift
+INS_ADD = "add"  # Adding two registers
+INS_ADR = "adr"  # Adding two registers
+INS_SUB = "sub"  # Subtracting two registers
+INS_SUR = "sur"  # Subtracting two registers
+INS_ADI = "adi"  # Adding Immediate to register
+INS_SUI = "sui"  # Subtracting Immediate from register
+INS_MUL = "mul"  # Multiplying two registers
+INS_DIV = "div"  # Dividing two registers
+INS_CMR = "cmr"  # Comparing two registers
+INS_CMI = "cmi"  # Comparing register and Immediate value
+INS_BRC = "brc"  # Branch Registered with Condition
+INS_BRR = "brr"  # Branch Registered Relative with Condition
+INS_SHI = "shi"  # Arithmetic Logical shift with immediate
+INS_SHIla = "shila"  # Arithmetic Logical shift with immediate
+INS_NTR = "ntr"  # Logical NOT
+INS_NTR2c = "ntr2c"  # Logical NOT 2's complement
+INS_NTD = "ntd"  # Logical NOT
+INS_NTD2c = "ntd2c"  # Logical NOT 2's complement
+
+
+COMMENT_START = re.compile(r"//|/\*")
+
+
+def lexLines(lines):
+    # source lines (any iterable of lines, e.g. an open file) --> (source line number, tokens) of every instruction
+    # streams one line at a time, "//" comments end at the end of the line and "/* */" comments can span lines
+    # (a comment counts as a space), ";" separates instructions on the same line
+    inComment = False
+    commentLine = 0
+    line = 0
+    for text in lines:
+        line += 1
+        if not inComment and "/" not in text:
+            # no comment on the line
+            if ";" not in text:
+                tokens = text.split()
+                if tokens:
+                    yield line, tokens
+                continue
+            for statement in text.split(";"):
+                tokens = statement.split()
+                if tokens:
+                    yield line, tokens
+            continue
+        code = []
+        position = 0
+        while position < len(text):
+            if inComment:
+                commentEnd = text.find("*/", position)
+                if commentEnd < 0:
+                    break
+                inComment = False
+                code.append(" ")
+                position = commentEnd + 2
+                continue
+            match = COMMENT_START.search(text, position)
+            if match is None:
+                code.append(text[position:])
+                break
+            code.append(text[position:match.start()])
+            if match.group() == "//":
+                break
+            inComment = True
+            commentLine = line
+            position = match.end()
+        for statement in "".join(code).split(";"):
+            tokens = statement.split()
+            if tokens:
+                yield line, tokens
+    if inComment:
+        raise AssemblySyntaxError(f"Comment on line {commentLine} is never closed")
+
+
+def commentRemover(lines: list):
+    # source lines --> instructions without comments, one per item
+    return [" ".join(tokens) for line, tokens in lexLines(lines)]
+
+
+# Exceptions
+class AssemblySyntaxError(Exception):
+    def __init__(self, message, line: int = None):
+        self.message = message
+        self.line = line  # source line of the error when it is known
+
+
+def hexToInt(num: str):
+    if num.startswith("0x"):
+        return int(num, 0)
+    return int(num, 16)
+
+
+def intToBin(num: int, n: int):
+    binNum = bin(int(num)).replace("0b", "")[-n:]
+    while len(binNum) < n:
+        binNum = "0" + binNum
+    if len(binNum) > n:
+        return binNum[-n:]
+    return binNum
+
+
+def baseNumberToInt(num: str):
+    if num.startswith("0x"):
+        return hexToInt(num)
+    elif num.startswith("0b"):
+        return int(num, 2)
+    return int(num)
+
+
+WORD_MASK = 0xFFFF  # registers and memory cells are 16 bits wide
+
+# flags are packed into one int (Sayac.flagBits)
+FLAG_BIT_GT = 1 << 0
+FLAG_BIT_GT_EQ = 1 << 1
+FLAG_BIT_EQ = 1 << 2
+FLAG_BIT_NEQ = 1 << 3
+FLAG_BIT_LT = 1 << 4
+FLAG_BIT_LT_EQ = 1 << 5
+
+# flag bits after a compare
+FLAGS_EQUAL = FLAG_BIT_EQ | FLAG_BIT_GT_EQ | FLAG_BIT_LT_EQ
+FLAGS_GREATER = FLAG_BIT_GT | FLAG_BIT_NEQ
+FLAGS_LESS = FLAG_BIT_LT | FLAG_BIT_NEQ
+
+# flag names of the state files (Sayac.flags())
+FLAG_NAMES = {
+    "gt": FLAG_BIT_GT,
+    "gt_eq": FLAG_BIT_GT_EQ,
+    "eq": FLAG_BIT_EQ,
+    "neq": FLAG_BIT_NEQ,
+    "lt": FLAG_BIT_LT,
+    "lt_eq": FLAG_BIT_LT_EQ,
+}
+
+# flag interpretation bits (FIB[2:0]) --> flag bit of the machine
+FIB_FLAGS = {
+    0b000: FLAG_BIT_EQ,
+    0b001: FLAG_BIT_LT,
+    0b010: FLAG_BIT_GT,
+    0b011: FLAG_BIT_GT_EQ,
+    0b100: FLAG_BIT_LT_EQ,
+    0b101: FLAG_BIT_NEQ,
+}
+
+
+def toSigned(value: int):
+    # 16-bit word --> two's complement value
+    return value - 0x10000 if value & 0x8000 else value
+
+
+def shiftAmount(value: int):
+    # returns (isLeftShift, amount) from value[4:0], the sign bit selects the direction
+    if value & 0b10000:
+        return True, value & 0b1111
+    return False, value & 0b11111
+
+
+# Semantics (operands are decoded field values, in assembler syntax order; registers hold 16-bit words)
+def exeLdR(sayac, rd: int, rs1: int):
+    # rd <- mem[rs1]
+    sayac.registers[rd] = sayac.readMemory(sayac.registers[rs1])
+
+
+def exeLdRio(sayac, rd: int, rs1: int):
+    # rd <- memio[rs1]
+    sayac.registers[rd] = sayac.readMemory(sayac.registers[rs1], True)
+
+
+def exeSTR(sayac, rd: int, rs1: int):
+    # mem[rd] <- rs1
+    sayac.writeMemory(sayac.registers[rd], sayac.registers[rs1])
+
+
+def exeSTRio(sayac, rd: int, rs1: int):
+    # memio[rd] <- rs1
+    sayac.writeMemory(sayac.registers[rd], sayac.registers[rs1], True)
+
+
+def exeJMR(sayac, rd: int, rs1: int):
+    # PC <- PC + rs1
+    sayac.PC += toSigned(sayac.registers[rs1]) - 1
+
+
+def exeJMRs(sayac, rd: int, rs1: int):
+    # PC <- PC + rs1
+    # rd <- PC + 1
+    offset = toSigned(sayac.registers[rs1])
+    sayac.registers[rd] = (sayac.PC + 1) & WORD_MASK
+    sayac.PC += offset - 1
+
+
+def exeJMI(sayac, rd: int, imm: int):
+    # PC <- PC + imm
+    # rd <- PC + 1
+    sayac.registers[rd] = (sayac.PC + 1) & WORD_MASK
+    sayac.PC += imm - 1
+
+
+def exeANR(sayac, rd: int, rs1: int, rs2: int):
+    # rd <- rs1 & rs2
+    sayac.registers[rd] = sayac.registers[rs1] & sayac.registers[rs2]
+
+
+def exeANI(sayac, rd: int, imm: int):
+    # rd <- rd & imm
+    sayac.registers[rd] = sayac.registers[rd] & imm
+
+
+def exeMSI(sayac, rd: int, imm: int):
+    # rd[7:0] <- SE(imm)
+    sayac.registers[rd] = imm & WORD_MASK
+
+
+def exeMHI(sayac, rd: int, imm: int):
+    # TODO: check the operation
+    # rd[15:8] <- imm
+    sayac.registers[rd] = (imm << 8) & WORD_MASK
+
+
+def exeSLR(sayac, rd: int, rs1: int, rs2: int):
+    # rd <- rs1 << (+- rs2[4:0])
+    isLeftShift, amount = shiftAmount(sayac.registers[rs2])
+    if isLeftShift:
+        sayac.registers[rd] = (sayac.registers[rs1] << amount) & WORD_MASK
+    else:
+        sayac.registers[rd] = sayac.registers[rs1] >> amount
+
+
+def exeSAR(sayac, rd: int, rs1: int, rs2: int):
+    # rd <- rs1 <<< (+- rs2[4:0])
+    isLeftShift, amount = shiftAmount(sayac.registers[rs2])
+    if isLeftShift:
+        sayac.registers[rd] = (sayac.registers[rs1] << amount) & WORD_MASK
+    else:
+        sayac.registers[rd] = (toSigned(sayac.registers[rs1]) >> amount) & WORD_MASK
+
+
+def exeADD(sayac, rd: int, rs1: int, rs2: int):
+    # rd <- rs1 + rs2
+    sayac.registers[rd] = (sayac.registers[rs1] + sayac.registers[rs2]) & WORD_MASK
+
+
+def exeSUB(sayac, rd: int, rs1: int, rs2: int):
+    # rd <- rs1 - rs2
+    sayac.registers[rd] = (sayac.registers[rs1] - sayac.registers[rs2]) & WORD_MASK
+
+
+def exeADI(sayac, rd: int, imm: int):
+    # rd <- rd + SE(imm)
+    sayac.registers[rd] = (sayac.registers[rd] + imm) & WORD_MASK
+
+
+def exeSUI(sayac, rd: int, imm: int):
+    # rd <- rd - SE(imm)
+    sayac.registers[rd] = (sayac.registers[rd] - imm) & WORD_MASK
+
+
+def exeMUL(sayac, rd: int, rs1: int, rs2: int):
+    # rd <- rs1 * rs2
+    sayac.registers[rd] = (sayac.registers[rs1] * sayac.registers[rs2]) & WORD_MASK
+
+
+def exeDIV(sayac, rd: int, rs1: int, rs2: int):
+    # rd <- rs1 / rs2 (signed, rounded toward zero)
+    sayac.registers[rd] = int(toSigned(sayac.registers[rs1]) / toSigned(sayac.registers[rs2])) & WORD_MASK
+
+
+def exeCMR(sayac, rs1: int, rs2: int):
+    # flags <- compare(rs1, rs2)
+    sayac.setFlags(toSigned(sayac.registers[rs1]), toSigned(sayac.registers[rs2]))
+
+
+def exeCMI(sayac, imm: int, rs1: int):
+    # flags <- compare(rs1, SE(imm))
+    sayac.setFlags(toSigned(sayac.registers[rs1]), imm)
+
+
+def exeBRC(sayac, fib: int, rd: int):
+    # if (cond) pc <- rd
+    if sayac.flagBits & FIB_FLAGS[fib & 0b111]:
+        sayac.PC = sayac.registers[rd] - 1
+
+
+def exeBRR(sayac, fib: int, rd: int):
+    # if (cond) pc <- pc + rd
+    if sayac.flagBits & FIB_FLAGS[fib & 0b111]:
+        sayac.PC += toSigned(sayac.registers[rd]) - 1
+
+
+def exeSHI(sayac, shimm: int, rd: int):
+    # rd <- rd << (+- imm)
+    if shimm < 0:
+        sayac.registers[rd] = (sayac.registers[rd] << -shimm) & WORD_MASK
+    else:
+        sayac.registers[rd] = sayac.registers[rd] >> shimm
+
+
+def exeSHIla(sayac, shimm: int, rd: int):
+    # rd <- rd <<< (+- imm)
+    if shimm < 0:
+        sayac.registers[rd] = (sayac.registers[rd] << -shimm) & WORD_MASK
+    else:
+        sayac.registers[rd] = (toSigned(sayac.registers[rd]) >> shimm) & WORD_MASK
+
+
+def exeNTR(sayac, rd: int, rs1: int):
+    # rd <- ~rs1
+    sayac.registers[rd] = ~sayac.registers[rs1] & WORD_MASK
+
+
+def exeNTR2c(sayac, rd: int, rs1: int):
+    # rd <- ~rs1 + 1
+    sayac.registers[rd] = -sayac.registers[rs1] & WORD_MASK
+
+
+def exeNTD(sayac, rd: int):
+    # rd <- ~rd
+    sayac.registers[rd] = ~sayac.registers[rd] & WORD_MASK
+
+
+def exeNTD2c(sayac, rd: int):
+    # rd <- ~rd + 1
+    sayac.registers[rd] = -sayac.registers[rd] & WORD_MASK
+
+
+class InstructionSpec:
+    # layout: space separated segments from bit 15 down to bit 0, written with "_" between them in .bin files
+    #   fixed bits: "0010", don't care bits: "x" (encoded as 0, ignored when decoding)
+    #   fields: "<name>:<width>", with an "s" suffix for sign extended fields (e.g. "imm:8s")
+    # operands: field names in assembler syntax order
+    def __init__(self, mnemonic: str, layout: str, operands: str, execute):
+        self.mnemonic = mnemonic
+        self.layout = layout
+        self.execute = execute
+        self.segmentWidths = []
+        self.fields = {}  # name --> (shift, width, signed)
+        self.base = 0  # fixed bits of the word
+        self.fixedMask = 0  # bits that identify the instruction
+        shift = 16
+        for segment in layout.split(" "):
+            if ":" in segment:
+                name, width = segment.split(":")
+                signed = width.endswith("s")
+                width = int(width.rstrip("s"))
+                shift -= width
+                self.fields[name] = (shift, width, signed)
+            else:
+                width = len(segment)
+                shift -= width
+                for bitIndex, bit in enumerate(segment):
+                    if bit != "x":
+                        bitMask = 1 << (shift + width - 1 - bitIndex)
+                        self.fixedMask |= bitMask
+                        if bit == "1":
+                            self.base |= bitMask
+            self.segmentWidths.append(width)
+        if shift != 0:
+            raise ValueError(f"layout of '{mnemonic}' is not 16 bits")
+        self.operands = tuple(operands.split(" ")) if operands else ()
+        self.operandFields = tuple(self.fields[name] for name in self.operands)
+        self.encode = self.buildEncoder()
+        self.decode = self.buildDecoder()
+
+    def buildEncoder(self):
+        base = self.base
+        placements = tuple((shift, (1 << width) - 1) for shift, width, signed in self.operandFields)
+
+        def encode(operands):
+            word = base
+            for (shift, mask), value in zip(placements, operands):
+                word |= (value & mask) << shift
+            return word
+
+        return encode
+
+    def buildDecoder(self):
+        extractors = tuple(
+            (shift, (1 << width) - 1, (1 << (width - 1)) if signed else 0)
+            for shift, width, signed in self.operandFields
+        )
+
+        def decode(word: int):
+            operands = []
+            for shift, mask, signBit in extractors:
+                value = (word >> shift) & mask
+                if value & signBit:
+                    value -= mask + 1
+                operands.append(value)
+            return tuple(operands)
+
+        return decode
+
+    def formatWord(self, word: int):
+        bits = intToBin(word, 16)
+        segments = []
+        start = 0
+        for width in self.segmentWidths:
+            segments.append(bits[start:start + width])
+            start += width
+        return "_".join(segments)
+
+    def formatInstruction(self, operands):
+        # decoded operands --> assembler syntax, e.g. "ADD r2 r15 r0"
+        args = [f"r{value}" if name.startswith("r") else str(value) for name, value in zip(self.operands, operands)]
+        return " ".join([self.mnemonic.upper()] + args)
+
+    def normalizeOperand(self, name: str, arg: str, line):
+        shift, width, signed = self.fields[name]
+        if name.startswith("r"):
+            value = int(arg.replace("_", "").replace("r", ""))
+            if value not in range(0, 1 << width):
+                raise AssemblySyntaxError(f"Invalid register '{arg}' on line {line}")
+            return value
+        try:
+            value = baseNumberToInt(arg)
+        except ValueError:
+            raise AssemblySyntaxError(f"Invalid value '{arg}' on line {line}") from None
+        # a signed field takes a decimal value in its signed range, or the bit pattern of the field in hex or binary;
+        # other fields take both the two's complement and the unsigned spelling
+        if signed and not arg.startswith(("0x", "0b")):
+            valid = range(-(1 << (width - 1)), 1 << (width - 1))
+        else:
+            valid = range(-(1 << (width - 1)), 1 << width)
+        if value not in valid:
+            raise AssemblySyntaxError(f"Value '{arg}' does not fit in {width} bits on line {line}")
+        value &= (1 << width) - 1
+        if signed and value >> (width - 1):
+            value -= 1 << width
+        if name == "fib" and value & 0b111 not in FIB_FLAGS:
+            raise AssemblySyntaxError(f"Invalid FIB on line {line}")
+        return value
+
+
+# The SAYAC ISA: mnemonic, field layout, assembler syntax and semantics
+# aliases come after the instruction they share an encoding with, so decoding gives the first one
+INSTRUCTION_SET = [
+    InstructionSpec(INS_LdR, "0010 00 0 x rs1:4 rd:4", "rd rs1", exeLdR),
+    InstructionSpec(INS_LdRio, "0010 00 1 x rs1:4 rd:4", "rd rs1", exeLdRio),
+    InstructionSpec(INS_STR, "0010 01 0 x rs1:4 rd:4", "rd rs1", exeSTR),
+    InstructionSpec(INS_STRio, "0010 01 1 x rs1:4 rd:4", "rd rs1", exeSTRio),
+    InstructionSpec(INS_JMR, "0010 10 0 x rs1:4 rd:4", "rd rs1", exeJMR),
+    InstructionSpec(INS_JMRs, "0010 10 1 x rs1:4 rd:4", "rd rs1", exeJMRs),
+    InstructionSpec(INS_JMI, "0010 11 imm:6s rd:4", "rd imm", exeJMI),
+    InstructionSpec(INS_ANR, "0011 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeANR),
+    InstructionSpec(INS_AND, "0011 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeANR),
+    InstructionSpec(INS_ANI, "0100 imm:8 rd:4", "rd imm", exeANI),
+    InstructionSpec(INS_MSI, "0101 imm:8s rd:4", "rd imm", exeMSI),
+    InstructionSpec(INS_MHI, "0110 imm:8 rd:4", "rd imm", exeMHI),
+    InstructionSpec(INS_SLR, "0111 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeSLR),
+    InstructionSpec(INS_SAR, "1000 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeSAR),
+    InstructionSpec(INS_ADD, "1001 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeADD),
+    InstructionSpec(INS_ADR, "1001 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeADD),
+    InstructionSpec(INS_SUB, "1010 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeSUB),
+    InstructionSpec(INS_SUR, "1010 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeSUB),
+    InstructionSpec(INS_ADI, "1011 imm:8s rd:4", "rd imm", exeADI),
+    InstructionSpec(INS_SUI, "1100 imm:8s rd:4", "rd imm", exeSUI),
+    InstructionSpec(INS_MUL, "1101 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeMUL),
+    InstructionSpec(INS_DIV, "1110 rs1:4 rs2:4 rd:4", "rd rs1 rs2", exeDIV),
+    InstructionSpec(INS_CMR, "1111 000 x rs2:4 rs1:4", "rs1 rs2", exeCMR),
+    InstructionSpec(INS_CMI, "1111 001 imm:5s rs1:4", "imm rs1", exeCMI),
+    InstructionSpec(INS_BRC, "1111 010 fib:5 rd:4", "fib rd", exeBRC),
+    InstructionSpec(INS_BRR, "1111 011 fib:5 rd:4", "fib rd", exeBRR),
+    InstructionSpec(INS_SHI, "1111 10 0 shimm:5s rd:4", "shimm rd", exeSHI),
+    InstructionSpec(INS_SHIla, "1111 10 1 shimm:5s rd:4", "shimm rd", exeSHIla),
+    InstructionSpec(INS_NTR, "1111 110 0 rs1:4 rd:4", "rd rs1", exeNTR),
+    InstructionSpec(INS_NTR2c, "1111 110 1 rs1:4 rd:4", "rd rs1", exeNTR2c),
+    InstructionSpec(INS_NTD, "1111 111 0 xxxx rd:4", "rd", exeNTD),
+    InstructionSpec(INS_NTD2c, "1111 111 1 xxxx rd:4", "rd", exeNTD2c),
+]
+
+INS_SPECS = {spec.mnemonic: spec for spec in INSTRUCTION_SET}
+
+INS_REQUIRED_ARGS_COUNT = {spec.mnemonic: len(spec.operands) for spec in INSTRUCTION_SET}
+
+
+def buildOpcodeTable():
+    # opcode (word[15:12]) --> [(fixedMask, base, spec)], most specific encodings first
+    opcodeTable = [[] for _ in range(0, 16)]
+    for spec in INSTRUCTION_SET:
+        candidates = opcodeTable[spec.base >> 12]
+        if all(spec.base != base or spec.fixedMask != fixedMask for fixedMask, base, other in candidates):
+            candidates.append((spec.fixedMask, spec.base, spec))
+    for candidates in opcodeTable:
+        candidates.sort(key=lambda candidate: -bin(candidate[0]).count("1"))
+    return opcodeTable
+
+
+OPCODE_TABLE = buildOpcodeTable()
+
+
+def parseInstructionFields(ins, line):
+    # "ADD __r2 __r15 __r0" --> (spec, operands)
+    return parseInstructionTokens(ins.split(), line)
+
+
+def parseInstructionTokens(tokens: list, line):
+    # ["ADD", "__r2", "__r15", "__r0"] --> (spec, operands)
+    if len(tokens) < 1:
+        raise AssemblySyntaxError(f"No instruction on line {line}")
+    insType = tokens[0].lower()
+    if INS_REQUIRED_ARGS_COUNT[insType] != (len(tokens) - 1):
+        raise AssemblySyntaxError(f"Not enough argument for instruction '{insType}'")
+    spec = INS_SPECS[insType]
+    operands = tuple(spec.normalizeOperand(name, arg, line) for name, arg in zip(spec.operands, tokens[1:]))
+    return spec, operands
+
+
+# Table-driven encoder: the operand tokens of every mnemonic are looked up in tables of token --> bits of the field
+# in the word (filled by parseInstructionTokens the first time a token is seen), so encoding an instruction is a few
+# dictionary lookups ORed into the fixed bits, without parsing a number or building a string
+MNEMONIC_FIELD_TABLES = {}  # mnemonic as written --> (fixed bits of the word, {token --> field bits} of every operand)
+
+
+def fieldTablesOf(tokens: list, line):
+    # --> (fixed bits, field tables) of the instruction of tokens, with the tables filled for its operand tokens
+    spec, operands = parseInstructionTokens(tokens, line)
+    entry = MNEMONIC_FIELD_TABLES.get(tokens[0])
+    if entry is None:
+        entry = (spec.base, tuple({} for _ in spec.operands))
+        MNEMONIC_FIELD_TABLES[tokens[0]] = entry
+    for table, (shift, width, signed), token, value in zip(entry[1], spec.operandFields, tokens[1:], operands):
+        table[token] = (value & ((1 << width) - 1)) << shift
+    return entry
+
+
+def encodeStatements(statements):
+    # (source line number, tokens) of every instruction --> array of 16-bit instruction words
+    words = array.array("H")
+    append = words.append
+    tables = MNEMONIC_FIELD_TABLES
+    for line, tokens in statements:
+        entry = tables.get(tokens[0])
+        try:
+            # a new mnemonic (None), operand count (ValueError) or token (KeyError) takes the slow path once
+            if len(tokens) == 4:
+                base, (first, second, third) = entry
+                append(base | first[tokens[1]] | second[tokens[2]] | third[tokens[3]])
+            elif len(tokens) == 3:
+                base, (first, second) = entry
+                append(base | first[tokens[1]] | second[tokens[2]])
+            else:
+                base, (first,) = entry
+                if len(tokens) != 2:
+                    raise ValueError(tokens[0])
+                append(base | first[tokens[1]])
+        except (TypeError, ValueError, KeyError):
+            base, fieldTables = fieldTablesOf(tokens, line)
+            for table, token in zip(fieldTables, tokens[1:]):
+                base |= table[token]
+            append(base)
+    return words
+
+
+def decodeWord(word: int):
+    # 16-bit instruction word --> (spec, operands)
+    for fixedMask, base, spec in OPCODE_TABLE[(word >> 12) & 0b1111]:
+        if word & fixedMask == base:
+            operands = spec.decode(word)
+            if "fib" in spec.fields and operands[0] & 0b111 not in FIB_FLAGS:
+                raise AssemblySyntaxError(f"Invalid FIB in instruction word '{spec.formatWord(word)}'")
+            return spec, operands
+    raise AssemblySyntaxError(f"Invalid instruction word '{intToBin(word, 16)}'")
@@ -0,0 +1,237 @@
+import sys
+import re
+import array
+import functools
+
+from SAYAC_ISA import AssemblySyntaxError, decodeWord
+
+# Instruction images (the assembled program as 16-bit words)
+IMAGE_AUTO = "auto"  # detect text or little-endian raw words from the content
+IMAGE_TEXT = "text"  # SAYAC_Inst2Bin.py output: one "0010_00_0_0_0100_0011" word per line
+IMAGE_RAW_LE = "raw-le"  # raw 16-bit words, little-endian
+IMAGE_RAW_BE = "raw-be"  # raw 16-bit words, big-endian
+IMAGE_IHEX = "ihex"  # Intel HEX of the little-endian raw image
+IMAGE_READMEMH = "readmemh"  # Verilog $readmemh: one 4 digit hex word per line
+IMAGE_READMEMB = "readmemb"  # Verilog $readmemb: one 16 digit binary word per line
+
+IMAGE_FORMATS = (IMAGE_TEXT, IMAGE_RAW_LE, IMAGE_RAW_BE, IMAGE_IHEX, IMAGE_READMEMH, IMAGE_READMEMB)
+
+# file extension of each format, images with these extensions are detected automatically by the simulator
+IMAGE_EXTENSIONS = {
+    IMAGE_TEXT: ".bin",
+    IMAGE_RAW_LE: ".bin",
+    IMAGE_RAW_BE: ".bin",
+    IMAGE_IHEX: ".hex",
+    IMAGE_READMEMH: ".memh",
+    IMAGE_READMEMB: ".memb",
+}
+
+TEXT_IMAGE_BYTES = b"01_ \t\r\n"
+HEX_IMAGE_BYTES = b"0123456789abcdefABCDEF_ \t\r\n"
+READMEM_MARKUP = re.compile(rb"//[^\n]*|@[0-9a-fA-F_]+")  # comments and @address lines of $readmemh/$readmemb files
+
+IHEX_RECORD_LENGTH = 16  # data bytes per Intel HEX record
+
+
+def detectImageFormat(data: bytes):
+    # a text image only contains bits, underscores and white space ($readmemb images are text images without "_")
+    if data.translate(None, TEXT_IMAGE_BYTES) == b"":
+        return IMAGE_TEXT
+    if data.startswith(b":"):
+        return IMAGE_IHEX
+    # $readmemh/$readmemb files may hold comments and @address lines
+    words = READMEM_MARKUP.sub(b"", data)
+    if words.translate(None, TEXT_IMAGE_BYTES) == b"" and words.strip() != b"":
+        return IMAGE_READMEMB
+    if words.translate(None, HEX_IMAGE_BYTES) == b"" and words.strip() != b"":
+        return IMAGE_READMEMH
+    return IMAGE_RAW_LE
+
+
+def imageFormatOf(fileName: str, data: bytes):
+    # the $readmemh/$readmemb extensions name their format, other images are detected from the content
+    for imageFormat in (IMAGE_READMEMH, IMAGE_READMEMB):
+        if fileName.endswith(IMAGE_EXTENSIONS[imageFormat]):
+            return imageFormat
+    return detectImageFormat(data)
+
+
+def parseTextImage(text: str):
+    words = []
+    for lineIndex, line in enumerate(text.splitlines()):
+        bits = line.strip().replace("_", "")
+        if bits == "":
+            continue
+        if len(bits) != 16:
+            raise AssemblySyntaxError(f"Invalid instruction word '{line.strip()}' on line {lineIndex + 1}")
+        words.append(int(bits, 2))
+    return words
+
+
+def parseRawImage(data: bytes, byteOrder: str = "little"):
+    if len(data) % 2 != 0:
+        raise AssemblySyntaxError("Raw image must contain whole 16-bit words")
+    words = array.array("H")
+    words.frombytes(data)
+    if byteOrder != sys.byteorder:
+        words.byteswap()
+    return words.tolist()
+
+
+def parseReadmemImage(text: str, base: int):
+    # "@<hex address>" moves the next word to that address, the words skipped over are 0
+    words = []
+    address = 0
+    for lineIndex, line in enumerate(text.splitlines()):
+        for digits in line.split("//", 1)[0].split():
+            try:
+                if digits.startswith("@"):
+                    address = int(digits[1:].replace("_", ""), 16)
+                    continue
+                word = int(digits.replace("_", ""), base) & 0xFFFF
+            except ValueError:
+                raise AssemblySyntaxError(f"Invalid instruction word '{digits}' on line {lineIndex + 1}")
+            if address > len(words):
+                words.extend([0] * (address - len(words)))
+            if address < len(words):
+                words[address] = word
+            else:
+                words.append(word)
+            address += 1
+    return words
+
+
+def parseIntelHexImage(text: str):
+    data = bytearray()
+    upperAddress = 0
+    for lineIndex, line in enumerate(text.splitlines()):
+        line = line.strip()
+        if line == "":
+            continue
+        try:
+            record = bytes.fromhex(line[1:])
+        except ValueError:
+            record = b""
+        if not line.startswith(":") or len(record) < 5 or len(record) != record[0] + 5 or sum(record) & 0xFF != 0:
+            raise AssemblySyntaxError(f"Invalid Intel HEX record on line {lineIndex + 1}")
+        recordType = record[3]
+        if recordType == 0x00:
+            address = upperAddress + (record[1] << 8 | record[2])
+            if len(data) < address:
+                data.extend(bytes(address - len(data)))
+            data[address:address + record[0]] = record[4:-1]
+        elif recordType == 0x01:
+            break
+        elif recordType == 0x04:
+            upperAddress = (record[4] << 8 | record[5]) << 16
+    return parseRawImage(bytes(data), "little")
+
+
+def loadImage(fileName: str, imageFormat: str = IMAGE_AUTO):
+    f = open(fileName, "rb")
+    data = f.read()
+    f.close()
+    if imageFormat == IMAGE_AUTO:
+        imageFormat = imageFormatOf(fileName, data)
+    return parseImage(data, imageFormat)
+
+
+def parseImage(data: bytes, imageFormat: str = IMAGE_AUTO):
+    # image content --> instruction words
+    if imageFormat == IMAGE_AUTO:
+        imageFormat = detectImageFormat(data)
+    if imageFormat == IMAGE_TEXT:
+        return parseTextImage(data.decode("ascii"))
+    elif imageFormat == IMAGE_RAW_LE:
+        return parseRawImage(data, "little")
+    elif imageFormat == IMAGE_RAW_BE:
+        return parseRawImage(data, "big")
+    elif imageFormat == IMAGE_IHEX:
+        return parseIntelHexImage(data.decode("ascii"))
+    elif imageFormat == IMAGE_READMEMH:
+        return parseReadmemImage(data.decode("ascii"), 16)
+    elif imageFormat == IMAGE_READMEMB:
+        return parseReadmemImage(data.decode("ascii"), 2)
+    raise ValueError(f"invalid image format '{imageFormat}' (use {IMAGE_AUTO}, {', '.join(IMAGE_FORMATS)})")
+
+
+class InvalidWordError(AssemblySyntaxError):
+    # address and value of the word of an image that is not an instruction
+    def __init__(self, message, address: int, word: int):
+        super().__init__(message)
+        self.address = address
+        self.word = word
+
+
+def decodeImage(words):
+    # words --> [(spec, operands)], every distinct word is decoded once
+    decodedWords = {}
+    program = []
+    for address, word in enumerate(words):
+        decoded = decodedWords.get(word)
+        if decoded is None:
+            if not 0 <= word <= 0xFFFF:
+                raise InvalidWordError(f"Instruction word {word} at address {address} is not 16 bits", address, word)
+            try:
+                decoded = decodeWord(word)
+            except AssemblySyntaxError as e:
+                raise InvalidWordError(f"{e.message} at address {address}", address, word) from None
+            decodedWords[word] = decoded
+        program.append(decoded)
+    return program
+
+
+@functools.lru_cache(maxsize=None)
+def formatTextWord(word: int):
+    # 16-bit instruction word --> "0010_00_0_0_0100_0011" (split into the fields of its instruction)
+    spec, operands = decodeWord(word)
+    return spec.formatWord(word)
+
+
+def rawWordBytes(words, byteOrder: str = "little"):
+    image = array.array("H", words)
+    if byteOrder != sys.byteorder:
+        image.byteswap()
+    return image.tobytes()
+
+
+def formatIntelHex(data: bytes):
+    records = []
+    for start in range(0, len(data), IHEX_RECORD_LENGTH):
+        if start > 0 and start & 0xFFFF == 0:
+            # extended linear address for the upper 16 bits
+            records.append(bytes([2, 0, 0, 0x04, start >> 24 & 0xFF, start >> 16 & 0xFF]))
+        chunk = data[start:start + IHEX_RECORD_LENGTH]
+        records.append(bytes([len(chunk), start >> 8 & 0xFF, start & 0xFF, 0x00]) + chunk)
+    records.append(bytes([0, 0, 0, 0x01]))
+    return "".join(f":{record.hex().upper()}{-sum(record) & 0xFF:02X}\n" for record in records)
+
+
+# one record per word for the line based formats (patched word by word in watch mode)
+IMAGE_WORD_RECORDS = {
+    IMAGE_TEXT: lambda word: f"{formatTextWord(word)}\n".encode(),
+    IMAGE_RAW_LE: lambda word: word.to_bytes(2, "little"),
+    IMAGE_RAW_BE: lambda word: word.to_bytes(2, "big"),
+    IMAGE_READMEMH: lambda word: f"{word:04x}\n".encode(),
+    IMAGE_READMEMB: lambda word: f"{word:016b}\n".encode(),
+}
+
+# the text image starts with an empty line
+IMAGE_HEADERS = {IMAGE_TEXT: b"\n"}
+
+
+def formatImage(words, imageFormat: str = IMAGE_TEXT):
+    # 16-bit words --> content of the image file
+    if imageFormat == IMAGE_RAW_LE:
+        return rawWordBytes(words, "little")
+    elif imageFormat == IMAGE_RAW_BE:
+        return rawWordBytes(words, "big")
+    elif imageFormat == IMAGE_IHEX:
+        return formatIntelHex(rawWordBytes(words, "little")).encode()
+    elif imageFormat == IMAGE_TEXT:
+        return ("\n" + "".join([record + "\n" for record in map(formatTextWord, words)])).encode()
+    elif imageFormat == IMAGE_READMEMH:
+        return "".join([f"{word:04x}\n" for word in words]).encode()
+    elif imageFormat == IMAGE_READMEMB:
+        return "".join([f"{word:016b}\n" for word in words]).encode()
+    raise ValueError(f"invalid image format '{imageFormat}' (use {', '.join(IMAGE_FORMATS)})")
@@ -1,100 +1,21 @@
 import sys
 import os
 import re
+import time
+import hashlib
+import functools
+import concurrent.futures
+
+from SAYAC_ISA import AssemblySyntaxError, lexLines, baseNumberToInt, parseInstructionFields
+from SAYAC_ISA import encodeStatements
+from SAYAC_Image import IMAGE_TEXT, IMAGE_FORMATS, IMAGE_EXTENSIONS, IMAGE_HEADERS, IMAGE_WORD_RECORDS
+from SAYAC_Image import formatImage
+from SAYAC_Labels import resolveLabels
+from SAYAC_Preprocessor import includesCurrent, preprocess
 
 # constants
 VERSION = "v1.0.0-alpha03"
 
-INS_LdR = "ldr"  # load from memory
-INS_LdRio = "ldrio"  # load from I/O peripheral
-INS_STR = "str"  # Store to memory
-INS_STRio = "strio"  # Store to I/O peripheral
-INS_JMR = "jmr"  # Jump to address
-INS_JMRs = "jmrs"  # Jump to address & save PC
-INS_JMI = "jmi"  # Jump to immediate address
-INS_ANR = "anr"  # Logical AND operation
-INS_AND = "and"  # Logical AND operation
-INS_ANI = "ani"  # Logical AND operation with immediate value
-INS_MSI = "msi"  # Move low sign extended immediate to register
-INS_MHI = "mhi"  # Move high immediate to register
-INS_SLR = "slr"  # Logical Left/Right shift
-INS_SAR = "sar"  # Arithmetic Left/Right shift
-INS_ADD = "add"  # Adding two registers
-INS_ADR = "adr"  # Adding two registers
-INS_SUB = "sub"  # Subtracting two registers
-INS_SUR = "sur"  # Subtracting two registers
-INS_ADI = "adi"  # Adding Immediate to register
-INS_SUI = "sui"  # Subtracting Immediate from register
-INS_MUL = "mul"  # Multiplying two registers
-INS_DIV = "div"  # Dividing two registers
-INS_CMR = "cmr"  # Comparing two registers
-INS_CMI = "cmi"  # Comparing register and Immediate value
-INS_BRC = "brc"  # Branch Registered with Condition
-INS_BRR = "brr"  # Branch Registered Relative with Condition
-INS_SHI = "shi"  # Arithmetic Logical shift with immediate
-INS_SHIla = "shila"  # Arithmetic Logical shift with immediate
-INS_NTR = "ntr"  # Logical NOT
-INS_NTR2c = "ntr2c"  # Logical NOT 2's complement
-INS_NTD = "ntd"  # Logical NOT
-INS_NTD2c = "ntd2c"  # Logical NOT 2's complement
-
-INS_REQUIRED_ARGS_COUNT = {
-    INS_LdR: 2,
-    INS_LdRio: 2,
-    INS_STR: 2,
-    INS_STRio: 2,
-    INS_JMR: 2,
-    INS_JMRs: 2,
-    INS_JMI: 2,
-    INS_ANR: 3,
-    INS_AND: 3,
-    INS_ANI: 2,
-    INS_MSI: 2,
-    INS_MHI: 2,
-    INS_SLR: 3,
-    INS_SAR: 3,
-    INS_ADD: 3,
-    INS_ADR: 3,
-    INS_SUB: 3,
-    INS_SUR: 3,
-    INS_ADI: 2,
-    INS_SUI: 2,
-    INS_MUL: 3,
-    INS_DIV: 3,
-    INS_CMR: 2,
-    INS_CMI: 2,
-    INS_BRC: 2,
-    INS_BRR: 2,
-    INS_SHI: 2,
-    INS_SHIla: 2,
-    INS_NTR: 2,
-    INS_NTR2c: 2,
-    INS_NTD: 1,
-    INS_NTD2c: 1,
-}
-
-
-def commentRemover(lines: list):
-    text = ""
-    for line in lines:
-        text += line + ";"
-
-    def replacer(match):
-        s = match.group(0)
-        if s.startswith('/'):
-            return " "  # note: a space and not an empty string
-        else:
-            return s
-
-    pattern = re.compile(
-        r'//.*?$|/\*.*?\*/|\'(?:\\.|[^\\\'])*\'|"(?:\\.|[^\\"])*"',
-        re.DOTALL | re.MULTILINE
-    )
-    newText = re.sub(pattern, replacer, text)
-    newList = newText.split(";")
-    newList = [line.strip() for line in newList if line.strip() != ""]
-    return newList
-
 
 def main():
     # App info
@@ -106,218 +27,331 @@ def main():
 
     # get file name from terminal
     insFileName = sys.argv[1]
-    if insFileName.startswith("--all"):
-        assembleAll(insFileName.strip())
-    else:
-        assemble(insFileName)
+    jobs = None
+    watchMode = False
+    imageFormat = IMAGE_TEXT
+    excludes = []
+    for arg in sys.argv[2:]:
+        if arg.startswith("--exclude="):
+            excludes += [pattern for pattern in arg.split("=", 1)[1].split(",") if pattern != ""]
+        elif arg.startswith("--jobs="):
+            try:
+                jobs = baseNumberToInt(arg.split("=", 1)[1])
+            except ValueError:
+                jobs = 0
+            if jobs < 1:
+                print(f"Error: invalid number of jobs --> [{arg}]")
+                exit(1)
+        elif arg == "--watch":
+            watchMode = True
+        elif arg.startswith("--format="):
+            imageFormat = arg.split("=", 1)[1]
+            if imageFormat not in IMAGE_FORMATS:
+                print(f"Error: Invalid image format --> [{imageFormat}]")
+                exit(1)
+        else:
+            print(f"Error: Invalid argument --> [{arg}]")
+            exit(1)
+    if watchMode:
+        if insFileName.startswith("--all"):
+            patterns = allPatterns(insFileName.strip())
+            watch(findSources(patterns, excludes=excludes), imageFormat, patterns=patterns, excludes=excludes)
+        else:
+            watch([insFileName], imageFormat)
+    elif insFileName.startswith("--all"):
+        exit(assembleAll(insFileName.strip(), jobs, imageFormat, excludes))
+    elif not assemble(insFileName, imageFormat):
+        exit(1)
+
 
+DEFAULT_ALL_PATTERN = "*.txt"
+GLOB_CHARACTERS = "*?["
+SKIPPED_DIRECTORIES = ("__pycache__", "site-packages", "node_modules")
+VIRTUALENV_MARKER = "pyvenv.cfg"  # a directory holding it is a virtualenv (of any name)
 
-def assembleAll(allCmd):
-    typeFilter = None
+
+def allPatterns(allCmd):
+    # --all[=<pattern>[,<pattern>...]] --> [pattern]
     if allCmd.__contains__("="):
-        typeFilter = allCmd.split("=")[1]
-    for insFileName in os.listdir("./"):
-        if typeFilter is not None:
-            if insFileName.endswith(typeFilter):
-                assemble(insFileName)
+        return [pattern for pattern in allCmd.split("=", 1)[1].split(",") if pattern != ""]
+    return [DEFAULT_ALL_PATTERN]
+
+
+def patternRegex(pattern: str, typeFilter: bool = True):
+    # glob pattern (relative to the root, "/" separated) --> compiled regex of the paths it matches
+    #   a pattern without a directory part matches in every sub directory ("*.asm" = "**/*.asm")
+    #   a pattern without glob characters is a file-type filter ("txt" = "**/*txt") when typeFilter is set
+    pattern = pattern.replace(os.sep, "/")
+    while pattern.startswith("./"):
+        pattern = pattern[2:]
+    if typeFilter and not any(character in pattern for character in GLOB_CHARACTERS):
+        pattern = "*" + pattern
+    if "/" not in pattern:
+        pattern = "**/" + pattern
+    regex = ""
+    position = 0
+    while position < len(pattern):
+        if pattern.startswith("**/", position):
+            regex += "(?:.*/)?"
+            position += 3
+        elif pattern.startswith("**", position):
+            regex += ".*"
+            position += 2
+        elif pattern[position] == "*":
+            regex += "[^/]*"
+            position += 1
+        elif pattern[position] == "?":
+            regex += "[^/]"
+            position += 1
+        elif pattern[position] == "[" and "]" in pattern[position + 2:]:
+            end = pattern.index("]", position + 2)
+            regex += "[" + pattern[position + 1:end].replace("!", "^", 1) + "]"
+            position = end + 1
         else:
-            assemble(insFileName)
+            regex += re.escape(pattern[position])
+            position += 1
+    return re.compile(regex + r"\Z")
+
 
+def skippedDirectory(directory: str, name: str):
+    # dot directories, caches and virtualenvs are never searched
+    return (name.startswith(".") or name in SKIPPED_DIRECTORIES
+            or os.path.isfile(os.path.join(directory, name, VIRTUALENV_MARKER)))
 
-# Exceptions
-class AssemblySyntaxError(Exception):
-    def __init__(self, message):
-        self.message = message
 
+def findSources(patterns: list, root: str = ".", excludes: list = ()):
+    # glob patterns (see patternRegex) --> sorted source files under root, without the outputs, the skipped
+    # directories (see skippedDirectory) and the files and directories matching an exclude pattern
+    regexes = [patternRegex(pattern) for pattern in patterns]
+    excludeRegexes = [patternRegex(exclude, False) for exclude in excludes]
+    insFileNames = []
+    for directory, directoryNames, fileNames in os.walk(root):
+        relativeDirectory = os.path.relpath(directory, root).replace(os.sep, "/")
+        prefix = "" if relativeDirectory == "." else relativeDirectory + "/"
+        directoryNames[:] = [name for name in directoryNames if not skippedDirectory(directory, name)
+                             and not any(regex.match(prefix + name) for regex in excludeRegexes)]
+        for fileName in fileNames:
+            relative = prefix + fileName
+            if fileName.endswith(tuple(IMAGE_EXTENSIONS.values())):
+                continue
+            if any(regex.match(relative) for regex in regexes) and \
+                    not any(regex.match(relative) for regex in excludeRegexes):
+                insFileNames.append(os.path.normpath(os.path.join(directory, fileName)))
+    return sorted(insFileNames)
 
-def hexToInt(num: str):
-    if num.__contains__("0x"):
-        return int(num, 0)
-    return int(num, 16)
 
+def assembleAll(allCmd, jobs: int = None, imageFormat: str = IMAGE_TEXT, excludes: list = ()):
+    # --> exit code, the files are assembled in parallel on a process pool
+    patterns = allPatterns(allCmd)
+    insFileNames = findSources(patterns, excludes=excludes)
+    if len(insFileNames) == 0:
+        print(f"No files matching {', '.join(patterns)}")
+        return 0
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(insFileNames))
+    startTime = time.perf_counter()
+    worker = functools.partial(assembleTimed, imageFormat=imageFormat)
+    if jobs == 1:
+        results = reportResults(map(worker, insFileNames))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as pool:
+            chunkSize = max(1, len(insFileNames) // (jobs * 4))
+            results = reportResults(pool.map(worker, insFileNames, chunksize=chunkSize))
+    totalTime = time.perf_counter() - startTime
+    failed = [insFileName for insFileName, error, seconds in results if error is not None]
+    print(f"{len(results)} files: {len(results) - len(failed)} assembled, {len(failed)} failed "
+          f"({totalTime:.2f} s, {jobs} jobs)")
+    for insFileName in failed:
+        print(f"Failed: {insFileName}")
+    return 1 if failed else 0
 
-def intToBin(num: str, n: int):
-    binNum = bin(int(num)).replace("0b", "")[-n:]
-    while len(binNum) < n:
-        binNum = "0" + binNum
-    return binNum
+
+def reportResults(results):
+    # prints one line per file as the results come in
+    reported = []
+    for insFileName, error, seconds in results:
+        if error is None:
+            print(f"{seconds * 1000:9.2f} ms  {insFileName}")
+        else:
+            print(f"{seconds * 1000:9.2f} ms  {insFileName}  Error: {error}")
+        reported.append((insFileName, error, seconds))
+    return reported
 
 
 def parseInstruction(ins, line):
-    insSplitted = ins.strip().split(" ")
-    if len(insSplitted) < 1:
-        raise AssemblySyntaxError(f"No instruction on line {line}")
-    insType = insSplitted[0].lower()
-    if INS_REQUIRED_ARGS_COUNT[insType] != (len(insSplitted) - 1):
-        raise AssemblySyntaxError(f"Not enough argument for instruction '{insType}'")
-    if insType == INS_LdR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"0010_00_0_0_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_LdRio:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"0010_00_1_0_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_STR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"0010_01_0_0_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-        pass
-    elif insType == INS_STRio:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"0010_01_1_0_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-        pass
-    elif insType == INS_JMR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"0010_10_0_0_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-        pass
-    elif insType == INS_JMRs:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"0010_10_1_0_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_JMI:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        return f"0010_11_{intToBin(imm, 6)}_{intToBin(rd, 4)}"
-    elif insType == INS_ANR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"0011_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_AND:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"0011_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_ANI:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        return f"0100_{intToBin(imm, 8)}_{intToBin(rd, 4)}"
-    elif insType == INS_MSI:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        return f"0101_{intToBin(imm, 8)}_{intToBin(rd, 4)}"
-    elif insType == INS_MHI:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        return f"0110_{intToBin(imm, 8)}_{intToBin(rd, 4)}"
-    elif insType == INS_SLR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"0111_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_SAR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"1000_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_ADD:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"1001_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_ADR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"1001_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_SUB:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"1010_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_SUR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"1010_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_ADI:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        return f"1011_{intToBin(imm, 8)}_{intToBin(rd, 4)}"
-    elif insType == INS_SUI:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        imm = insSplitted[2]
-        return f"1100_{intToBin(imm, 8)}_{intToBin(rd, 4)}"
-    elif insType == INS_MUL:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"1101_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_DIV:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        rs2 = insSplitted[3].replace("_", "").replace("r", "")
-        return f"1110_{intToBin(rs1, 4)}_{intToBin(rs2, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_CMR:
-        rs1 = insSplitted[1].replace("_", "").replace("r", "")
-        rs2 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_000_0_{intToBin(rs2, 4)}_{intToBin(rs1, 4)}"
-    elif insType == INS_CMI:
-        imm = insSplitted[1]
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_001_{intToBin(imm, 5)}_{intToBin(rs1, 4)}"
-    elif insType == INS_BRC:
-        FIB = insSplitted[1]
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_010_{intToBin(str(hexToInt(FIB)), 5)}_{intToBin(rd, 4)}"
-    elif insType == INS_BRR:
-        FIB = insSplitted[1]
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_011_{intToBin(str(hexToInt(FIB)), 5)}_{intToBin(rd, 4)}"
-    elif insType == INS_SHI:
-        shimm = insSplitted[1]
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_10_0_{intToBin(shimm, 5)}_{intToBin(rd, 4)}"
-    elif insType == INS_SHIla:
-        shimm = insSplitted[1]
-        rd = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_10_1_{intToBin(shimm, 5)}_{intToBin(rd, 4)}"
-    elif insType == INS_NTR:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_110_0_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_NTR2c:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        rs1 = insSplitted[2].replace("_", "").replace("r", "")
-        return f"1111_110_1_{intToBin(rs1, 4)}_{intToBin(rd, 4)}"
-    elif insType == INS_NTD:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        return f"1111_111_0_0000_{intToBin(rd, 4)}"
-    elif insType == INS_NTD2c:
-        rd = insSplitted[1].replace("_", "").replace("r", "")
-        return f"1111_111_1_0000_{intToBin(rd, 4)}"
-    else:
-        raise Exception("Uncaught!")
+    spec, operands = parseInstructionFields(ins, line)
+    return spec.formatWord(spec.encode(operands))
+
+
+def encodeWords(lines, directory: str = "."):
+    # SAYAC Assembly source lines --> array of 16-bit instruction words, included files are relative to directory
+    # the statements stream from the lexer to the encoder, only the words are kept
+    return encodeStatements(resolveLabels(preprocess(lexLines(lines), directory)))
+
+
+def binFileNameOf(insFileName, imageFormat: str = IMAGE_TEXT):
+    return insFileName.rsplit(".", maxsplit=1)[0] + IMAGE_EXTENSIONS[imageFormat]
 
 
-def assemble(insFileName):
+def assembleFile(insFileName, imageFormat: str = IMAGE_TEXT):
+    # SAYAC Assembly file --> <name>.bin (or the extension of the image format), raises on errors
+    # open the SAYAC Assembly code from the path given
+    insFile = open(insFileName, "r")
     try:
-        # open the SAYAC Assembly code from the path given
-        insFile = open(insFileName, "r")
-        insLines = insFile.readlines()
+        words = encodeWords(insFile, os.path.dirname(insFileName))
+    finally:
         insFile.close()
-        binFileLines = []
-        insLines = commentRemover(insLines)
-        for lineIndex in range(0, len(insLines)):
-            binFileLines.append(parseInstruction(insLines[lineIndex], lineIndex + 1))
-        binFileName = insFileName.rsplit(".", maxsplit=1)[0]
-        binFile = open(binFileName + ".bin", "w")
-        binFile.write("\n")
-        for lineIndex in range(0, len(insLines)):
-            binFile.write(f"{binFileLines[lineIndex]}\n")
-        binFile.close()
+    # the whole image in a single write
+    binFile = open(binFileNameOf(insFileName, imageFormat), "wb")
+    binFile.write(formatImage(words, imageFormat))
+    binFile.close()
+
+
+def errorMessage(insFileName, e: Exception):
+    if isinstance(e, FileNotFoundError):
+        return f"File not found --> ['{insFileName}' does not exists]"
+    elif isinstance(e, KeyError):
+        return f"Instruction {e} not supported yet"
+    elif isinstance(e, AssemblySyntaxError):
+        return e.message
+    elif isinstance(e, UnicodeDecodeError):
+        return f"File is not UTF-8 text --> [byte 0x{e.object[e.start]:02x} at offset {e.start}]"
+    return f"Unhandled exception --> [{e}]"
+
+
+def assemble(insFileName, imageFormat: str = IMAGE_TEXT):
+    try:
+        assembleFile(insFileName, imageFormat)
         print("Successfully Assembled!")
-    except FileNotFoundError:
-        print(f"Error: File not found --> ['{insFileName}' does not exists]")
-    except KeyError as e:
-        print(f"Error: Instruction {e} not supported yet")
-    except AssemblySyntaxError as e:
-        print(f"Error: {e.message}")
+        return True
     except Exception as e:
-        print(f"Error: Unhandled exception --> [{e}]")
+        print(f"Error: {errorMessage(insFileName, e)}")
+        return False
+
+
+def assembleTimed(insFileName, imageFormat: str = IMAGE_TEXT):
+    # --> (insFileName, error message or None, seconds), runs in the worker processes of assembleAll
+    startTime = time.perf_counter()
+    error = None
+    try:
+        assembleFile(insFileName, imageFormat)
+    except Exception as e:
+        error = errorMessage(insFileName, e)
+    return insFileName, error, time.perf_counter() - startTime
+
+
+WATCH_INTERVAL = 0.2  # seconds between two checks of the watched files
+
+
+class WatchedSource:
+    # a source file kept assembled: only the changed words of the image are rewritten (the field tables of the encoder
+    # keep the tokens that were seen, see encodeStatements)
+    def __init__(self, insFileName, imageFormat: str = IMAGE_TEXT):
+        self.insFileName = insFileName
+        self.imageFormat = imageFormat
+        self.binFileName = binFileNameOf(insFileName, imageFormat)
+        self.stat = None  # (mtime, size) of the last check
+        self.digest = None  # hash of the last assembled content
+        self.binRecords = None  # bytes of every word in the image, None if it has to be written from scratch
+        self.includes = []  # (path, modification time) of the included files
+
+    def changed(self):
+        # cheap mtime/size check first, the hash filters out saves that did not change the content
+        try:
+            stat = os.stat(self.insFileName)
+        except FileNotFoundError:
+            return None
+        includesChanged = not includesCurrent(self.includes)
+        if (stat.st_mtime_ns, stat.st_size) == self.stat and not includesChanged:
+            return None
+        self.stat = (stat.st_mtime_ns, stat.st_size)
+        f = open(self.insFileName, "rb")
+        content = f.read()
+        f.close()
+        digest = hashlib.sha1(content).digest()
+        if digest == self.digest and not includesChanged:
+            return None
+        self.digest = digest
+        return content
+
+    def write(self, words: list):
+        # --> number of rewritten words
+        if self.imageFormat not in IMAGE_WORD_RECORDS:
+            # Intel HEX records hold several words and a checksum, write the whole image
+            binFile = open(self.binFileName, "wb")
+            binFile.write(formatImage(words, self.imageFormat))
+            binFile.close()
+            return len(words)
+        wordRecord = IMAGE_WORD_RECORDS[self.imageFormat]
+        header = IMAGE_HEADERS.get(self.imageFormat, b"")
+        records = [wordRecord(word) for word in words]
+        oldRecords = self.binRecords
+        self.binRecords = None
+        if oldRecords is None or not os.path.isfile(self.binFileName):
+            binFile = open(self.binFileName, "wb")
+            binFile.write(header + b"".join(records))
+            binFile.close()
+            self.binRecords = records
+            return len(records)
+        binFile = open(self.binFileName, "r+b")
+        offset = len(header)
+        written = 0
+        for index in range(0, len(records)):
+            record = records[index]
+            if index >= len(oldRecords) or len(oldRecords[index]) != len(record):
+                # the rest of the file moves, rewrite it from here
+                binFile.seek(offset)
+                binFile.write(b"".join(records[index:]))
+                written += len(records) - index
+                break
+            if oldRecords[index] != record:
+                binFile.seek(offset)
+                binFile.write(record)
+                written += 1
+            offset += len(record)
+        binFile.truncate(len(header) + sum(len(record) for record in records))
+        binFile.close()
+        self.binRecords = records
+        return written
+
+    def poll(self):
+        try:
+            # the file is read and decoded in here, a file that can not be read or is no text stops only this file
+            content = self.changed()
+            if content is None:
+                return
+            startTime = time.perf_counter()
+            # the included files are recorded while they are read, a failed build still watches the ones it reached
+            self.includes = []
+            lines = content.decode().splitlines()
+            words = encodeStatements(resolveLabels(preprocess(lexLines(lines), os.path.dirname(self.insFileName),
+                                                              None, self.includes)))
+            written = self.write(words)
+        except Exception as e:
+            print(f"{self.insFileName}  Error: {errorMessage(self.insFileName, e)}")
+            return
+        milliseconds = (time.perf_counter() - startTime) * 1000
+        print(f"{self.insFileName}  {len(words)} words, {written} written ({milliseconds:.2f} ms)")
+
+
+def watch(insFileNames: list, imageFormat: str = IMAGE_TEXT, interval: float = WATCH_INTERVAL, patterns: list = None,
+          excludes: list = ()):
+    # reassembles the files whenever they change, until Ctrl+C
+    # patterns: of --all (see findSources), the sources are searched again after every check, so new files are
+    # watched too and deleted ones are dropped
+    sources = {insFileName: WatchedSource(insFileName, imageFormat) for insFileName in insFileNames}
+    print(f"Watching {len(sources)} files (Ctrl+C to stop)")
+    try:
+        while True:
+            for source in sources.values():
+                source.poll()
+            time.sleep(interval)
+            if patterns is not None:
+                sources = {insFileName: sources.get(insFileName) or WatchedSource(insFileName, imageFormat)
+                           for insFileName in findSources(patterns, excludes=excludes)}
+    except KeyboardInterrupt:
+        print("Stopped watching")
 
 
 if __name__ == "__main__":
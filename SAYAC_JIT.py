@@ -0,0 +1,210 @@
+import re
+
+from SAYAC_ISA import WORD_MASK, FIB_FLAGS, FLAGS_EQUAL, FLAGS_GREATER, FLAGS_LESS, toSigned, shiftAmount
+from SAYAC_ISA import exeLdR, exeLdRio, exeSTR, exeSTRio, exeJMR, exeJMRs, exeJMI, exeANR, exeANI, exeMSI, exeMHI
+from SAYAC_ISA import exeSLR, exeSAR, exeADD, exeSUB, exeADI, exeSUI, exeMUL, exeDIV, exeCMR, exeCMI, exeBRC, exeBRR
+from SAYAC_ISA import exeSHI, exeSHIla, exeNTR, exeNTR2c, exeNTD, exeNTD2c
+
+# Basic-block translation: straight-line runs of decoded instructions ending at a jump or branch are turned into
+# generated Python functions that keep the registers and flags in locals, so a whole block runs as one call.
+
+DEFAULT_HOT_THRESHOLD = 8  # executions of a PC before a block starting there is compiled
+MAX_BLOCK_LENGTH = 256
+
+# code emitters, return the lines of one instruction, "nextPC = ..." ends the block
+BLOCK_EMITTERS = {
+    exeLdR: lambda pc, rd, rs1: [f"r{rd} = memoryWords[r{rs1}]"],
+    exeLdRio: lambda pc, rd, rs1: [f"r{rd} = readMemory(r{rs1}, True)"],
+    exeSTR: lambda pc, rd, rs1: [f"writeMemory(r{rd}, r{rs1})"],
+    exeSTRio: lambda pc, rd, rs1: [f"writeMemory(r{rd}, r{rs1}, True)"],
+    exeJMR: lambda pc, rd, rs1: [f"nextPC = {pc} + toSigned(r{rs1})"],
+    exeJMRs: lambda pc, rd, rs1: [f"nextPC = {pc} + toSigned(r{rs1})", f"r{rd} = {(pc + 1) & WORD_MASK}"],
+    exeJMI: lambda pc, rd, imm: [f"r{rd} = {(pc + 1) & WORD_MASK}", f"nextPC = {pc + imm}"],
+    exeANR: lambda pc, rd, rs1, rs2: [f"r{rd} = r{rs1} & r{rs2}"],
+    exeANI: lambda pc, rd, imm: [f"r{rd} = r{rd} & {imm}"],
+    exeMSI: lambda pc, rd, imm: [f"r{rd} = {imm & WORD_MASK}"],
+    exeMHI: lambda pc, rd, imm: [f"r{rd} = {(imm << 8) & WORD_MASK}"],
+    exeSLR: lambda pc, rd, rs1, rs2: [
+        f"isLeftShift, amount = shiftAmount(r{rs2})",
+        f"r{rd} = (r{rs1} << amount) & {WORD_MASK} if isLeftShift else r{rs1} >> amount",
+    ],
+    exeSAR: lambda pc, rd, rs1, rs2: [
+        f"isLeftShift, amount = shiftAmount(r{rs2})",
+        f"r{rd} = (r{rs1} << amount if isLeftShift else toSigned(r{rs1}) >> amount) & {WORD_MASK}",
+    ],
+    exeADD: lambda pc, rd, rs1, rs2: [f"r{rd} = (r{rs1} + r{rs2}) & {WORD_MASK}"],
+    exeSUB: lambda pc, rd, rs1, rs2: [f"r{rd} = (r{rs1} - r{rs2}) & {WORD_MASK}"],
+    exeADI: lambda pc, rd, imm: [f"r{rd} = (r{rd} + {imm}) & {WORD_MASK}"],
+    exeSUI: lambda pc, rd, imm: [f"r{rd} = (r{rd} - {imm}) & {WORD_MASK}"],
+    exeMUL: lambda pc, rd, rs1, rs2: [f"r{rd} = (r{rs1} * r{rs2}) & {WORD_MASK}"],
+    exeDIV: lambda pc, rd, rs1, rs2: [f"r{rd} = int(toSigned(r{rs1}) / toSigned(r{rs2})) & {WORD_MASK}"],
+    exeCMR: lambda pc, rs1, rs2: [
+        f"a = toSigned(r{rs1})",
+        f"b = toSigned(r{rs2})",
+        "flags = FLAGS_EQUAL if a == b else FLAGS_GREATER if a > b else FLAGS_LESS",
+    ],
+    exeCMI: lambda pc, imm, rs1: [
+        f"a = toSigned(r{rs1})",
+        f"flags = FLAGS_EQUAL if a == {imm} else FLAGS_GREATER if a > {imm} else FLAGS_LESS",
+    ],
+    exeBRC: lambda pc, fib, rd: [f"nextPC = r{rd} if flags & {FIB_FLAGS[fib & 0b111]} else {pc + 1}"],
+    exeBRR: lambda pc, fib, rd: [f"nextPC = {pc} + toSigned(r{rd}) if flags & {FIB_FLAGS[fib & 0b111]} else {pc + 1}"],
+    exeSHI: lambda pc, shimm, rd: [
+        f"r{rd} = (r{rd} << {-shimm}) & {WORD_MASK}" if shimm < 0 else f"r{rd} = r{rd} >> {shimm}"
+    ],
+    exeSHIla: lambda pc, shimm, rd: [
+        f"r{rd} = (r{rd} << {-shimm}) & {WORD_MASK}" if shimm < 0
+        else f"r{rd} = (toSigned(r{rd}) >> {shimm}) & {WORD_MASK}"
+    ],
+    exeNTR: lambda pc, rd, rs1: [f"r{rd} = ~r{rs1} & {WORD_MASK}"],
+    exeNTR2c: lambda pc, rd, rs1: [f"r{rd} = -r{rs1} & {WORD_MASK}"],
+    exeNTD: lambda pc, rd: [f"r{rd} = ~r{rd} & {WORD_MASK}"],
+    exeNTD2c: lambda pc, rd: [f"r{rd} = -r{rd} & {WORD_MASK}"],
+}
+
+# instructions that end a basic block
+BLOCK_ENDS = (exeJMR, exeJMRs, exeJMI, exeBRC, exeBRR)
+
+# instructions that may raise (or call out of the block), the machine state is synced before re-raising
+MAY_RAISE = (exeLdRio, exeSTR, exeSTRio, exeDIV)
+
+REGISTER_PATTERN = re.compile(r"\br(\d+)\b")
+REGISTER_WRITE_PATTERN = re.compile(r"^r(\d+) = ")
+
+BLOCK_GLOBALS = {
+    "toSigned": toSigned,
+    "shiftAmount": shiftAmount,
+    "FLAGS_EQUAL": FLAGS_EQUAL,
+    "FLAGS_GREATER": FLAGS_GREATER,
+    "FLAGS_LESS": FLAGS_LESS,
+}
+
+
+def generateBlockSource(program: list, startPC: int, name: str):
+    # program: [(execute, operands)] --> (source of "def <name>(sayac)" returning the next PC, number of instructions)
+    body = []
+    pc = startPC
+    nextPCSet = False
+    while pc < len(program) and pc - startPC < MAX_BLOCK_LENGTH:
+        execute, operands = program[pc]
+        if execute in MAY_RAISE:
+            body.append(f"faultPC = {pc}")
+        body.extend(BLOCK_EMITTERS[execute](pc, *operands))
+        pc += 1
+        if execute in BLOCK_ENDS:
+            nextPCSet = True
+            break
+    if not nextPCSet:
+        body.append(f"nextPC = {pc}")
+    code = "\n".join(body)
+    usedRegisters = sorted({int(reg) for reg in REGISTER_PATTERN.findall(code)})
+    writtenRegisters = sorted({int(match) for line in body for match in REGISTER_WRITE_PATTERN.findall(line)})
+    usesFlags = "flags" in code
+    writesFlags = "flags = " in code
+    canRaise = "faultPC" in code
+
+    writeBack = [f"registers[{reg}] = r{reg}" for reg in writtenRegisters]
+    if writesFlags:
+        writeBack.append("sayac.flagBits = flags")
+    lines = [f"def {name}(sayac):", "    registers = sayac.registers"]
+    lines += [f"    r{reg} = registers[{reg}]" for reg in usedRegisters]
+    if usesFlags:
+        lines.append("    flags = sayac.flagBits")
+    if "memoryWords" in code:
+        lines.append("    memoryWords = sayac.memory.words")
+    if "readMemory" in code:
+        lines.append("    readMemory = sayac.readMemory")
+    if "writeMemory" in code:
+        lines.append("    writeMemory = sayac.writeMemory")
+    if canRaise:
+        # on an exception the machine must look exactly like the interpreter left it; an interrupt before the first
+        # instruction that may raise leaves the PC at the start of the block
+        lines.append(f"    faultPC = {startPC}")
+        lines.append("    try:")
+        lines += [f"        {line}" for line in body]
+        lines.append("    except BaseException:")
+        lines += [f"        {line}" for line in writeBack]
+        lines.append("        sayac.PC = faultPC")
+        lines.append("        raise")
+    else:
+        lines += [f"    {line}" for line in body]
+    lines += [f"    {line}" for line in writeBack]
+    lines.append("    return nextPC")
+    return "\n".join(lines) + "\n", pc - startPC
+
+
+def compileBlock(program: list, startPC: int):
+    # --> (block function, number of instructions), a block that does not raise runs all of its instructions
+    name = f"block_{startPC}"
+    source, length = generateBlockSource(program, startPC, name)
+    namespace = dict(BLOCK_GLOBALS)
+    exec(compile(source, f"<sayac block {startPC}>", "exec"), namespace)
+    return namespace[name], length
+
+
+class BlockJIT:
+    # per program cache of compiled blocks keyed by their start PC, blocks work on any Sayac instance
+    def __init__(self, program: list, hotThreshold: int = DEFAULT_HOT_THRESHOLD):
+        self.program = program  # [(execute, operands)]
+        self.hotThreshold = hotThreshold
+        self.blocks = {}
+        self.lengths = {}  # start PC --> instructions of the block
+        self.counts = {}
+
+    def compile(self, pc: int):
+        self.blocks[pc], self.lengths[pc] = compileBlock(self.program, pc)
+
+    def run(self, sayac, boundProgram: list = None, maxSteps: int = None):
+        # runs until the PC leaves the program, cold code is interpreted one instruction at a time
+        # maxSteps: stop after that many instructions, as the interpreter would (see runSteps)
+        program = self.program
+        if boundProgram is None:
+            boundProgram = [(lambda execute, operands: lambda: execute(sayac, *operands))(execute, operands)
+                            for execute, operands in program]
+        if maxSteps is not None:
+            return self.runSteps(sayac, boundProgram, maxSteps)
+        blocks = self.blocks
+        counts = self.counts
+        hotThreshold = self.hotThreshold
+        programLength = len(program)
+        while 0 <= sayac.PC < programLength:
+            pc = sayac.PC
+            block = blocks.get(pc)
+            if block is not None:
+                sayac.PC = block(sayac)
+                continue
+            count = counts.get(pc, 0) + 1
+            if count >= hotThreshold:
+                self.compile(pc)
+                continue
+            counts[pc] = count
+            boundProgram[pc]()
+            sayac.PC += 1
+
+    def runSteps(self, sayac, boundProgram: list, maxSteps: int):
+        # run() that stops after maxSteps instructions --> executed instructions
+        # a block that would pass the limit is interpreted instead, so the run ends exactly at the limit
+        blocks = self.blocks
+        lengths = self.lengths
+        counts = self.counts
+        hotThreshold = self.hotThreshold
+        programLength = len(self.program)
+        steps = 0
+        while 0 <= sayac.PC < programLength and steps < maxSteps:
+            pc = sayac.PC
+            block = blocks.get(pc)
+            if block is not None:
+                if steps + lengths[pc] <= maxSteps:
+                    sayac.PC = block(sayac)
+                    steps += lengths[pc]
+                    continue
+            else:
+                count = counts.get(pc, 0) + 1
+                if count >= hotThreshold:
+                    self.compile(pc)
+                    continue
+                counts[pc] = count
+            boundProgram[pc]()
+            sayac.PC += 1
+            steps += 1
+        return steps
@@ -0,0 +1,258 @@
+import io
+import re
+import array
+import itertools
+
+from SAYAC_ISA import AssemblySyntaxError, baseNumberToInt, toSigned, WORD_MASK
+
+# Labels and branch relaxation: the second pass of the assembler, between the lexer (lexLines) and the instruction
+# parser. "<name>:" before an instruction names its address, and a label can be used wherever a number is expected
+# (its value is the address). Jumps to labels are relaxed, i.e. they get the shortest form that reaches the target:
+#   JMI rd <label>         JMI rd <offset>                  when the offset fits in 6 bits
+#                          MSI rd <offset>; JMRs rd rd       when it fits in 8 bits
+#                          MHI rd <hi>; ADI rd <lo>; JMRs rd rd
+#   LDI rd <value|label>   MSI rd <value> or MHI rd <hi>; ADI rd <lo>
+#   BRC fib rd <value|label>   LDI rd <value|label>; BRC fib rd
+#   BRR fib rd <offset|label>  LDI rd <offset>; BRR fib rd   (a number is the offset from the BRR itself)
+# (the long JMI writes the return address to rd like JMI does, BRC/BRR use rd for the target)
+# The statements stream through until the first one that defines or uses a label. From there on only the text of
+# every instruction is kept (in one buffer, with its line and size) until the addresses of the labels are known.
+
+LABEL_NAME = re.compile(r"[A-Za-z_.][\w.]*\Z")
+REGISTER_NAME = re.compile(r"_*r\d+\Z", re.IGNORECASE)
+
+INS_LDI = "ldi"  # Load a 16-bit immediate value (or the address of a label) to register
+RELAXED_TYPES = frozenset((INS_LDI, "jmi", "brc", "brr"))  # instructions that may take a label to relax
+
+# item kinds
+ITEM_JMI = 0
+ITEM_LDI = 1
+ITEM_BRC = 2
+ITEM_BRR = 3
+MAX_SIZES = (3, 2, 3, 3)  # words of the longest form of every kind
+
+
+def fitsShortJump(value: int):
+    return -32 <= value <= 31
+
+
+def fitsByte(value: int):
+    return -128 <= value <= 127
+
+
+def loadTokens(rd: str, value: int, words: int):
+    # rd <- value in 1 (MSI) or 2 (MHI, ADI) instructions
+    value = toSigned(value & WORD_MASK)
+    if words == 1:
+        return [["MSI", rd, str(value)]]
+    low = ((value & 0xFF) ^ 0x80) - 0x80  # ADI adds a sign extended byte
+    return [["MHI", rd, str(((value - low) >> 8) & 0xFF)], ["ADI", rd, str(low)]]
+
+
+def parseValue(arg: str, line: int):
+    # number or label operand --> (number, None) or (None, label)
+    try:
+        value = baseNumberToInt(arg)
+    except ValueError:
+        if LABEL_NAME.match(arg) and not REGISTER_NAME.match(arg):
+            return None, arg
+        raise AssemblySyntaxError(f"Invalid value '{arg}' on line {line}", line) from None
+    if not -0x8000 <= value <= WORD_MASK:
+        raise AssemblySyntaxError(f"Value '{arg}' does not fit in 16 bits on line {line}", line)
+    return value, None
+
+
+class SizeTree:
+    # Fenwick tree of the instruction sizes: address of an item and resizing it in O(log n)
+    def __init__(self, sizes):
+        self.tree = array.array("l", [0])
+        self.tree.extend(sizes)
+        for index in range(1, len(self.tree)):
+            parent = index + (index & -index)
+            if parent < len(self.tree):
+                self.tree[parent] += self.tree[index]
+
+    def grow(self, item: int, amount: int):
+        index = item + 1
+        while index < len(self.tree):
+            self.tree[index] += amount
+            index += index & -index
+
+    def address(self, item: int):
+        # sum of the sizes of the items before item
+        address = 0
+        while item > 0:
+            address += self.tree[item]
+            item -= item & -item
+        return address
+
+
+def neededSize(kind: int, start: int, target: int):
+    # words needed by an item at address start for the target (value of LDI)
+    if kind == ITEM_LDI:
+        return 1 if fitsByte(target) else 2
+    if kind == ITEM_BRC:
+        return 2 if fitsByte(target) else 3
+    if kind == ITEM_JMI and fitsShortJump(target - start):
+        return 1
+    # the jump (JMRs or BRR) follows a load of its offset, which is relative to the jump itself
+    return 2 if fitsByte(target - start - 1) else 3
+
+
+def relax(kinds: list, items: list, targets: list, sizes, base: int = 0):
+    # grows the items that do not reach their targets until every one does, sizes never shrink so this ends
+    # base: address of the first item
+    # sweeps alternate direction, a growth is seen at once by the items after it in the sweep, so a chain of jumps
+    # over each other settles in one sweep in the right direction
+    tree = SizeTree(sizes)
+    order = list(range(0, len(items)))
+    changed = True
+    while changed:
+        changed = False
+        for index in order:
+            kind = kinds[index]
+            item = items[index]
+            size = sizes[item]
+            if size == MAX_SIZES[kind]:
+                continue
+            target = targets[index]
+            if not isinstance(target, int):
+                target = base + tree.address(target[0])  # label --> (item it names,)
+            needed = neededSize(kind, base + tree.address(item), target)
+            if needed > size:
+                sizes[item] = needed
+                tree.grow(item, needed - size)
+                changed = True
+        order.reverse()
+
+
+def relaxedKind(tokens: list, line: int):
+    # item kind of a relaxed instruction (its target is the last operand), None if it is not relaxed
+    insType = tokens[0].lower()
+    if insType == INS_LDI:
+        if len(tokens) != 3:
+            raise AssemblySyntaxError(f"Not enough argument for instruction '{insType}'", line)
+        return ITEM_LDI
+    if insType == "jmi":
+        return ITEM_JMI if len(tokens) == 3 and parseValue(tokens[2], line)[1] is not None else None
+    if insType in ("brc", "brr") and len(tokens) == 4:
+        # a number is loaded as it is: the target of BRC, the offset of BRR
+        return ITEM_BRR if insType == "brr" and parseValue(tokens[3], line)[1] is not None else ITEM_BRC
+    return None
+
+
+def expandItem(kind: int, tokens: list, line: int, target: int, start: int, size: int):
+    # --> tokens of the instructions of a relaxed item of size words at address start (target: number or address of
+    # the label)
+    if kind == ITEM_JMI and size == 1:
+        return [[tokens[0], tokens[1], str(target - start)]]
+    if kind in (ITEM_JMI, ITEM_BRR):
+        # offset from the jump, the last instruction of the expansion
+        target -= start + size - 1
+        reachable = -0x8000 <= target <= 0x7FFF
+    else:
+        reachable = -0x8000 <= target <= WORD_MASK
+    if not reachable:
+        raise AssemblySyntaxError(f"Target of '{' '.join(tokens)}' on line {line} is out of the 16-bit range", line)
+    if kind == ITEM_LDI:
+        return loadTokens(tokens[1], target, size)
+    if kind == ITEM_JMI:
+        return loadTokens(tokens[1], target, size - 1) + [["JMRs", tokens[1], tokens[1]]]
+    return loadTokens(tokens[2], target, size - 1) + [tokens[:3]]
+
+
+def resolveLabels(statements):
+    # (source line number, tokens) of every statement (see lexLines) --> the same for every instruction, with the
+    # labels defined and replaced by numbers and the relaxed jumps expanded
+    statements = iter(statements)
+    address = 0  # of the next instruction
+    labelTokens = {}  # operand token --> can it be a label
+    for line, tokens in statements:
+        usesLabel = tokens[0].endswith(":")
+        if not usesLabel:
+            for token in tokens[1:]:
+                isLabel = labelTokens.get(token)
+                if isLabel is None:
+                    isLabel = LABEL_NAME.match(token) is not None and not REGISTER_NAME.match(token)
+                    labelTokens[token] = isLabel
+                if isLabel:
+                    usesLabel = True
+                    break
+        if usesLabel:
+            yield from resolveBuffered(itertools.chain([(line, tokens)], statements), address)
+            return
+        kind = relaxedKind(tokens, line) if tokens[0].lower() in RELAXED_TYPES else None
+        if kind is None:
+            yield line, tokens
+            address += 1
+            continue
+        # the target is a number, the size is known at once
+        target = parseValue(tokens[-1], line)[0]
+        size = neededSize(kind, address, target)
+        for expandedTokens in expandItem(kind, tokens, line, target, address, size):
+            yield line, expandedTokens
+        address += size
+
+
+def resolveBuffered(statements, base: int):
+    # resolveLabels from the first statement that defines or uses a label on, base: its address
+    lineNumbers = array.array("l")  # of every instruction
+    texts = io.BytesIO()  # tokens of every instruction, one line each
+    sizes = bytearray()  # words of every instruction
+    symbols = {}  # label --> (index of the next instruction, line)
+    relaxed = []  # (index of the instruction, kind, operand)
+    for line, tokens in statements:
+        while tokens and tokens[0].endswith(":"):
+            name = tokens[0][:-1]
+            if not LABEL_NAME.match(name) or REGISTER_NAME.match(name):
+                raise AssemblySyntaxError(f"Invalid label '{name}' on line {line}", line)
+            if name in symbols:
+                raise AssemblySyntaxError(f"Label '{name}' on line {line} is already defined on line "
+                                          f"{symbols[name][1]}", line)
+            symbols[name] = (len(sizes), line)
+            tokens = tokens[1:]
+        if not tokens:
+            continue
+        kind = relaxedKind(tokens, line) if tokens[0].lower() in RELAXED_TYPES else None
+        if kind is not None:
+            relaxed.append((len(sizes), kind, tokens[-1]))
+        lineNumbers.append(line)
+        texts.write((" ".join(tokens) + "\n").encode())
+        sizes.append(2 if kind in (ITEM_BRC, ITEM_BRR) else 1)
+
+    # second pass: sizes of the relaxed items, then the addresses of the labels
+    kinds = []
+    items = []
+    targets = []  # number, or (index of the labelled instruction,)
+    for index, kind, operand in relaxed:
+        line = lineNumbers[index]
+        value, label = parseValue(operand, line)
+        if label is not None:
+            if label not in symbols:
+                raise AssemblySyntaxError(f"Undefined label '{label}' on line {line}", line)
+            value = (symbols[label][0],)
+        kinds.append(kind)
+        items.append(index)
+        targets.append(value)
+    relax(kinds, items, targets, sizes, base)
+    addresses = array.array("l", [base])
+    for size in sizes:
+        addresses.append(addresses[-1] + size)
+    values = {name: addresses[index] for name, (index, line) in symbols.items()}
+
+    texts.seek(0)
+    item = 0  # next relaxed item
+    nextItem = items[0] if items else None  # its instruction
+    for index, (text, line) in enumerate(zip(texts, lineNumbers)):
+        tokens = text.decode().split()
+        if index == nextItem:
+            target = targets[item]
+            target = addresses[target[0]] if not isinstance(target, int) else target
+            for expandedTokens in expandItem(kinds[item], tokens, line, target, addresses[index], sizes[index]):
+                yield line, expandedTokens
+            item += 1
+            nextItem = items[item] if item < len(items) else None
+            continue
+        if values:
+            tokens = tokens[:1] + [str(values[token]) if token in values else token for token in tokens[1:]]
+        yield line, tokens
@@ -0,0 +1,310 @@
+import sys
+import heapq
+
+from SAYAC_ISA import baseNumberToInt, toSigned, WORD_MASK
+
+# Memory-mapped IO peripherals: devices own address ranges of the IO memory (LDRio/STRio) and are driven by an event
+# queue on the simulated cycle count (one cycle per executed instruction), so nothing runs per instruction except the
+# cycle counter and a compare with the next event
+
+NO_EVENT = float("inf")
+NO_DATA = 0xFFFF  # read from an empty UART
+
+
+class Device:
+    # a device with `size` registers at IO addresses base..base+size-1
+    name = "device"
+    size = 1
+
+    def __init__(self, base: int):
+        self.base = base & WORD_MASK
+        self.bus = None
+
+    def attach(self, bus):
+        self.bus = bus
+
+    def read(self, offset: int):
+        return 0
+
+    def write(self, offset: int, value: int):
+        pass
+
+    def close(self):
+        pass
+
+    def describe(self):
+        return f"{self.name}@0x{self.base:04x}"
+
+
+class Timer(Device):
+    # +0 COUNT    cycles / prescale since it was last written (write: set the count)
+    # +1 PERIOD   cycles / prescale between two expiries
+    # +2 CONTROL  bit 0: expire every PERIOD
+    # +3 STATUS   bit 0: expired since the last clear (write 1 to clear)
+    # +4 EXPIRIES number of expiries
+    name = "timer"
+    size = 5
+
+    def __init__(self, base: int, prescale: int = 1):
+        super().__init__(base)
+        self.prescale = max(1, prescale)
+        self.start = 0  # cycle of count 0
+        self.period = 0
+        self.control = 0
+        self.status = 0
+        self.expiries = 0
+        self.generation = 0  # expiries scheduled by an older configuration are ignored
+
+    def read(self, offset: int):
+        if offset == 0:
+            return (self.bus.cycle - self.start) // self.prescale & WORD_MASK
+        return (0, self.period, self.control, self.status, self.expiries & WORD_MASK)[offset]
+
+    def write(self, offset: int, value: int):
+        if offset == 0:
+            self.start = self.bus.cycle - value * self.prescale
+        elif offset == 1:
+            self.period = value
+            self.schedule()
+        elif offset == 2:
+            self.control = value
+            self.schedule()
+        elif offset == 3:
+            self.status &= ~value
+
+    def schedule(self):
+        self.generation += 1
+        if self.control & 1 and self.period != 0:
+            generation = self.generation
+            self.bus.schedule(self.bus.cycle + self.period * self.prescale, lambda cycle: self.expire(generation))
+
+    def expire(self, generation: int):
+        if generation != self.generation:
+            return
+        self.status |= 1
+        self.expiries += 1
+        self.bus.schedule(self.bus.cycle + self.period * self.prescale, lambda cycle: self.expire(generation))
+
+
+class Uart(Device):
+    # +0 DATA    read: next received byte (0xFFFF when there is none), write: send the low byte
+    # +1 STATUS  bit 0: a received byte is waiting, bit 1: ready to send (always)
+    # received bytes come from a file or stdin (reading STATUS waits for the next byte of an interactive stdin)
+    name = "uart"
+    size = 2
+
+    def __init__(self, base: int, inputFileName: str = "-", outputFileName: str = "-"):
+        super().__init__(base)
+        self.input = sys.stdin.buffer if inputFileName == "-" else open(inputFileName, "rb")
+        self.output = sys.stdout.buffer if outputFileName == "-" else open(outputFileName, "wb")
+        self.received = None  # byte read ahead by STATUS
+        self.sent = 0
+
+    def receive(self):
+        if self.received is None:
+            data = self.input.read(1)
+            self.received = data[0] if data else NO_DATA
+        return self.received
+
+    def read(self, offset: int):
+        if offset == 0:
+            value = self.receive()
+            if value != NO_DATA:
+                self.received = None
+            return value
+        return (1 if self.receive() != NO_DATA else 0) | 2
+
+    def write(self, offset: int, value: int):
+        if offset == 0:
+            if self.output is sys.stdout.buffer:
+                # keep the order with the text printed by the simulator
+                sys.stdout.flush()
+            self.output.write(bytes([value & 0xFF]))
+            self.output.flush()
+            self.sent += 1
+
+    def close(self):
+        if self.input is not sys.stdin.buffer:
+            self.input.close()
+        if self.output is not sys.stdout.buffer:
+            self.output.close()
+
+
+class Gpio(Device):
+    # +0 OUT  output pins (every change is logged with its cycle)
+    # +1 IN   input pins, changed at the cycles given by the input file ("<cycle> <value>" per line)
+    name = "gpio"
+    size = 2
+
+    def __init__(self, base: int, inputFileName: str = None, outputFileName: str = None):
+        super().__init__(base)
+        self.pins = 0
+        self.inputs = 0
+        self.changes = []  # (cycle, value) of every write to OUT
+        self.inputChanges = []
+        if inputFileName is not None:
+            f = open(inputFileName, "r")
+            for line in f:
+                if line.strip() != "":
+                    cycle, value = line.split()
+                    self.inputChanges.append((baseNumberToInt(cycle), baseNumberToInt(value) & WORD_MASK))
+            f.close()
+        self.output = open(outputFileName, "w") if outputFileName is not None else None
+
+    def attach(self, bus):
+        super().attach(bus)
+        for cycle, value in self.inputChanges:
+            bus.schedule(cycle, lambda eventCycle, value=value: self.setInputs(value))
+
+    def setInputs(self, value: int):
+        self.inputs = value
+
+    def read(self, offset: int):
+        return self.pins if offset == 0 else self.inputs
+
+    def write(self, offset: int, value: int):
+        if offset == 0 and value != self.pins:
+            self.pins = value
+            self.changes.append((self.bus.cycle, value))
+            if self.output is not None:
+                self.output.write(f"{self.bus.cycle} {value}\n")
+
+    def close(self):
+        if self.output is not None:
+            self.output.close()
+
+
+class Console(Device):
+    # +0 write: print the value, +1 write: print the signed value, +2 write: print the character
+    name = "console"
+    size = 3
+
+    def __init__(self, base: int, outputFileName: str = "-"):
+        super().__init__(base)
+        self.output = sys.stdout if outputFileName == "-" else open(outputFileName, "w")
+
+    def write(self, offset: int, value: int):
+        if offset == 0:
+            self.output.write(f"{value}\n")
+        elif offset == 1:
+            self.output.write(f"{toSigned(value)}\n")
+        else:
+            self.output.write(chr(value))
+        self.output.flush()
+
+    def close(self):
+        if self.output is not sys.stdout:
+            self.output.close()
+
+
+class IOBus:
+    def __init__(self, devices: list = ()):
+        self.cycle = 0  # executed instructions
+        self.events = []  # heap of (cycle, order, callback)
+        self.order = 0
+        self.nextEvent = NO_EVENT
+        self.devices = []
+        self.addresses = {}  # IO address --> (device, offset)
+        for device in devices:
+            self.add(device)
+
+    def add(self, device: Device):
+        for offset in range(0, device.size):
+            address = (device.base + offset) & WORD_MASK
+            if address in self.addresses:
+                other = self.addresses[address][0]
+                raise ValueError(f"{device.describe()} overlaps {other.describe()} at 0x{address:04x}")
+            self.addresses[address] = (device, offset)
+        self.devices.append(device)
+        device.attach(self)
+
+    def schedule(self, cycle: int, callback):
+        # callback(cycle) runs once the simulation has reached cycle
+        heapq.heappush(self.events, (cycle, self.order, callback))
+        self.order += 1
+        self.nextEvent = self.events[0][0]
+
+    def runEvents(self):
+        events = self.events
+        while events and events[0][0] <= self.cycle:
+            cycle, order, callback = heapq.heappop(events)
+            callback(cycle)
+        self.nextEvent = events[0][0] if events else NO_EVENT
+
+    def attach(self, sayac):
+        # IO accesses to the devices go through the bus, writes are still kept in the IO memory of the machine
+        readMemory = sayac.readMemory
+        writeMemory = sayac.writeMemory
+        addresses = self.addresses
+
+        def busReadMemory(address: int, fromIO: bool = False):
+            if fromIO and address in addresses:
+                device, offset = addresses[address]
+                return device.read(offset) & WORD_MASK
+            return readMemory(address, fromIO)
+
+        def busWriteMemory(address: int, value: int, fromIO: bool = False):
+            if fromIO and address in addresses:
+                device, offset = addresses[address]
+                device.write(offset, value)
+            writeMemory(address, value, fromIO)
+
+        sayac.readMemory = busReadMemory
+        sayac.writeMemory = busWriteMemory
+        self.runEvents()
+
+    def step(self):
+        # called after every executed instruction
+        self.cycle += 1
+        if self.cycle >= self.nextEvent:
+            self.runEvents()
+
+    def run(self, sayac, program: list):
+        # runProgram() with the cycle count, only used when devices are attached
+        programLength = len(program)
+        while 0 <= sayac.PC < programLength:
+            program[sayac.PC]()
+            sayac.PC += 1
+            self.cycle += 1
+            if self.cycle >= self.nextEvent:
+                self.runEvents()
+
+    def close(self):
+        for device in self.devices:
+            device.close()
+
+
+DEVICE_TYPES = {
+    "timer": Timer,
+    "uart": Uart,
+    "gpio": Gpio,
+    "console": Console,
+}
+
+# option of a device spec --> (constructor argument, parser)
+DEVICE_OPTIONS = {
+    "prescale": ("prescale", baseNumberToInt),
+    "in": ("inputFileName", str),
+    "out": ("outputFileName", str),
+}
+
+
+def parseDevice(spec: str):
+    # "<kind>@<address>[:<option>=<value>,...]", e.g. "uart@0x10:in=input.txt" --> Device
+    device, _, options = spec.partition(":")
+    kind, _, address = device.partition("@")
+    if kind not in DEVICE_TYPES or address == "":
+        raise ValueError(f"invalid device '{spec}' (use <kind>@<address>, kinds: {', '.join(DEVICE_TYPES)})")
+    kwargs = {}
+    for option in options.split(","):
+        if option == "":
+            continue
+        key, _, value = option.partition("=")
+        if key not in DEVICE_OPTIONS:
+            raise ValueError(f"invalid device option '{option}'")
+        argument, parser = DEVICE_OPTIONS[key]
+        kwargs[argument] = parser(value)
+    try:
+        return DEVICE_TYPES[kind](baseNumberToInt(address), **kwargs)
+    except TypeError:
+        raise ValueError(f"invalid option for {kind} in '{spec}'")
@@ -0,0 +1,182 @@
+import os
+import itertools
+
+from SAYAC_ISA import AssemblySyntaxError, INS_SPECS, lexLines
+from SAYAC_Labels import INS_LDI
+
+# Directives, expanded between the lexer (lexLines) and the labels (resolveLabels):
+#   .include "<file>"            the statements and macros of the file (relative to the including file)
+#   .macro <name> <param>...     defines a macro until .endm, using it as "<name> <arg>..." inserts its body with every
+#   ...                          parameter token replaced by its argument and "\@" by a number unique to the use
+#   .endm
+# instructions from an included file or a macro take the line of the .include or of the macro use.
+# An included file is lexed and expanded once per process (on its own, without the macros of the including file) and
+# cached by its path and modification time, so many files sharing a library do not lex it again.
+# Sources from elsewhere (e.g. the jobs of SAYAC_Server) are preprocessed with a root: included files have to be inside
+# it, and without a directory .include is not allowed at all.
+
+DIRECTIVE_INCLUDE = ".include"
+DIRECTIVE_MACRO = ".macro"
+DIRECTIVE_END_MACRO = ".endm"
+UNIQUE_LABEL = "\\@"
+MACRO_DEPTH_LIMIT = 64  # nested macro uses, deeper ones are taken as a recursion
+MACRO_EXPANSION_LIMIT = 1000000  # statements expanded from macros in one file (nested macros can grow exponentially)
+
+includeCache = {}  # real path --> (modification time, statements, macros, included files)
+uniqueNumbers = itertools.count(1)
+
+
+class Macro:
+    def __init__(self, name: str, parameters: list, body: list, line: int):
+        self.name = name
+        self.parameters = parameters
+        self.body = body  # tokens of every statement
+        self.line = line
+
+    def expand(self, arguments: list, line: int):
+        # --> tokens of every statement of the body
+        if len(arguments) != len(self.parameters):
+            raise AssemblySyntaxError(f"Macro '{self.name}' takes {len(self.parameters)} arguments, "
+                                      f"{len(arguments)} given on line {line}", line)
+        values = dict(zip(self.parameters, arguments))
+        unique = f".{next(uniqueNumbers)}"
+        return [[values.get(token, token).replace(UNIQUE_LABEL, unique) for token in tokens] for tokens in self.body]
+
+
+def includesCurrent(includes: list):
+    # are the (path, modification time) of the included files still the same (None: the file was missing)
+    for path, mtime in includes:
+        try:
+            if os.stat(path).st_mtime_ns != mtime:
+                return False
+        except OSError:
+            if mtime is not None:
+                return False
+    return True
+
+
+def insideRoot(path: str, root: str):
+    # is the real path inside the root directory (None: anywhere)
+    if root is None:
+        return True
+    root = os.path.realpath(root)
+    return os.path.commonpath([root, path]) == root
+
+
+def includeFile(fileName: str, line: int, including: tuple, root: str = None, includes: list = None):
+    # --> (statements, macros) of the file, from the cache while it has not changed
+    # includes: gets the (path, modification time) of the file and of the files it includes, also when it fails (so a
+    # watcher knows which files to look at)
+    includes = [] if includes is None else includes
+    path = os.path.realpath(fileName)
+    if not insideRoot(path, root):
+        raise AssemblySyntaxError(f"Included file '{fileName}' is outside of the include directory on line {line}",
+                                  line)
+    if path in including:
+        raise AssemblySyntaxError(f"Circular include of '{fileName}' on line {line}", line)
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        includes.append((path, None))
+        raise AssemblySyntaxError(f"Included file '{fileName}' not found on line {line}", line) from None
+    cached = includeCache.get(path)
+    if cached is not None and cached[0] == mtime and includesCurrent(cached[3]):
+        includes.extend(cached[3])
+        for includedPath, includedMtime in cached[3]:
+            if not insideRoot(includedPath, root):
+                raise AssemblySyntaxError(f"'{fileName}' includes a file outside of the include directory "
+                                          f"on line {line}", line)
+        return cached[1:3]
+    macros = {}
+    fileIncludes = []
+    f = open(path, "r")
+    try:
+        statements = list(preprocess(lexLines(f), os.path.dirname(path), macros, fileIncludes, including + (path,),
+                                     root))
+    except AssemblySyntaxError as e:
+        raise AssemblySyntaxError(f"{e.message} in '{fileName}' (included on line {line})", line) from None
+    finally:
+        f.close()
+        fileIncludes.append((path, mtime))
+        includes.extend(fileIncludes)
+    includeCache[path] = (mtime, statements, macros, fileIncludes)
+    return statements, macros
+
+
+def expandMacros(line: int, tokens: list, macros: dict, expansions, depth: int = 0):
+    # --> (line, tokens) of the statement, or of its expansion if it uses a macro (after its labels)
+    # expansions: counter of the statements expanded from macros so far
+    if depth > 0 and next(expansions) >= MACRO_EXPANSION_LIMIT:
+        raise AssemblySyntaxError(f"Macros expand to more than {MACRO_EXPANSION_LIMIT} statements on line {line}",
+                                  line)
+    start = 0
+    while start < len(tokens) and tokens[start].endswith(":"):
+        start += 1
+    macro = macros.get(tokens[start].lower()) if start < len(tokens) else None
+    if macro is None:
+        yield line, tokens
+        return
+    if depth >= MACRO_DEPTH_LIMIT:
+        raise AssemblySyntaxError(f"Macro '{macro.name}' is nested too deep (recursive?) on line {line}", line)
+    expanded = macro.expand(tokens[start + 1:], line)
+    if start > 0:
+        # the labels name the first instruction of the body
+        expanded = [tokens[:start] + expanded[0]] + expanded[1:] if expanded else [tokens[:start]]
+    for expandedTokens in expanded:
+        yield from expandMacros(line, expandedTokens, macros, expansions, depth + 1)
+
+
+def preprocess(statements, directory: str = ".", macros: dict = None, includes: list = None, including: tuple = (),
+               root: str = None):
+    # (source line number, tokens) of every statement (see lexLines) --> the same with the directives done
+    # streams one statement at a time, a source without directives and macros goes straight through
+    # directory: of the relative included files, None if .include is not allowed
+    # macros: defined macros (the ones defined by the source are added), includes: gets the (path, modification time)
+    # of every included file (both are filled while the statements are read), root: directory the included files
+    # have to be in (None: anywhere)
+    macros = {} if macros is None else macros
+    includes = [] if includes is None else includes
+    expansions = itertools.count()
+    definition = None  # macro being defined
+    for line, tokens in statements:
+        if definition is None and not tokens[0].startswith("."):
+            if macros:
+                yield from expandMacros(line, tokens, macros, expansions)
+            else:
+                yield line, tokens
+            continue
+        directive = tokens[0].lower()
+        if definition is not None:
+            if directive == DIRECTIVE_END_MACRO:
+                macros[definition.name] = definition
+                definition = None
+            elif directive == DIRECTIVE_MACRO:
+                raise AssemblySyntaxError(f"Macro defined inside macro '{definition.name}' on line {line}", line)
+            else:
+                definition.body.append(tokens)
+        elif directive == DIRECTIVE_MACRO:
+            if len(tokens) < 2:
+                raise AssemblySyntaxError(f"No macro name on line {line}", line)
+            name = tokens[1].lower()
+            if name in INS_SPECS or name == INS_LDI or name.startswith("."):
+                raise AssemblySyntaxError(f"Invalid macro name '{tokens[1]}' on line {line}", line)
+            definition = Macro(name, tokens[2:], [], line)
+        elif directive == DIRECTIVE_END_MACRO:
+            raise AssemblySyntaxError(f"{DIRECTIVE_END_MACRO} without {DIRECTIVE_MACRO} on line {line}", line)
+        elif directive == DIRECTIVE_INCLUDE:
+            if len(tokens) < 2:
+                raise AssemblySyntaxError(f"No file to include on line {line}", line)
+            if directory is None:
+                raise AssemblySyntaxError(f"{DIRECTIVE_INCLUDE} is not allowed on line {line}", line)
+            fileName = os.path.join(directory, " ".join(tokens[1:]).strip("\"'"))
+            included, includedMacros = includeFile(fileName, line, including, root, includes)
+            macros.update(includedMacros)
+            for includedLine, includedTokens in included:
+                yield line, includedTokens
+        elif macros:
+            yield from expandMacros(line, tokens, macros, expansions)
+        else:
+            yield line, tokens
+    if definition is not None:
+        raise AssemblySyntaxError(f"Macro '{definition.name}' on line {definition.line} has no {DIRECTIVE_END_MACRO}",
+                                  definition.line)
@@ -0,0 +1,151 @@
+import json
+
+from SAYAC_ISA import INSTRUCTION_SET, exeBRC, exeBRR
+
+# Execution profile of one simulator run: executions per PC (per opcode and source line are derived from them),
+# taken branches and memory accesses per address range
+
+PROFILE_RANGE_BITS = 8  # memory accesses are counted per 256-word address range
+
+# handler --> mnemonic, aliases come after their instruction in INSTRUCTION_SET so the first one wins
+EXECUTE_MNEMONICS = {}
+for _spec in INSTRUCTION_SET:
+    EXECUTE_MNEMONICS.setdefault(_spec.execute, _spec.mnemonic.upper())
+
+BRANCHES = (exeBRC, exeBRR)
+
+
+class Profiler:
+    def __init__(self, program: list, listing: list, lineNumbers: list = None, rangeBits: int = PROFILE_RANGE_BITS):
+        self.program = program  # [(execute, operands)]
+        self.listing = listing
+        self.lineNumbers = lineNumbers  # source line of every PC, None for images
+        self.rangeBits = rangeBits
+        self.counts = [0] * len(program)
+        self.taken = [0] * len(program)
+        self.isBranch = [execute in BRANCHES for execute, operands in program]
+        # (fromIO, address range) --> accesses
+        self.reads = {}
+        self.writes = {}
+
+    def attach(self, sayac):
+        # memory accesses are counted by wrapping the memory methods of this machine only
+        readMemory = sayac.readMemory
+        writeMemory = sayac.writeMemory
+        reads = self.reads
+        writes = self.writes
+        rangeBits = self.rangeBits
+
+        def profiledReadMemory(address: int, fromIO: bool = False):
+            key = (fromIO, address >> rangeBits)
+            reads[key] = reads.get(key, 0) + 1
+            return readMemory(address, fromIO)
+
+        def profiledWriteMemory(address: int, value: int, fromIO: bool = False):
+            key = (fromIO, address >> rangeBits)
+            writes[key] = writes.get(key, 0) + 1
+            writeMemory(address, value, fromIO)
+
+        sayac.readMemory = profiledReadMemory
+        sayac.writeMemory = profiledWriteMemory
+
+    def step(self, pc: int, sayac):
+        # called after the instruction at pc has been executed (before the PC moves on)
+        self.counts[pc] += 1
+        if self.isBranch[pc] and sayac.PC != pc:
+            self.taken[pc] += 1
+
+    def run(self, sayac, program: list):
+        # the profiling version of runProgram(), only used when profiling so the normal loop stays untouched
+        counts = self.counts
+        taken = self.taken
+        isBranch = self.isBranch
+        programLength = len(program)
+        while 0 <= sayac.PC < programLength:
+            pc = sayac.PC
+            program[pc]()
+            counts[pc] += 1
+            if isBranch[pc] and sayac.PC != pc:
+                taken[pc] += 1
+            sayac.PC += 1
+
+    def location(self, pc: int):
+        if self.lineNumbers is None:
+            return f"pc {pc}"
+        return f"line {self.lineNumbers[pc]}"
+
+    def addressRanges(self, accesses: dict, fromIO: bool):
+        size = 1 << self.rangeBits
+        return {f"0x{index * size:04x}-0x{(index + 1) * size - 1:04x}": count
+                for (io, index), count in sorted(accesses.items()) if io == fromIO}
+
+    def report(self):
+        opcodes = {}
+        lines = {}
+        for pc, count in enumerate(self.counts):
+            if count == 0:
+                continue
+            mnemonic = EXECUTE_MNEMONICS[self.program[pc][0]]
+            opcodes[mnemonic] = opcodes.get(mnemonic, 0) + count
+            if self.lineNumbers is not None:
+                line = self.lineNumbers[pc]
+                lines[line] = lines.get(line, 0) + count
+        return {
+            "instructions": sum(self.counts),
+            "opcodes": dict(sorted(opcodes.items(), key=lambda item: -item[1])),
+            "pcs": {pc: count for pc, count in enumerate(self.counts) if count != 0},
+            "lines": lines,
+            "branches": {pc: {"taken": self.taken[pc], "notTaken": self.counts[pc] - self.taken[pc]}
+                         for pc in range(0, len(self.program)) if self.isBranch[pc] and self.counts[pc] != 0},
+            "memory": {
+                "reads": self.addressRanges(self.reads, False),
+                "writes": self.addressRanges(self.writes, False),
+            },
+            "memoryIO": {
+                "reads": self.addressRanges(self.reads, True),
+                "writes": self.addressRanges(self.writes, True),
+            },
+        }
+
+    def annotatedListing(self, sourceLines: list = None):
+        # executions and share of the run in front of every source line (every instruction for images)
+        total = max(1, sum(self.counts))
+        if sourceLines is None or self.lineNumbers is None:
+            rows = [(self.counts[pc], f"{pc:>6}: {self.listing[pc]}") for pc in range(0, len(self.program))]
+        else:
+            lineCounts = [0] * (len(sourceLines) + 1)
+            for pc, count in enumerate(self.counts):
+                lineCounts[self.lineNumbers[pc]] += count
+            rows = [(lineCounts[lineIndex + 1], f"{lineIndex + 1:>6}: {sourceLines[lineIndex].rstrip()}")
+                    for lineIndex in range(0, len(sourceLines))]
+        text = []
+        for count, line in rows:
+            if count == 0:
+                text.append(f"{'':>12}{'':>9}  {line}")
+            else:
+                text.append(f"{count:>12}{count / total * 100:>8.2f}%  {line}")
+        return "\n".join(text) + "\n"
+
+    def collapsedStacks(self, name: str):
+        # "<program>;<opcode>;<location and instruction> <count>" lines for flamegraph tools
+        # (SAYAC has no call stack, so the frames group the executions by opcode and source line)
+        text = []
+        for pc, count in enumerate(self.counts):
+            if count == 0:
+                continue
+            mnemonic = EXECUTE_MNEMONICS[self.program[pc][0]]
+            frame = f"{self.location(pc)}: {self.listing[pc]}".replace(";", ",")
+            text.append(f"{name};{mnemonic};{frame} {count}")
+        return "\n".join(text) + "\n"
+
+    def writeReports(self, name: str, sourceLines: list = None):
+        # <name>.profile.json, <name>.profile.txt (annotated listing) and <name>.folded (collapsed stacks)
+        f = open(f"{name}.profile.json", "w")
+        f.write(json.dumps(self.report(), indent=2))
+        f.close()
+        f = open(f"{name}.profile.txt", "w")
+        f.write(self.annotatedListing(sourceLines))
+        f.close()
+        f = open(f"{name}.folded", "w")
+        f.write(self.collapsedStacks(name.replace(";", ",")))
+        f.close()
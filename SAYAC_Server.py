@@ -0,0 +1,427 @@
+import sys
+import os
+import json
+import stat
+import base64
+import signal
+import socket
+import struct
+import tempfile
+import threading
+import socketserver
+import concurrent.futures
+
+import SAYAC_API
+from SAYAC_ISA import baseNumberToInt
+from SAYAC_Image import IMAGE_AUTO, IMAGE_FORMATS, IMAGE_EXTENSIONS, formatImage
+from SAYAC_Inst2Bin import VERSION, binFileNameOf
+
+# Long-lived assembler/simulator server: jobs come in as JSON messages over a Unix domain socket (or localhost TCP)
+# and run on a pool of worker processes that have the assembler and the simulator already loaded
+#
+# A message is either a 4-byte big-endian length followed by that many bytes of UTF-8 JSON, or one line of JSON; the
+# answer uses the framing of the request.
+#   {"id": 1, "op": "assemble", "source": "...", "format": "raw-le"}
+#       --> {"id": 1, "ok": true, "result": {"words": [...], "image": "<base64>"}}
+#   {"op": "disassemble", "words": [...] or "image": "<base64>", "format": "auto"}
+#       --> {"ok": true, "result": {"listing": ["MSI r1 5", ...]}}
+#   {"op": "simulate", "source": "..." or "words"/"image", "state": {...}, "maxSteps": N, "timeout": seconds}
+#       --> {"ok": true, "result": {"state": {...}}}
+#   errors --> {"ok": false, "error": {"type": "AssemblyError", "message": "...", "line": 3}}
+# Every job stops after the timeout of the server; a worker that does not stop is killed and replaced.
+
+DEFAULT_SOCKET = os.path.join(tempfile.gettempdir(), "sayac.sock")
+DEFAULT_MAX_STEPS = 10000000  # instruction budget of a simulate job
+DEFAULT_TIMEOUT = 10.0  # seconds of a job
+TIMEOUT_GRACE = 5.0  # seconds a job may take over its budget before its worker is killed
+QUEUE_POLL = 0.05  # seconds between two checks whether a queued job has started
+MAX_MESSAGE_SIZE = 64 << 20
+
+LENGTH_PREFIX = struct.Struct(">I")
+
+
+# Messages
+
+
+def readMessage(stream):
+    # --> (message, True if it was a JSON line), (None, False) at the end of the stream
+    first = stream.read(1)
+    if first == b"":
+        return None, False
+    if first[0] > MAX_MESSAGE_SIZE >> 24:
+        # a length prefix starts with a small byte, anything else starts a line of JSON (of any type, the handler
+        # checks it is an object)
+        return json.loads(first + stream.readline(MAX_MESSAGE_SIZE)), True
+    header = first + stream.read(LENGTH_PREFIX.size - 1)
+    if len(header) != LENGTH_PREFIX.size:
+        return None, False
+    size = LENGTH_PREFIX.unpack(header)[0]
+    if size > MAX_MESSAGE_SIZE:
+        raise ValueError(f"message of {size} bytes is larger than {MAX_MESSAGE_SIZE}")
+    data = stream.read(size)
+    if len(data) != size:
+        return None, False
+    return json.loads(data), False
+
+
+def writeMessage(stream, message: dict, jsonLine: bool = False):
+    data = json.dumps(message).encode()
+    if jsonLine:
+        stream.write(data + b"\n")
+    else:
+        stream.write(LENGTH_PREFIX.pack(len(data)) + data)
+    stream.flush()
+
+
+# Jobs (run in the worker processes)
+
+
+def errorResponse(errorType: str, message: str, **fields):
+    error = {"type": errorType, "message": message}
+    error.update(fields)
+    return {"ok": False, "error": error}
+
+
+def programOf(request: dict):
+    # the program of a job: "source" text, "words" or a base64 "image"
+    if "source" in request:
+        return request["source"]
+    if "words" in request:
+        return request["words"]
+    if "image" in request:
+        return base64.b64decode(request["image"])
+    raise ValueError("job has no source, words or image")
+
+
+def runJob(request: dict, maxSteps: int = DEFAULT_MAX_STEPS, timeout: float = DEFAULT_TIMEOUT):
+    # job message --> response message, every op stops after timeout seconds (an alarm in the worker process)
+    alarm = hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread()
+    try:
+        if alarm:
+            def timeUp(signum, frame):
+                raise SAYAC_API.TimeLimitError(f"Time limit of {timeout} s reached")
+            signal.signal(signal.SIGALRM, timeUp)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            return runOp(request, maxSteps, timeout)
+        finally:
+            if alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+    except SAYAC_API.TimeLimitError as e:
+        # the alarm went off after the op had finished
+        return errorResponse(type(e).__name__, e.message, pc=e.pc, state=e.state)
+
+
+def runOp(request: dict, maxSteps: int, timeout: float):
+    # job message --> response message, the budgets of the server cap the ones of the job
+    op = request.get("op")
+    try:
+        if op == "assemble":
+            words = SAYAC_API.assemble(request["source"])
+            result = {"words": words}
+            imageFormat = request.get("format")
+            if imageFormat is not None:
+                if imageFormat not in IMAGE_FORMATS:
+                    raise ValueError(f"invalid image format '{imageFormat}'")
+                result["image"] = base64.b64encode(formatImage(words, imageFormat)).decode("ascii")
+        elif op == "disassemble":
+            result = {"listing": SAYAC_API.disassemble(programOf(request), request.get("format"))}
+        elif op == "simulate":
+            state = SAYAC_API.simulate(programOf(request), request.get("state"),
+                                       min(request.get("maxSteps", maxSteps), maxSteps),
+                                       min(request.get("timeout", timeout), timeout), request.get("format"))
+            result = {"state": state}
+        elif op == "ping":
+            result = {"version": VERSION}
+        else:
+            return errorResponse("RequestError", f"invalid op '{op}' (use assemble, disassemble, simulate or ping)")
+    except SAYAC_API.AssemblyError as e:
+        return errorResponse(type(e).__name__, e.message, line=e.line)
+    except SAYAC_API.DecodeError as e:
+        return errorResponse(type(e).__name__, e.message, address=e.address, word=e.word)
+    except SAYAC_API.SimulationError as e:
+        return errorResponse(type(e).__name__, e.message, pc=e.pc, state=e.state)
+    except (KeyError, ValueError, TypeError) as e:
+        return errorResponse("RequestError", f"invalid job --> [{type(e).__name__}: {e}]")
+    return {"ok": True, "result": result}
+
+
+# Server
+
+
+class JobHandler(socketserver.StreamRequestHandler):
+    # one connection, any number of jobs one after the other
+    def handle(self):
+        while True:
+            try:
+                request, jsonLine = readMessage(self.rfile)
+            except ValueError as e:
+                writeMessage(self.wfile, errorResponse("RequestError", f"invalid message --> [{e}]"))
+                return
+            if request is None:
+                return
+            if isinstance(request, dict):
+                response = self.server.sayac.submit(request)
+                if "id" in request:
+                    response["id"] = request["id"]
+            else:
+                response = errorResponse("RequestError", "a job must be a JSON object")
+            writeMessage(self.wfile, response, jsonLine)
+
+
+class SayacServer:
+    def __init__(self, jobs: int = None, maxSteps: int = DEFAULT_MAX_STEPS, timeout: float = DEFAULT_TIMEOUT):
+        self.jobs = jobs
+        self.maxSteps = maxSteps
+        self.timeout = timeout
+        self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=jobs)
+        self.poolLock = threading.Lock()
+        self.server = None
+
+    def submit(self, request: dict):
+        # a job whose worker is killed for another job is sent once more
+        for attempt in range(0, 2):
+            pool = self.pool
+            try:
+                future = pool.submit(runJob, request, self.maxSteps, self.timeout)
+                # the time of a job counts once it has left the queue; one started job can still wait for a worker
+                # that finishes another job, which takes at most the timeout as well
+                while not future.running() and not future.done():
+                    concurrent.futures.wait([future], timeout=QUEUE_POLL)
+                return future.result(timeout=2 * self.timeout + TIMEOUT_GRACE)
+            except concurrent.futures.TimeoutError:
+                # the alarm of the worker did not stop the job (e.g. a long computation in C), kill the worker
+                self.recycle(pool)
+                return errorResponse("TimeLimitError", f"Time limit of {self.timeout} s reached")
+            except (concurrent.futures.BrokenExecutor, RuntimeError):
+                # the pool was replaced while the job waited or ran
+                self.recycle(pool)
+        return errorResponse("WorkerError", "The worker of the job stopped")
+
+    def recycle(self, pool):
+        # replaces a pool with a stuck or dead worker by a new one and kills the workers of the old pool
+        with self.poolLock:
+            if self.pool is not pool:
+                return
+            self.pool = concurrent.futures.ProcessPoolExecutor(max_workers=self.jobs)
+        killWorkers = getattr(pool, "kill_workers", None)
+        if killWorkers is not None:
+            killWorkers()
+        else:
+            for process in list((pool._processes or {}).values()):
+                process.kill()
+        pool.shutdown(wait=False)
+
+    def listen(self, address):
+        # address: a socket path or a localhost TCP port
+        if isinstance(address, int):
+            self.server = socketserver.ThreadingTCPServer(("127.0.0.1", address), JobHandler)
+        else:
+            if os.path.exists(address) and stat.S_ISSOCK(os.stat(address).st_mode):
+                # left behind by a server that did not shut down, unless a server still answers on it
+                try:
+                    connect(address).close()
+                except OSError:
+                    os.remove(address)
+                else:
+                    raise OSError(f"a server is already listening on '{address}'")
+            self.server = socketserver.ThreadingUnixStreamServer(address, JobHandler)
+        self.server.daemon_threads = True
+        self.server.sayac = self
+
+    def serve(self):
+        try:
+            self.server.serve_forever()
+        finally:
+            self.close()
+
+    def close(self):
+        address = self.server.server_address
+        self.server.server_close()
+        if isinstance(address, str) and os.path.exists(address):
+            os.remove(address)
+        self.pool.shutdown()
+
+
+# Client
+
+
+def connect(address):
+    if isinstance(address, int):
+        return socket.create_connection(("127.0.0.1", address))
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.connect(address)
+    return sock
+
+
+def request(address, message: dict):
+    # one job --> its response
+    try:
+        sock = connect(address)
+    except OSError as e:
+        raise ConnectionError(f"can not connect to {address}: {e}") from None
+    try:
+        stream = sock.makefile("rwb")
+        writeMessage(stream, message)
+        response, jsonLine = readMessage(stream)
+        stream.close()
+    finally:
+        sock.close()
+    if response is None:
+        raise ConnectionError("the server closed the connection")
+    return response
+
+
+def printError(response: dict):
+    print(f"Error: {response['error']['message']}")
+
+
+def clientAssemble(address, insFileName, imageFormat: str):
+    # as SAYAC_Inst2Bin.py: <name>.bin (or the extension of the image format)
+    f = open(insFileName, "r")
+    source = f.read()
+    f.close()
+    response = request(address, {"op": "assemble", "source": source, "format": imageFormat})
+    if not response["ok"]:
+        printError(response)
+        return False
+    binFile = open(binFileNameOf(insFileName, imageFormat), "wb")
+    binFile.write(base64.b64decode(response["result"]["image"]))
+    binFile.close()
+    print("Successfully Assembled!")
+    return True
+
+
+def clientSimulate(address, insFileName, imageFormat: str = None, options: dict = None):
+    # as SAYAC_Assembler.py: <name>.sayac.json
+    job = {"op": "simulate"}
+    job.update(options or {})
+    if imageFormat is None:
+        f = open(insFileName, "r")
+        job["source"] = f.read()
+    else:
+        f = open(insFileName, "rb")
+        job["image"] = base64.b64encode(f.read()).decode("ascii")
+        job["format"] = imageFormat
+    f.close()
+    response = request(address, job)
+    state = response["result"]["state"] if response["ok"] else response["error"].get("state")
+    if state is not None:
+        f = open(f"{insFileName.rsplit('.', 1)[0]}.sayac.json", "w")
+        f.write(json.dumps(state))
+        f.close()
+    if not response["ok"]:
+        printError(response)
+        return False
+    print("Successfully Assembled!")
+    return True
+
+
+def clientDisassemble(address, binFileName, imageFormat: str = IMAGE_AUTO):
+    f = open(binFileName, "rb")
+    image = base64.b64encode(f.read()).decode("ascii")
+    f.close()
+    response = request(address, {"op": "disassemble", "image": image, "format": imageFormat})
+    if not response["ok"]:
+        printError(response)
+        return False
+    for ins in response["result"]["listing"]:
+        print(ins)
+    return True
+
+
+def main():
+    # App info
+    print(f"SAYAC Server {VERSION}", file=sys.stderr)
+
+    if len(sys.argv) < 2 or sys.argv[1] not in ("serve", "assemble", "simulate", "disassemble"):
+        print("Error: Not enough arguments --> [use serve, assemble <file>, simulate <file> or disassemble <file>]")
+        exit(1)
+    command = sys.argv[1]
+    args = sys.argv[2:]
+    fileName = None
+    if command != "serve":
+        if len(args) == 0:
+            print("Error: Not enough arguments --> [file name not found]")
+            exit(1)
+        fileName = args[0]
+        args = args[1:]
+
+    address = DEFAULT_SOCKET
+    jobs = None
+    maxSteps = DEFAULT_MAX_STEPS
+    timeout = DEFAULT_TIMEOUT
+    imageFormat = None
+    if command == "assemble":
+        imageFormat = IMAGE_FORMATS[0]
+    elif fileName is not None and fileName.endswith(tuple(IMAGE_EXTENSIONS.values())):
+        imageFormat = IMAGE_AUTO
+    options = {}
+    for arg in args:
+        key, _, value = arg.partition("=")
+        try:
+            if key == "--socket" and value != "":
+                address = value
+            elif key == "--port":
+                address = baseNumberToInt(value)
+            elif key == "--jobs" and command == "serve":
+                jobs = baseNumberToInt(value)
+            elif key == "--max-steps":
+                maxSteps = baseNumberToInt(value)
+                options["maxSteps"] = maxSteps
+            elif key == "--timeout":
+                timeout = float(value)
+                options["timeout"] = timeout
+            elif key in ("--format", "--image") and command != "serve":
+                imageFormat = value if value != "" else IMAGE_AUTO
+                if imageFormat not in (IMAGE_AUTO,) + IMAGE_FORMATS:
+                    print(f"Error: Invalid image format --> [{imageFormat}]")
+                    exit(1)
+            elif key == "--state" and command == "simulate":
+                f = open(value, "r")
+                options["state"] = json.load(f)
+                f.close()
+            else:
+                print(f"Error: Invalid argument --> [{arg}]")
+                exit(1)
+        except ValueError:
+            print(f"Error: Invalid number --> [{arg}]")
+            exit(1)
+        except FileNotFoundError:
+            print(f"Error: File not found --> ['{value}' does not exists]")
+            exit(1)
+
+    if command == "serve":
+        server = SayacServer(jobs, maxSteps, timeout)
+        try:
+            server.listen(address)
+        except OSError as e:
+            server.pool.shutdown()
+            print(f"Error: Can not listen --> [{e}]")
+            exit(1)
+        print(f"Listening on {address if isinstance(address, str) else f'127.0.0.1:{address}'} (Ctrl+C to stop)",
+              file=sys.stderr)
+        try:
+            server.serve()
+        except KeyboardInterrupt:
+            print("Stopped", file=sys.stderr)
+        return
+    try:
+        if command == "assemble":
+            ok = clientAssemble(address, fileName, imageFormat)
+        elif command == "simulate":
+            ok = clientSimulate(address, fileName, imageFormat, options)
+        else:
+            ok = clientDisassemble(address, fileName, imageFormat or IMAGE_AUTO)
+    except FileNotFoundError:
+        print(f"Error: File not found --> ['{fileName}' does not exists]")
+        ok = False
+    except ConnectionError as e:
+        print(f"Error: Server not reachable --> [{e}]")
+        ok = False
+    if not ok:
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,202 @@
+import json
+
+from SAYAC_ISA import INS_SPECS
+from SAYAC_Profiler import EXECUTE_MNEMONICS
+
+# Timing model of one simulator run: every instruction costs its latency in cycles, plus the miss penalty of the
+# instruction cache for its fetch and of the data cache for its LDR/STR accesses (IO accesses are not cached).
+# The model only counts, the simulated machine behaves exactly as without it.
+
+DEFAULT_LATENCY = 1  # cycles of an instruction that has no latency of its own
+DEFAULT_LATENCIES = {
+    "ldr": 2,
+    "str": 2,
+    "ldrio": 2,
+    "strio": 2,
+    "mul": 4,
+    "div": 16,
+}
+DEFAULT_CACHE = {"size": 256, "associativity": 2, "line": 4, "miss": 10}  # sizes in words, miss penalty in cycles
+
+
+class Cache:
+    # set associative cache with LRU replacement, only the tags are kept
+    def __init__(self, size: int, associativity: int, lineSize: int, missPenalty: int):
+        if lineSize < 1 or lineSize & (lineSize - 1) != 0:
+            raise ValueError(f"cache line size {lineSize} is not a power of two")
+        if associativity < 1 or size < lineSize * associativity or size % (lineSize * associativity) != 0:
+            raise ValueError(f"cache size {size} is not a multiple of {associativity} ways of {lineSize} words")
+        self.size = size
+        self.associativity = associativity
+        self.lineSize = lineSize
+        self.missPenalty = missPenalty
+        self.lineBits = lineSize.bit_length() - 1
+        self.setCount = size // (lineSize * associativity)
+        self.sets = [[] for _ in range(0, self.setCount)]  # lines in every set, most recently used last
+        self.hits = 0
+        self.misses = 0
+
+    def access(self, address: int):
+        # --> stall cycles of the access
+        line = address >> self.lineBits
+        ways = self.sets[line % self.setCount]
+        if line in ways:
+            if ways[-1] != line:
+                ways.remove(line)
+                ways.append(line)
+            self.hits += 1
+            return 0
+        if len(ways) >= self.associativity:
+            del ways[0]
+        ways.append(line)
+        self.misses += 1
+        return self.missPenalty
+
+    def report(self):
+        accesses = self.hits + self.misses
+        return {
+            "size": self.size,
+            "associativity": self.associativity,
+            "line": self.lineSize,
+            "miss": self.missPenalty,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": self.hits / accesses if accesses != 0 else None,
+        }
+
+
+def cacheOf(config):
+    # {"size", "associativity", "line", "miss"} (missing keys from DEFAULT_CACHE) --> Cache, None for null
+    if config is None:
+        return None
+    unknown = set(config) - set(DEFAULT_CACHE)
+    if unknown:
+        raise ValueError(f"invalid cache option '{sorted(unknown)[0]}' (use {', '.join(DEFAULT_CACHE)})")
+    config = dict(DEFAULT_CACHE, **config)
+    return Cache(int(config["size"]), int(config["associativity"]), int(config["line"]), int(config["miss"]))
+
+
+class TimingModel:
+    def __init__(self, latencies: dict = None, icache: Cache = None, dcache: Cache = None):
+        # latencies: mnemonic --> cycles, added to (and overriding) DEFAULT_LATENCIES
+        self.latencies = dict(DEFAULT_LATENCIES)
+        for mnemonic, cycles in (latencies or {}).items():
+            if mnemonic.lower() not in INS_SPECS:
+                raise ValueError(f"invalid instruction '{mnemonic}' in the latencies")
+            self.latencies[mnemonic.lower()] = int(cycles)
+        self.icache = icache
+        self.dcache = dcache
+        self.costs = []  # latency of every PC
+        self.cycles = 0
+        self.instructions = 0
+
+    def attach(self, sayac, program: list):
+        # program: [(execute, operands)], the data cache sees the memory accesses of this machine only
+        self.costs = [self.latencies.get(EXECUTE_MNEMONICS[execute].lower(), DEFAULT_LATENCY)
+                      for execute, operands in program]
+        if self.dcache is None:
+            return
+        readMemory = sayac.readMemory
+        writeMemory = sayac.writeMemory
+        access = self.dcache.access
+
+        def timedReadMemory(address: int, fromIO: bool = False):
+            if not fromIO:
+                self.cycles += access(address)
+            return readMemory(address, fromIO)
+
+        def timedWriteMemory(address: int, value: int, fromIO: bool = False):
+            if not fromIO:
+                self.cycles += access(address)
+            writeMemory(address, value, fromIO)
+
+        sayac.readMemory = timedReadMemory
+        sayac.writeMemory = timedWriteMemory
+
+    def step(self, pc: int):
+        # called after the instruction at pc has been executed
+        self.instructions += 1
+        self.cycles += self.costs[pc]
+        if self.icache is not None:
+            self.cycles += self.icache.access(pc)
+
+    def run(self, sayac, program: list):
+        # runProgram() with the timing, only used when the timing model is on
+        # a fetch from the line of the previous fetch is a hit without a lookup (the line is the most recent one)
+        costs = self.costs
+        icache = self.icache
+        access = icache.access if icache is not None else None
+        lineBits = icache.lineBits if icache is not None else 0
+        lastLine = -1
+        lineHits = 0
+        cycles = 0
+        steps = 0
+        programLength = len(program)
+        try:
+            while 0 <= sayac.PC < programLength:
+                pc = sayac.PC
+                cycles += costs[pc]
+                if access is not None:
+                    if pc >> lineBits == lastLine:
+                        lineHits += 1
+                    else:
+                        lastLine = pc >> lineBits
+                        cycles += access(pc)
+                program[pc]()
+                sayac.PC += 1
+                steps += 1
+        finally:
+            self.cycles += cycles
+            self.instructions += steps
+            if icache is not None:
+                icache.hits += lineHits
+
+    def report(self):
+        return {
+            "cycles": self.cycles,
+            "instructions": self.instructions,
+            "cpi": self.cycles / self.instructions if self.instructions != 0 else None,
+            "latencies": self.latencies,
+            "icache": self.icache.report() if self.icache is not None else None,
+            "dcache": self.dcache.report() if self.dcache is not None else None,
+        }
+
+    def summary(self):
+        report = self.report()
+        cpi = f"{report['cpi']:.3f}" if report["cpi"] is not None else "-"
+        text = [f"Cycles: {report['cycles']}  Instructions: {report['instructions']}  CPI: {cpi}"]
+        for name in ("icache", "dcache"):
+            cache = report[name]
+            if cache is not None and cache["hitRate"] is not None:
+                text.append(f"{name}: {cache['hitRate'] * 100:.2f}% hits ({cache['hits']} of "
+                            f"{cache['hits'] + cache['misses']})")
+        return "\n".join(text)
+
+    def writeReport(self, name: str):
+        # <name>.timing.json
+        f = open(f"{name}.timing.json", "w")
+        f.write(json.dumps(self.report(), indent=2))
+        f.close()
+
+
+def timingModelOf(config: dict):
+    # {"latencies": {mnemonic: cycles}, "icache": {...} or null, "dcache": {...} or null} --> TimingModel
+    # a cache that is not given has the DEFAULT_CACHE configuration
+    unknown = set(config) - {"latencies", "icache", "dcache"}
+    if unknown:
+        raise ValueError(f"invalid timing option '{sorted(unknown)[0]}' (use latencies, icache, dcache)")
+    return TimingModel(config.get("latencies"), cacheOf(config.get("icache", {})), cacheOf(config.get("dcache", {})))
+
+
+def loadTimingModel(fileName: str = None):
+    # timing configuration file (JSON, see timingModelOf) --> TimingModel, the default model without a file
+    if fileName is None:
+        return timingModelOf({})
+    f = open(fileName, "r")
+    try:
+        config = json.load(f)
+    finally:
+        f.close()
+    if not isinstance(config, dict):
+        raise ValueError(f"timing configuration '{fileName}' is not a JSON object")
+    return timingModelOf(config)
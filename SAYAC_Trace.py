@@ -0,0 +1,382 @@
+import sys
+import os
+import gzip
+import mmap
+import struct
+
+from SAYAC_ISA import INS_SPECS, WORD_MASK, exeSTR, exeSTRio, exeJMR, exeBRC, exeBRR
+from SAYAC_Profiler import EXECUTE_MNEMONICS
+from SAYAC_Inst2Bin import VERSION
+
+# Execution traces for co-simulation with the RTL: one fixed-size record per executed instruction, after a header.
+# A record is big endian and holds, in this order,
+#   pc:16  word:16  flags:8  register:8  registerValue:16  memory:8  address:16  value:16
+# register is the written register (0xff when the instruction writes none) and memory is 0 (no write), 1 (memory) or
+# 2 (memory IO) for the written cell. The text form of a record (an RTL log line) is its fields as hex numbers:
+#   0004 5021 05 02 0001 00 0000 0000
+# e.g. $fdisplay(log, "%h %h %h %h %h %h %h %h", ...) with the widths above. Traces ending in .gz are gzip compressed.
+
+TRACE_MAGIC = b"SAYACTRC"
+TRACE_VERSION = 1
+TRACE_HEADER = struct.Struct(">8sHH")  # magic, version, record size
+TRACE_RECORD = struct.Struct(">HHBBHBHH")
+TRACE_FIELDS = ("pc", "word", "flags", "register", "registerValue", "memory", "address", "value")
+TRACE_FIELD_WIDTHS = (4, 4, 2, 2, 4, 2, 4, 4)  # hex digits of every field in the text form
+TRACE_BUFFER_RECORDS = 1 << 16  # records written at once
+TRACE_CHUNK_RECORDS = 1 << 20  # records compared at once by diffTraces
+TRACE_COMPRESS_LEVEL = 1  # gzip level, the fastest keeps up with the simulator
+
+NO_REGISTER = 0xFF
+MEMORY_NONE = 0
+MEMORY_DATA = 1
+MEMORY_IO = 2
+
+GZIP_MAGIC = b"\x1f\x8b"
+NO_REGISTER_WRITE = (exeSTR, exeSTRio, exeJMR, exeBRC, exeBRR)  # instructions with an rd operand they do not write
+
+TEXT_FORMAT = " ".join(f"{{:0{width}x}}" for width in TRACE_FIELD_WIDTHS)
+
+
+def programWords(program: list):
+    # [(execute, operands)] --> instruction word of every PC (don't care bits are 0)
+    return [INS_SPECS[EXECUTE_MNEMONICS[execute].lower()].encode(operands) for execute, operands in program]
+
+
+def programDestinations(program: list):
+    # [(execute, operands)] --> register written by the instruction of every PC, NO_REGISTER for none
+    destinations = []
+    for execute, operands in program:
+        spec = INS_SPECS[EXECUTE_MNEMONICS[execute].lower()]
+        if "rd" in spec.operands and execute not in NO_REGISTER_WRITE:
+            destinations.append(operands[spec.operands.index("rd")])
+        else:
+            destinations.append(NO_REGISTER)
+    return destinations
+
+
+def formatRecord(record: tuple):
+    # record fields --> text form
+    return TEXT_FORMAT.format(*record)
+
+
+class TraceWriter:
+    def __init__(self, fileName: str, compress: bool = None):
+        # compress: gzip the trace, by default when the file name ends in .gz
+        self.fileName = fileName
+        self.compress = fileName.endswith(".gz") if compress is None else compress
+        self.file = None
+        self.buffer = bytearray(TRACE_BUFFER_RECORDS * TRACE_RECORD.size)
+        self.offset = 0
+        self.records = 0
+        self.sayac = None
+        self.words = []
+        self.destinations = []
+        self.memoryWrite = None  # (memory, address, value) of the instruction being executed
+
+    def attach(self, sayac, program: list):
+        # program: [(execute, operands)], opens the trace
+        self.sayac = sayac
+        self.words = programWords(program)
+        self.destinations = programDestinations(program)
+        if self.compress:
+            self.file = gzip.open(self.fileName, "wb", compresslevel=TRACE_COMPRESS_LEVEL)
+        else:
+            self.file = open(self.fileName, "wb")
+        self.file.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, TRACE_RECORD.size))
+        writeMemory = sayac.writeMemory
+
+        def tracedWriteMemory(address: int, value: int, fromIO: bool = False):
+            self.memoryWrite = (MEMORY_IO if fromIO else MEMORY_DATA, address, value)
+            writeMemory(address, value, fromIO)
+
+        sayac.writeMemory = tracedWriteMemory
+
+    def step(self, pc: int):
+        # called after the instruction at pc has been executed
+        sayac = self.sayac
+        rd = self.destinations[pc]
+        write = self.memoryWrite
+        if write is None:
+            memory = address = value = 0
+        else:
+            memory, address, value = write
+            self.memoryWrite = None
+        TRACE_RECORD.pack_into(self.buffer, self.offset, pc & WORD_MASK, self.words[pc], sayac.flagBits, rd,
+                               sayac.registers[rd] if rd != NO_REGISTER else 0, memory, address, value)
+        self.offset += TRACE_RECORD.size
+        if self.offset == len(self.buffer):
+            self.flush()
+
+    def run(self, sayac, program: list):
+        # runProgram() with the trace, only used when tracing is on (step() with its lookups in locals)
+        pack = TRACE_RECORD.pack_into
+        recordSize = TRACE_RECORD.size
+        words = self.words
+        destinations = self.destinations
+        buffer = self.buffer
+        bufferSize = len(buffer)
+        registers = sayac.registers
+        offset = self.offset
+        programLength = len(program)
+        try:
+            while 0 <= sayac.PC < programLength:
+                pc = sayac.PC
+                program[pc]()
+                rd = destinations[pc]
+                write = self.memoryWrite
+                if write is None:
+                    pack(buffer, offset, pc & WORD_MASK, words[pc], sayac.flagBits, rd,
+                         registers[rd] if rd != NO_REGISTER else 0, 0, 0, 0)
+                else:
+                    self.memoryWrite = None
+                    pack(buffer, offset, pc & WORD_MASK, words[pc], sayac.flagBits, rd,
+                         registers[rd] if rd != NO_REGISTER else 0, *write)
+                offset += recordSize
+                if offset == bufferSize:
+                    self.offset = offset
+                    self.flush()
+                    offset = 0
+                sayac.PC += 1
+        finally:
+            self.offset = offset
+
+    def flush(self):
+        self.file.write(memoryview(self.buffer)[:self.offset])
+        self.records += self.offset // TRACE_RECORD.size
+        self.offset = 0
+
+    def close(self):
+        if self.file is None:
+            return
+        self.flush()
+        self.file.close()
+        self.file = None
+
+
+def checkHeader(header: bytes, fileName: str):
+    if len(header) != TRACE_HEADER.size:
+        raise ValueError(f"'{fileName}' ends in its header")
+    magic, version, recordSize = TRACE_HEADER.unpack(header)
+    if version != TRACE_VERSION or recordSize != TRACE_RECORD.size:
+        raise ValueError(f"'{fileName}' is a trace of version {version} with {recordSize}-byte records "
+                         f"(version {TRACE_VERSION} with {TRACE_RECORD.size}-byte records expected)")
+
+
+def wholeRecords(chunk: bytes, fileName: str):
+    if len(chunk) % TRACE_RECORD.size != 0:
+        raise ValueError(f"'{fileName}' ends with a truncated record")
+    return chunk
+
+
+def binaryChunks(f, fileName: str):
+    # trace file after its magic --> chunks of records, memory-mapped reads
+    header = TRACE_MAGIC + f.read(TRACE_HEADER.size - len(TRACE_MAGIC))
+    checkHeader(header, fileName)
+    size = os.fstat(f.fileno()).st_size
+    if size == TRACE_HEADER.size:
+        return
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        chunkSize = TRACE_CHUNK_RECORDS * TRACE_RECORD.size
+        for start in range(TRACE_HEADER.size, size, chunkSize):
+            yield wholeRecords(mapped[start:start + chunkSize], fileName)
+    finally:
+        mapped.close()
+
+
+def compressedChunks(fileName: str):
+    # gzip compressed trace --> chunks of records
+    f = gzip.open(fileName, "rb")
+    try:
+        header = f.read(TRACE_HEADER.size)
+        if not header.startswith(TRACE_MAGIC):
+            raise ValueError(f"'{fileName}' is not a SAYAC trace")
+        checkHeader(header, fileName)
+        chunkSize = TRACE_CHUNK_RECORDS * TRACE_RECORD.size
+        while True:
+            chunk = f.read(chunkSize)
+            if not chunk:
+                return
+            yield wholeRecords(chunk, fileName)
+    finally:
+        f.close()
+
+
+def parseLogLine(text: bytes, line: int, fileName: str):
+    # RTL log line --> record bytes, None for blank and comment lines
+    fields = text.split()
+    if not fields or fields[0].startswith((b"//", b"#")):
+        return None
+    try:
+        if len(fields) != len(TRACE_FIELDS):
+            raise ValueError
+        return TRACE_RECORD.pack(*[int(field, 16) for field in fields])
+    except (ValueError, struct.error):
+        raise ValueError(f"Invalid trace line {line} in '{fileName}': {text.decode(errors='replace').strip()}") \
+            from None
+
+
+def textChunks(f, fileName: str):
+    # RTL log (text form of the records) --> chunks of records, memory-mapped reads
+    # a chunk of lines in the exact text form is converted at once (its hex is the records), others line by line
+    if os.fstat(f.fileno()).st_size == 0:
+        return
+    mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        chunkSize = TRACE_CHUNK_RECORDS * (len(formatRecord((0,) * len(TRACE_FIELDS))) + 1)
+        start = 0
+        line = 1
+        while start < len(mapped):
+            end = mapped.find(b"\n", min(start + chunkSize, len(mapped)) - 1)
+            end = len(mapped) if end < 0 else end + 1
+            text = mapped[start:end]
+            lineCount = text.count(b"\n") + (0 if text.endswith(b"\n") else 1)
+            try:
+                records = bytes.fromhex(text.decode("ascii"))
+            except (ValueError, UnicodeDecodeError):
+                records = None
+            if records is None or len(records) != lineCount * TRACE_RECORD.size:
+                parsed = [parseLogLine(lineText, line + index, fileName)
+                          for index, lineText in enumerate(text.splitlines())]
+                records = b"".join(record for record in parsed if record is not None)
+            yield records
+            start = end
+            line += lineCount
+    finally:
+        mapped.close()
+
+
+def traceChunks(fileName: str):
+    # binary, gzip compressed or text trace --> chunks of records (bytes)
+    f = open(fileName, "rb")
+    try:
+        magic = f.read(len(TRACE_MAGIC))
+        if magic == TRACE_MAGIC:
+            yield from binaryChunks(f, fileName)
+        elif magic.startswith(GZIP_MAGIC):
+            yield from compressedChunks(fileName)
+        else:
+            f.seek(0)
+            yield from textChunks(f, fileName)
+    finally:
+        f.close()
+
+
+def readTrace(fileName: str):
+    # trace (see traceChunks) --> record fields of every executed instruction
+    for chunk in traceChunks(fileName):
+        yield from TRACE_RECORD.iter_unpack(chunk)
+
+
+def diffTraces(expectedFileName: str, actualFileName: str):
+    # --> None when the traces are the same, otherwise (index, expected record, actual record) of the first
+    # different record (a record is None after the end of its trace)
+    size = TRACE_RECORD.size
+    expectedChunks = traceChunks(expectedFileName)
+    actualChunks = traceChunks(actualFileName)
+    expected = actual = b""
+    position = 0  # records before the chunks
+    while True:
+        if not expected:
+            expected = next(expectedChunks, b"")
+        if not actual:
+            actual = next(actualChunks, b"")
+        if not expected or not actual:
+            break
+        length = min(len(expected), len(actual))
+        if expected[:length] != actual[:length]:
+            for start in range(0, length, size):
+                if expected[start:start + size] != actual[start:start + size]:
+                    return (position + start // size, TRACE_RECORD.unpack_from(expected, start),
+                            TRACE_RECORD.unpack_from(actual, start))
+        expected = expected[length:]
+        actual = actual[length:]
+        position += length // size
+    if not expected and not actual:
+        return None
+    return (position, TRACE_RECORD.unpack_from(expected) if expected else None,
+            TRACE_RECORD.unpack_from(actual) if actual else None)
+
+
+def divergenceReport(divergence: tuple, expectedFileName: str, actualFileName: str):
+    # diffTraces() result --> text
+    index, expected, actual = divergence
+    text = [f"First divergence at instruction {index + 1}:"]
+    for name, record in ((expectedFileName, expected), (actualFileName, actual)):
+        text.append(f"  {formatRecord(record) if record is not None else '(end of trace)':<40} {name}")
+    if expected is not None and actual is not None:
+        fields = [field for field, a, b in zip(TRACE_FIELDS, expected, actual) if a != b]
+        text.append(f"  different: {', '.join(fields)}")
+    return "\n".join(text)
+
+
+def dumpTrace(fileName: str, outputFileName: str, start: int = 0, count: int = None):
+    # trace --> text form of its records ("-" for stdout), from the record start on
+    output = sys.stdout if outputFileName == "-" else open(outputFileName, "w")
+    try:
+        for index, record in enumerate(readTrace(fileName)):
+            if index < start:
+                continue
+            if count is not None and index >= start + count:
+                break
+            output.write(formatRecord(record) + "\n")
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def main():
+    # App info
+    print(f"SAYAC Trace {VERSION}")
+
+    if len(sys.argv) < 2:
+        print("Error: Not enough arguments --> [file name not found]")
+        exit(1)
+
+    traceFileName = sys.argv[1]
+    outputFileName = traceFileName.rsplit(".", maxsplit=1)[0] + ".trace.txt"
+    diffFileName = None
+    start = 0
+    count = None
+    for arg in sys.argv[2:]:
+        if arg.startswith("--diff="):
+            diffFileName = arg.split("=", 1)[1]
+        elif arg.startswith("--output="):
+            outputFileName = arg.split("=", 1)[1]
+        elif arg.startswith("--from=") or arg.startswith("--count="):
+            try:
+                value = int(arg.split("=", 1)[1], 0)
+            except ValueError:
+                value = -1
+            if value < 0:
+                print(f"Error: Invalid number --> [{arg}]")
+                exit(1)
+            if arg.startswith("--from="):
+                start = value
+            else:
+                count = value
+        else:
+            print(f"Error: Invalid argument --> [{arg}]")
+            exit(1)
+
+    try:
+        if diffFileName is not None:
+            divergence = diffTraces(traceFileName, diffFileName)
+            if divergence is not None:
+                print(divergenceReport(divergence, traceFileName, diffFileName))
+                exit(1)
+            print("Traces are the same!")
+        else:
+            dumpTrace(traceFileName, outputFileName, start, count)
+            if outputFileName != "-":
+                print("Successfully Dumped!")
+    except FileNotFoundError as e:
+        print(f"Error: File not found --> ['{e.filename}' does not exists]")
+        exit(1)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import sys
+
+import pytest
+
+# the modules are scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# a loop over memory with a multiplication, r5 counts down from 100
+LOOP = [
+    "MSI r5 100",
+    "MSI r6 0",
+    "loop: STR r5 r5",
+    "LDR r7 r5",
+    "ADD r6 r6 r7",
+    "MUL r8 r6 r5",
+    "ADI r5 -1",
+    "CMI 0 r5",
+    "BRR 5 r4 loop",
+]
+
+
+def decodeLines(lines: list):
+    # source lines --> [(execute, operands)], the modules are only importable once the root is on the path
+    from SAYAC_Assembler import decodeSourceProgram
+    from SAYAC_ISA import lexLines
+    from SAYAC_Labels import resolveLabels
+    from SAYAC_Preprocessor import preprocess
+    return decodeSourceProgram(resolveLabels(preprocess(lexLines(lines))))[0]
+
+
+@pytest.fixture
+def decode():
+    return decodeLines
+
+
+@pytest.fixture
+def loopLines():
+    return list(LOOP)
@@ -0,0 +1,72 @@
+import os
+import sys
+import subprocess
+
+import pytest
+
+import SAYAC_API
+from SAYAC_Image import IMAGE_FORMATS
+
+SOURCE = "MSI r1 5\nADD r2 r1 r1"
+
+
+def test_assemble_and_disassemble():
+    words = SAYAC_API.assemble(SOURCE)
+    assert SAYAC_API.disassemble(words) == ["MSI r1 5", "ADD r2 r1 r1"]
+
+
+@pytest.mark.parametrize("imageFormat", IMAGE_FORMATS)
+def test_image_bytes(imageFormat):
+    image = SAYAC_API.assemble(SOURCE, imageFormat)
+    assert SAYAC_API.disassemble(image, imageFormat) == ["MSI r1 5", "ADD r2 r1 r1"]
+    assert SAYAC_API.simulate(image, imageFormat=imageFormat)["registers"][2] == 10
+
+
+def test_assembly_error_line():
+    with pytest.raises(SAYAC_API.AssemblyError) as error:
+        SAYAC_API.assemble("MSI r1 5\n\nMSI r1 200")
+    assert error.value.line == 3
+
+
+@pytest.mark.parametrize("words, address, word", [
+    ([0x5105, 0xF460], 1, 0xF460),  # invalid FIB
+    ([0x5105, 0x10000], 1, 0x10000),
+    ([-1], 0, -1),
+])
+def test_decode_error(words, address, word):
+    with pytest.raises(SAYAC_API.DecodeError) as error:
+        SAYAC_API.disassemble(words)
+    assert (error.value.address, error.value.word) == (address, word)
+
+
+def test_simulate_initial_state():
+    state = SAYAC_API.simulate("ADD r2 r1 r3", {"registers": {"1": 4, "3": "0x10"}})
+    assert state["registers"][2] == 20
+    assert state["PC"] == 0
+
+
+def test_simulation_error_state():
+    with pytest.raises(SAYAC_API.SimulationError) as error:
+        SAYAC_API.simulate("MSI r1 5\nMSI r2 0\nDIV r3 r1 r2")
+    assert error.value.pc == 2
+    assert error.value.state["registers"][1] == 5
+
+
+def test_step_limit():
+    with pytest.raises(SAYAC_API.StepLimitError):
+        SAYAC_API.simulate("loop: JMI r1 loop", maxSteps=1000)
+
+
+def test_include_needs_a_directory(tmp_path):
+    (tmp_path / "lib.txt").write_text("MSI r3 3\n")
+    source = '.include "lib.txt"\nMSI r1 1'
+    with pytest.raises(SAYAC_API.AssemblyError):
+        SAYAC_API.assemble(source)
+    assert len(SAYAC_API.assemble(source, directory=str(tmp_path))) == 2
+
+
+def test_import_loads_only_the_instruction_tables():
+    code = "import sys, SAYAC_API; print(*sorted(name for name in sys.modules if name.startswith('SAYAC_')))"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, "-c", code], cwd=root, capture_output=True, text=True, check=True).stdout
+    assert output.split() == ["SAYAC_API", "SAYAC_ISA", "SAYAC_Labels", "SAYAC_Preprocessor"]
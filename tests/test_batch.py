@@ -0,0 +1,50 @@
+import pytest
+
+import SAYAC_Batch
+import SAYAC_Fuzz
+import SAYAC_Inst2Bin
+from SAYAC_Assembler import Sayac, bindProgram, runProgram
+from SAYAC_Image import IMAGE_RAW_LE, formatImage
+
+pytestmark = pytest.mark.skipif(SAYAC_Batch.np is None, reason="batch simulation needs NumPy")
+
+STATES = [
+    {},
+    {"registers": {"5": 3}},
+    {"registers": {"5": 40, "6": "0x10"}, "memory": {"20": 7, "0x9000": 1}},
+    {"registers": {"5": 1}, "memoryIO": {"3": 4}, "flags": {"eq": True}},
+]
+
+
+def test_instances_match_interpreter(decode, loopLines):
+    # the states give the count of the loop
+    program = decode(loopLines[1:])
+    batch = SAYAC_Batch.simulateBatch(program, STATES)
+    for instance, state in enumerate(STATES):
+        sayac = Sayac()
+        sayac.loadState(state)
+        runProgram(sayac, bindProgram(program, sayac))
+        assert batch.state(instance) == sayac.state(sayac.PC - 1)
+
+
+def test_loaded_cells_are_kept(decode):
+    batch = SAYAC_Batch.simulateBatch(decode(["MSI r1 1"]), [{"memory": {"100": 5}}])
+    assert batch.state(0)["memory"] == {100: 5}
+
+
+@pytest.mark.parametrize("seed", range(0, 100))
+def test_random_programs_match_interpreter(decode, seed):
+    program = decode(SAYAC_Fuzz.randomProgram(seed))
+    expected = SAYAC_Fuzz.execute(program, SAYAC_Fuzz.BATCH_STEPS)
+    assert SAYAC_Fuzz.executeBatch(program, SAYAC_Fuzz.BATCH_STEPS) == expected
+
+
+@pytest.mark.parametrize("option", ["--image", "--image=auto", "--image=raw-le"])
+def test_image_option(tmp_path, monkeypatch, capsys, option):
+    image = tmp_path / "prog.img"
+    image.write_bytes(formatImage(SAYAC_Inst2Bin.encodeWords(["MSI r1 3", "MSI r2 4"]), IMAGE_RAW_LE))
+    states = tmp_path / "states.jsonl"
+    states.write_text("{}\n")
+    monkeypatch.setattr(SAYAC_Batch.sys, "argv", ["SAYAC_Batch.py", str(image), str(states), option])
+    SAYAC_Batch.main()
+    assert "1 instances: 1 halted" in capsys.readouterr().out
@@ -0,0 +1,109 @@
+import pytest
+
+from SAYAC_Assembler import Sayac, bindProgram, decodeSourceProgram, runProgram
+from SAYAC_Checkpoint import Checkpoints, packState, restoreState
+from SAYAC_Debugger import Debugger
+from SAYAC_ISA import AssemblySyntaxError, lexLines
+from SAYAC_Labels import resolveLabels
+from SAYAC_Preprocessor import preprocess
+
+
+def makeDebugger(lines: list, interval: int = 10, ringSize: int = 64):
+    program, listing, lineNumbers = decodeSourceProgram(resolveLabels(preprocess(lexLines(lines))))
+    sayac = Sayac()
+    checkpoints = Checkpoints(interval, ringSize)
+    return Debugger(sayac, bindProgram(program, sayac), listing, lineNumbers, checkpoints=checkpoints)
+
+
+def stateAt(decode, lines: list, steps: int):
+    # machine state after the first steps instructions
+    sayac = Sayac()
+    program = bindProgram(decode(lines), sayac)
+    for _ in range(0, steps):
+        program[sayac.PC]()
+        sayac.PC += 1
+    return sayac.state()
+
+
+def test_pack_and_restore(decode, loopLines):
+    sayac = Sayac()
+    program = bindProgram(decode(loopLines), sayac)
+    for _ in range(0, 40):
+        program[sayac.PC]()
+        sayac.PC += 1
+    data = packState(sayac, 40)
+    expected = sayac.state()
+    runProgram(sayac, program)
+    assert restoreState(sayac, data) == 40
+    assert sayac.state() == expected
+
+
+def test_restore_clears_later_writes():
+    sayac = Sayac()
+    data = packState(sayac, 0)
+    sayac.writeMemory(5, 9)
+    sayac.writeMemory(6, 9, True)
+    restoreState(sayac, data)
+    assert sayac.state() == Sayac().state()
+    assert sayac.memory.dirtyAddresses == []
+
+
+def test_ring_keeps_the_last_checkpoints():
+    checkpoints = Checkpoints(interval=10, ringSize=3)
+    sayac = Sayac()
+    for step in range(0, 60):
+        checkpoints.take(sayac, step)
+    assert list(checkpoints.steps) == [30, 40, 50]
+    assert checkpoints.before(45) == 1
+    assert checkpoints.before(29) is None
+    assert checkpoints.nextStep(50) == 60
+
+
+@pytest.mark.parametrize("interval, ringSize", [(0, 4), (4, 0)])
+def test_invalid_ring(interval, ringSize):
+    with pytest.raises(ValueError):
+        Checkpoints(interval, ringSize)
+
+
+@pytest.mark.parametrize("step", [0, 1, 9, 10, 33, 100])
+def test_goto(decode, loopLines, step):
+    debugger = makeDebugger(loopLines)
+    debugger.goto(150)
+    debugger.goto(step)
+    assert debugger.steps == step
+    assert debugger.sayac.state() == stateAt(decode, loopLines, step)
+
+
+def test_goto_older_than_the_ring(loopLines):
+    debugger = makeDebugger(loopLines, interval=10, ringSize=2)
+    debugger.goto(100)
+    with pytest.raises(AssemblySyntaxError):
+        debugger.goto(50)
+
+
+def test_reverse_continue_to_a_breakpoint(decode, loopLines):
+    debugger = makeDebugger(loopLines)
+    breakpoint = debugger.addBreakpoint(6, "r5 == 90")
+    debugger.goto(200)
+    debugger.reverseContinue()
+    assert debugger.sayac.PC == breakpoint.pc
+    assert debugger.sayac.registers[5] == 90
+    assert debugger.sayac.state() == stateAt(decode, loopLines, debugger.steps)
+
+
+def test_reverse_continue_to_a_watchpoint(decode, loopLines):
+    debugger = makeDebugger(loopLines)
+    debugger.addWatchpoint(95)
+    debugger.goto(200)
+    debugger.reverseContinue()
+    # stopped right after the write
+    assert debugger.sayac.memory.words[95] == 95
+    assert debugger.sayac.PC == 3
+    assert debugger.sayac.state() == stateAt(decode, loopLines, debugger.steps)
+
+
+def test_reverse_continue_without_stops(loopLines):
+    debugger = makeDebugger(loopLines)
+    debugger.goto(55)
+    debugger.reverseContinue()
+    assert debugger.steps == 0
@@ -0,0 +1,97 @@
+import pytest
+
+from SAYAC_Assembler import Sayac, bindProgram, decodeSourceProgram, runProgram
+from SAYAC_Debugger import Debugger, compileCondition
+from SAYAC_ISA import AssemblySyntaxError, lexLines
+from SAYAC_Labels import resolveLabels
+from SAYAC_Preprocessor import preprocess
+
+
+@pytest.fixture
+def debugger(loopLines):
+    # a debugger over the loop, stopped before its first instruction
+    program, listing, lineNumbers = decodeSourceProgram(resolveLabels(preprocess(lexLines(loopLines))))
+    sayac = Sayac()
+    return Debugger(sayac, bindProgram(program, sayac), listing, lineNumbers)
+
+
+@pytest.mark.parametrize("condition, registers, expected", [
+    ("r3 == 3", [0, 0, 0, 3], True),
+    ("r3 != 3", [0, 0, 0, 3], False),
+    ("r1 == -1", [0, 0xFFFF], True),
+    ("r1 > 0x10 and not r2 < 2", [0, 0x11, 2], True),
+    ("(r1 == 1 or r2 == 1) and r3 == 0", [0, 0, 1, 0], True),
+    ("m[0x10] == 5", [0], True),
+    ("m16 == 0", [0], False),
+])
+def test_conditions(condition, registers, expected):
+    memoryWords = [0] * 0x20
+    memoryWords[0x10] = 5
+    assert compileCondition(condition)(registers + [0] * (16 - len(registers)), memoryWords) is expected
+
+
+@pytest.mark.parametrize("condition", ["r16 == 0", "r1 = 1", "r1 ==", "__import__('os')", "r1 + 1 == 2"])
+def test_invalid_conditions(condition):
+    with pytest.raises(AssemblySyntaxError):
+        compileCondition(condition)
+
+
+def test_breakpoint_stops_before_its_instruction(debugger):
+    debugger.addBreakpoint(debugger.pcOfLine(7))
+    debugger.cont()
+    assert (debugger.sayac.PC, debugger.steps) == (6, 6)
+    # the next continue runs the instruction and stops there again in the next iteration
+    debugger.cont()
+    assert (debugger.sayac.PC, debugger.steps) == (6, 6 + len(debugger.program) - 2)
+
+
+def test_conditional_breakpoint(debugger):
+    debugger.addBreakpoint(2, "r5 == 97")
+    debugger.cont()
+    assert debugger.sayac.registers[5] == 97
+    assert debugger.sayac.PC == 2
+
+
+def test_watchpoint_stops_after_the_write(debugger):
+    watchpoint = debugger.addWatchpoint(98)
+    debugger.cont()
+    # "STR r5 r5" with r5 = 98 has run
+    assert debugger.sayac.memory.words[98] == 98
+    assert debugger.sayac.PC == 3
+    debugger.delete(watchpoint.number)
+    assert "writeMemory" not in debugger.sayac.__dict__
+
+
+def test_deleted_breakpoint_restores_the_instruction(debugger, decode, loopLines):
+    breakpoint = debugger.addBreakpoint(4)
+    debugger.delete(breakpoint.number)
+    assert debugger.program == debugger.instructions
+    debugger.cont()
+    assert debugger.halted()
+    expected = Sayac()
+    runProgram(expected, bindProgram(decode(loopLines), expected))
+    assert debugger.sayac.state() == expected.state()
+
+
+def test_step_runs_over_a_breakpoint(debugger):
+    debugger.addBreakpoint(0)
+    assert debugger.step()
+    assert (debugger.sayac.PC, debugger.sayac.registers[5]) == (1, 100)
+
+
+def test_errors(debugger):
+    with pytest.raises(AssemblySyntaxError):
+        debugger.addBreakpoint(len(debugger.program))
+    with pytest.raises(AssemblySyntaxError):
+        debugger.pcOfLine(100)
+    with pytest.raises(AssemblySyntaxError):
+        debugger.delete(5)
+
+
+def test_prompt_commands(debugger, monkeypatch, capsys):
+    commands = iter(["b 7 if r5 == 99", "w m[0x62]", "l", "c"])
+    monkeypatch.setattr("builtins.input", lambda: next(commands))
+    assert debugger.prompt() == "continue"
+    output = capsys.readouterr().out
+    assert "Breakpoint 1 at line 7 (pc 6) if r5 == 99" in output
+    assert "2: watchpoint on writes to m[0x0062]" in output
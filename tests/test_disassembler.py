@@ -0,0 +1,55 @@
+import SAYAC_Fuzz
+import SAYAC_Inst2Bin
+from SAYAC_Disassembler import WORD_COUNT, disassembleFile, disassembleWords, invalidWordCount
+from SAYAC_Image import IMAGE_RAW_LE, IMAGE_READMEMH, formatImage
+
+SOURCE = ["MSI r1 5", "", "loop: ADD r2 r1 r1 // double", "BRR 5 r4 loop"]
+
+
+def test_every_word_assembles_back():
+    # the text of every word assembles to the same instruction (don't-care bits become 0), invalid words are comments
+    texts = disassembleWords(range(0, WORD_COUNT))
+    valid = [text for text in texts if not text.startswith("//")]
+    assert disassembleWords(SAYAC_Inst2Bin.encodeWords(texts)) == valid
+    assert invalidWordCount(range(0, WORD_COUNT)) == WORD_COUNT - len(valid)
+
+
+def test_random_programs():
+    words = SAYAC_Inst2Bin.encodeWords(SAYAC_Fuzz.randomProgram(3, 300)).tolist()
+    assert SAYAC_Inst2Bin.encodeWords(disassembleWords(words)).tolist() == words
+
+
+def test_annotations():
+    words = SAYAC_Inst2Bin.encodeWords(["MSI r1 5", "ADD r2 r1 r1"]).tolist()
+    assert disassembleWords(words, addresses=True) == ["MSI r1 5                // 0x0000",
+                                                       "ADD r2 r1 r1            // 0x0001"]
+    assert disassembleWords(words + [0xF460], sources=["line 1: MSI r1 5", "line 2: ADD r2 r1 r1"]) == [
+        "MSI r1 5                // line 1: MSI r1 5",
+        "ADD r2 r1 r1            // line 2: ADD r2 r1 r1",
+        "// invalid instruction word 0xf460 // ",  # longer than the column
+    ]
+
+
+def test_disassemble_file_with_source(tmp_path):
+    source = tmp_path / "prog.txt"
+    source.write_text("\n".join(SOURCE) + "\n")
+    words = SAYAC_Inst2Bin.encodeWords(SOURCE).tolist()
+    image = tmp_path / "prog.memh"
+    image.write_bytes(formatImage(words, IMAGE_READMEMH))
+    output = tmp_path / "prog.dis.txt"
+    assert disassembleFile(str(image), str(output), addresses=True, insFileName=str(source)) == (len(words), 0)
+    lines = output.read_text().splitlines()
+    assert len(lines) == len(words)
+    assert lines[0].endswith("// 0x0000  line 1: MSI r1 5")
+    assert lines[1].endswith("line 3: loop: ADD r2 r1 r1 // double")
+    assert lines[-1].endswith("line 4: BRR 5 r4 loop")
+    # the output assembles to the image again
+    assert SAYAC_Inst2Bin.encodeWords(lines).tolist() == words
+
+
+def test_disassemble_file_counts_invalid_words(tmp_path, capsys):
+    image = tmp_path / "prog.bin"
+    words = SAYAC_Inst2Bin.encodeWords(["MSI r1 5"]).tolist()
+    image.write_bytes(formatImage(words + [0xF460, 0xF460], IMAGE_RAW_LE))
+    assert disassembleFile(str(image), "-", IMAGE_RAW_LE) == (3, 2)
+    assert capsys.readouterr().out.splitlines()[0] == "MSI r1 5"
@@ -0,0 +1,43 @@
+import pytest
+
+import SAYAC_Fuzz
+import SAYAC_Inst2Bin
+from SAYAC_Image import IMAGE_AUTO, IMAGE_FORMATS, IMAGE_READMEMH, IMAGE_READMEMB, IMAGE_RAW_LE, IMAGE_EXTENSIONS
+from SAYAC_Image import detectImageFormat, formatImage, parseImage, loadImage
+
+WORDS = SAYAC_Inst2Bin.encodeWords(SAYAC_Fuzz.randomProgram(1, 200)).tolist()
+
+
+@pytest.mark.parametrize("imageFormat", IMAGE_FORMATS)
+def test_round_trip(imageFormat):
+    assert parseImage(formatImage(WORDS, imageFormat), imageFormat) == WORDS
+
+
+@pytest.mark.parametrize("imageFormat", [imageFormat for imageFormat in SAYAC_Fuzz.DETECTED_FORMATS])
+def test_detected_round_trip(imageFormat):
+    assert parseImage(formatImage(WORDS, imageFormat), IMAGE_AUTO) == WORDS
+
+
+def test_readmemh_with_comments_and_addresses():
+    image = b"// program\n@0\n2043 // first\n1234\n@4\nffff\n"
+    assert detectImageFormat(image) == IMAGE_READMEMH
+    assert parseImage(image) == [0x2043, 0x1234, 0, 0, 0xFFFF]
+
+
+def test_readmemb_with_comments():
+    image = b"// program\n0010000001000011\n@2\n0000000000000001\n"
+    assert detectImageFormat(image) == IMAGE_READMEMB
+    assert parseImage(image) == [0x2043, 0, 1]
+
+
+def test_raw_image_is_not_text():
+    assert detectImageFormat(formatImage([0x2043, 0xFFFF], IMAGE_RAW_LE)) == IMAGE_RAW_LE
+
+
+@pytest.mark.parametrize("imageFormat", [IMAGE_READMEMH, IMAGE_READMEMB])
+def test_readmem_extension(tmp_path, imageFormat):
+    # "0011" is a valid $readmemb and $readmemh word, the extension decides
+    fileName = tmp_path / f"image{IMAGE_EXTENSIONS[imageFormat]}"
+    fileName.write_bytes(b"0011\n0101\n")
+    base = 16 if imageFormat == IMAGE_READMEMH else 2
+    assert loadImage(str(fileName)) == [int("0011", base), int("0101", base)]
@@ -0,0 +1,28 @@
+import pytest
+
+from SAYAC_ISA import AssemblySyntaxError, parseInstructionTokens
+
+
+@pytest.mark.parametrize("tokens, operands", [
+    (["MSI", "r1", "127"], (1, 127)),
+    (["MSI", "r1", "-128"], (1, -128)),
+    (["MSI", "r1", "0xC8"], (1, -56)),
+    (["MSI", "r1", "0b11111111"], (1, -1)),
+    (["JMI", "r1", "-32"], (1, -32)),
+    (["JMI", "r1", "0x28"], (1, -24)),
+])
+def test_signed_operands(tokens, operands):
+    assert parseInstructionTokens(tokens, 1)[1] == operands
+
+
+@pytest.mark.parametrize("tokens", [
+    ["MSI", "r1", "200"],
+    ["MSI", "r1", "128"],
+    ["MSI", "r1", "-129"],
+    ["MSI", "r1", "0x100"],
+    ["JMI", "r1", "40"],
+    ["CMI", "16", "r1"],
+])
+def test_signed_operand_out_of_range(tokens):
+    with pytest.raises(AssemblySyntaxError):
+        parseInstructionTokens(tokens, 1)
@@ -0,0 +1,37 @@
+import pytest
+
+import SAYAC_Fuzz
+from SAYAC_Assembler import Sayac, bindProgram, runProgram
+from SAYAC_JIT import BlockJIT
+
+
+@pytest.mark.parametrize("hotThreshold", [1, 8])
+def test_loop_matches_interpreter(decode, loopLines, hotThreshold):
+    program = decode(loopLines)
+    expected = Sayac()
+    runProgram(expected, bindProgram(program, expected))
+    actual = Sayac()
+    BlockJIT(program, hotThreshold).run(actual, bindProgram(program, actual))
+    assert actual.state() == expected.state()
+
+
+@pytest.mark.parametrize("maxSteps", [0, 1, 7, 50, 301])
+def test_run_stops_after_max_steps(decode, loopLines, maxSteps):
+    program = decode(loopLines)
+    sayac = Sayac()
+    assert BlockJIT(program, hotThreshold=1).run(sayac, bindProgram(program, sayac), maxSteps) == maxSteps
+    assert SAYAC_Fuzz.machineState(sayac, False) == SAYAC_Fuzz.execute(program, maxSteps)
+
+
+def test_division_by_zero_stops_at_the_instruction(decode):
+    program = decode(["MSI r1 5", "MSI r2 0", "DIV r3 r1 r2", "MSI r4 9"])
+    expected = SAYAC_Fuzz.execute(program, 100)
+    assert expected["failed"]
+    assert SAYAC_Fuzz.executeJIT(program, 100) == expected
+
+
+@pytest.mark.parametrize("seed", range(0, 200))
+def test_random_programs_match_interpreter(decode, seed):
+    program = decode(SAYAC_Fuzz.randomProgram(seed))
+    expected = SAYAC_Fuzz.execute(program, SAYAC_Fuzz.DEFAULT_STEPS)
+    assert SAYAC_Fuzz.executeJIT(program, SAYAC_Fuzz.DEFAULT_STEPS) == expected
@@ -0,0 +1,83 @@
+import pytest
+
+import SAYAC_API
+import SAYAC_Inst2Bin
+
+FILLER = "ADI r2 1"  # skipped by a taken jump, r2 stays 2
+
+
+def run(source: str):
+    return SAYAC_API.simulate(source, maxSteps=10000)["registers"]
+
+
+# (jump, instructions jumped over, words of the relaxed jump)
+FORWARD_JUMPS = [
+    ("JMI r1 target", 3, 1),
+    ("JMI r1 target", 30, 1),  # offset 31, the last one of 6 bits
+    ("JMI r1 target", 31, 2),
+    ("JMI r1 target", 126, 2),  # offset 127 from the JMRs
+    ("JMI r1 target", 127, 3),
+    ("JMI r1 target", 300, 3),
+    ("BRR 5 r4 target", 3, 2),
+    ("BRR 5 r4 target", 126, 2),  # offset 127 from the BRR
+    ("BRR 5 r4 target", 127, 3),
+    ("BRR 5 r4 target", 300, 3),
+    ("BRC 5 r4 target", 3, 2),
+    ("BRC 5 r4 target", 125, 2),  # address 127
+    ("BRC 5 r4 target", 126, 3),
+    ("BRC 5 r4 target", 300, 3),
+]
+
+
+@pytest.mark.parametrize("jump, distance, size", FORWARD_JUMPS)
+def test_forward_jump_lands_on_label(jump, distance, size):
+    # the flags start as "not equal", so fib 5 always branches
+    lines = [jump] + [FILLER] * distance + ["target: MSI r3 7"]
+    words = SAYAC_Inst2Bin.encodeWords(lines)
+    assert len(words) == size + distance + 1
+    registers = run("\n".join(lines))
+    assert registers[3] == 7
+    assert registers[2] == 2
+
+
+@pytest.mark.parametrize("distance", [3, 100, 300])
+def test_backward_branch_loops(distance):
+    lines = ["MSI r5 3", "loop: ADI r6 1"] + ["ADI r7 0"] * distance + ["ADI r5 -1", "CMI 0 r5", "BRR 5 r4 loop"]
+    registers = run("\n".join(lines))
+    assert registers[5] == 0
+    assert registers[6] == 6 + 3
+
+
+def test_jump_into_grown_jump():
+    # relaxing the second jump moves the label of the first one
+    lines = ["JMI r1 far", "near: MSI r3 7", "JMI r8 end"] + [FILLER] * 40 + ["far: JMI r9 near", "end: MSI r10 1"]
+    registers = run("\n".join(lines))
+    assert registers[3] == 7
+    assert registers[2] == 2
+    assert registers[10] == 1
+
+
+def test_ldi_label_value():
+    lines = ["LDI r3 target"] + [FILLER] * 200 + ["target: MSI r4 1"]
+    words = SAYAC_Inst2Bin.encodeWords(lines)
+    assert len(words) == 2 + 200 + 1
+    assert run("\n".join(lines))[3] == 2 + 200
+
+
+@pytest.mark.parametrize("offset, size", [(4, 2), (127, 2), (128, 3)])
+def test_brr_number_is_an_offset(offset, size):
+    # the offset counts from the BRR, the second word of "LDI r4 <offset>; BRR 5 r4" when it fits in a byte
+    lines = ["label: MSI r1 0", f"BRR 5 r4 {offset}"] + [FILLER] * 200 + ["MSI r3 7"]
+    words = SAYAC_Inst2Bin.encodeWords(lines)
+    assert len(words) == 1 + size + 200 + 1
+    registers = run("\n".join(lines))
+    assert registers[2] == 2 + 200 - (offset - 1)
+
+
+@pytest.mark.parametrize("distance, value", [(123, 127), (124, 129)])
+def test_labels_after_streamed_statements(distance, value):
+    # the statements before the first label go straight through, the addresses after them count their words
+    lines = ["LDI r1 300", "MSI r9 0", "LDI r3 target"] + [FILLER] * distance + ["target: MSI r4 1"]
+    words = SAYAC_Inst2Bin.encodeWords(lines)
+    assert len(words) == value + 1
+    assert run("\n".join(lines))[3] == value
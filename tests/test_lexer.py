@@ -0,0 +1,45 @@
+import pytest
+
+from SAYAC_ISA import AssemblySyntaxError, commentRemover, lexLines
+
+
+def lex(text: str):
+    return list(lexLines(text.splitlines()))
+
+
+@pytest.mark.parametrize("text, statements", [
+    ("MSI r1 5\n\n  ADD r2 r1 r1  \n", [(1, ["MSI", "r1", "5"]), (3, ["ADD", "r2", "r1", "r1"])]),
+    ("MSI r1 5 // five\n// all comment\n", [(1, ["MSI", "r1", "5"])]),
+    ("MSI r1 5; MSI r2 6;\n", [(1, ["MSI", "r1", "5"]), (1, ["MSI", "r2", "6"])]),
+    ("MSI/* a */r1 5\n", [(1, ["MSI", "r1", "5"])]),  # a comment counts as a space
+    ("MSI r1 5 /* one\ntwo\nthree */ MSI r2 6\n", [(1, ["MSI", "r1", "5"]), (3, ["MSI", "r2", "6"])]),
+    ("/* // */ MSI r1 5\n", [(1, ["MSI", "r1", "5"])]),
+    ("// /* not opened\nMSI r1 5\n", [(2, ["MSI", "r1", "5"])]),
+    ("MSI r1 5 /* a */ ; /* b */ MSI r2 6\n", [(1, ["MSI", "r1", "5"]), (1, ["MSI", "r2", "6"])]),
+])
+def test_statements_and_lines(text, statements):
+    assert lex(text) == statements
+
+
+def test_unclosed_comment():
+    with pytest.raises(AssemblySyntaxError) as error:
+        lex("MSI r1 5\n/* open\nMSI r2 6\n")
+    assert "line 2" in error.value.message
+
+
+def test_streams_lines():
+    # the lexer reads a line only when the statement before it is taken
+    read = []
+
+    def lines():
+        for text in ["MSI r1 5", "MSI r2 6", "MSI r3 7"]:
+            read.append(text)
+            yield text
+
+    statements = lexLines(lines())
+    assert next(statements) == (1, ["MSI", "r1", "5"])
+    assert read == ["MSI r1 5"]
+
+
+def test_comment_remover():
+    assert commentRemover(["MSI r1 5 // x", "/* y */", "ADD  r2 r1 r1"]) == ["MSI r1 5", "ADD r2 r1 r1"]
@@ -0,0 +1,105 @@
+import pytest
+
+from SAYAC_Assembler import Sayac, bindProgram
+from SAYAC_Peripherals import IOBus, Console, Gpio, Timer, Uart, parseDevice, NO_DATA
+
+
+def runWithBus(decode, lines: list, devices: list):
+    # --> (machine, bus) after the program ran with the devices attached
+    sayac = Sayac()
+    bus = IOBus(devices)
+    bus.attach(sayac)
+    bus.run(sayac, bindProgram(decode(lines), sayac))
+    bus.close()
+    return sayac, bus
+
+
+def test_console(decode, tmp_path):
+    output = tmp_path / "console.txt"
+    lines = ["MSI r1 0x10", "MSI r2 -5", "STRio r1 r2", "ADI r1 1", "STRio r1 r2", "ADI r1 1", "MSI r3 65",
+             "STRio r1 r3"]
+    runWithBus(decode, lines, [Console(0x10, str(output))])
+    assert output.read_text() == "65531\n-5\nA"
+
+
+def test_writes_are_kept_in_the_io_memory(decode, tmp_path):
+    sayac, bus = runWithBus(decode, ["MSI r1 0x10", "STRio r1 r5", "LDRio r6 r1"],
+                            [Console(0x10, str(tmp_path / "console.txt"))])
+    assert sayac.memoryIO.words[0x10] == 5
+    # the console reads as 0
+    assert sayac.registers[6] == 0
+
+
+def test_uart(decode, tmp_path):
+    (tmp_path / "in.bin").write_bytes(b"hi")
+    lines = ["MSI r1 0x20", "MSI r2 0x21", "LDRio r3 r1", "LDRio r4 r1", "LDRio r5 r1", "LDRio r6 r2",
+             "STRio r1 r3", "STRio r1 r4"]
+    uart = Uart(0x20, str(tmp_path / "in.bin"), str(tmp_path / "out.bin"))
+    sayac, bus = runWithBus(decode, lines, [uart])
+    assert list(sayac.registers[3:7]) == [ord("h"), ord("i"), NO_DATA, 2]
+    assert (tmp_path / "out.bin").read_bytes() == b"hi"
+    assert uart.sent == 2
+
+
+def test_timer_expires_on_the_cycle_count(decode):
+    # period 4, enabled by the instruction at cycle 5, then 20 more instructions
+    lines = ["MSI r1 0x31", "MSI r2 4", "STRio r1 r2", "MSI r1 0x32", "MSI r2 1", "STRio r1 r2"] + ["MSI r9 0"] * 20
+    lines += ["MSI r1 0x34", "LDRio r3 r1", "MSI r1 0x33", "LDRio r4 r1", "MSI r1 0x30", "LDRio r5 r1"]
+    timer = Timer(0x30)
+    sayac, bus = runWithBus(decode, lines, [timer])
+    # expiries at cycles 9, 13, ..., 25 before the EXPIRIES read at cycle 27, one more at 29
+    assert sayac.registers[3] == 5
+    assert sayac.registers[4] == 1
+    assert sayac.registers[5] == bus.cycle - 1
+    assert timer.expiries == 6
+
+
+def test_timer_prescale_and_reconfiguration():
+    bus = IOBus()
+    timer = Timer(0, prescale=2)
+    bus.add(timer)
+    timer.write(1, 3)
+    timer.write(2, 1)
+    for _ in range(0, 6):
+        bus.step()
+    assert timer.expiries == 1
+    # a new period drops the expiry scheduled by the old one
+    timer.write(1, 10)
+    for _ in range(0, 19):
+        bus.step()
+    assert timer.expiries == 1
+    bus.step()
+    assert timer.expiries == 2
+    assert timer.read(0) == 13
+    timer.write(3, 1)
+    assert timer.read(3) == 0
+
+
+def test_gpio(decode, tmp_path):
+    (tmp_path / "in.txt").write_text("0 7\n3 0x20\n")
+    lines = ["MSI r1 0x41", "LDRio r2 r1", "LDRio r3 r1", "LDRio r4 r1", "MSI r1 0x40", "STRio r1 r4",
+             "STRio r1 r4", "STRio r1 r1"]
+    gpio = Gpio(0x40, str(tmp_path / "in.txt"), str(tmp_path / "out.txt"))
+    sayac, bus = runWithBus(decode, lines, [gpio])
+    assert list(sayac.registers[2:5]) == [7, 7, 0x20]
+    # writing the same value again is not a change
+    assert gpio.changes == [(5, 0x20), (7, 0x40)]
+    assert (tmp_path / "out.txt").read_text() == "5 32\n7 64\n"
+
+
+def test_overlapping_devices(tmp_path):
+    with pytest.raises(ValueError):
+        IOBus([Timer(0x10), Console(0x14, str(tmp_path / "console.txt"))])
+
+
+@pytest.mark.parametrize("spec, kind, base", [("timer@0x10", Timer, 0x10), ("timer@16:prescale=8", Timer, 0x10),
+                                              ("console@0b11", Console, 3)])
+def test_parse_device(spec, kind, base):
+    device = parseDevice(spec)
+    assert (type(device), device.base) == (kind, base)
+
+
+@pytest.mark.parametrize("spec", ["timer", "disk@0x10", "timer@0x10:speed=2", "timer@0x10:in=x.txt"])
+def test_invalid_device(spec):
+    with pytest.raises(ValueError):
+        parseDevice(spec)
@@ -0,0 +1,113 @@
+import os
+
+import pytest
+
+import SAYAC_Preprocessor
+from SAYAC_ISA import AssemblySyntaxError, lexLines
+from SAYAC_Preprocessor import includeFile, includesCurrent, preprocess
+
+
+def expand(text: str, directory: str = ".", **kwargs):
+    return list(preprocess(lexLines(text.splitlines()), directory, **kwargs))
+
+
+def test_macro():
+    statements = expand(".macro twice reg value\nMSI reg value\nADD reg reg reg\n.endm\nMSI r1 1\ntwice r2 5")
+    assert statements == [(5, ["MSI", "r1", "1"]), (6, ["MSI", "r2", "5"]), (6, ["ADD", "r2", "r2", "r2"])]
+
+
+def test_unique_labels_and_labels_before_a_use():
+    statements = expand(".macro wait\nw\\@: JMI r0 w\\@\n.endm\nstart: WAIT\nwait")
+    first, second = statements[0][1], statements[1][1]
+    assert first[0] == "start:" and first[1].startswith("w.")
+    assert first[1] != second[0]
+    assert first[4] == first[1][:-1]
+
+
+def test_nested_macros():
+    statements = expand(".macro one r\nMSI r 1\n.endm\n.macro two r\none r\none r\n.endm\ntwo r4")
+    assert statements == [(8, ["MSI", "r4", "1"])] * 2
+
+
+@pytest.mark.parametrize("text", [
+    ".macro loop\nloop\n.endm\nloop",  # recursive
+    ".macro m a\nMSI a 1\n.endm\nm",  # missing argument
+    ".macro m\n.macro n\n.endm\n.endm",
+    ".endm",
+    ".macro\n.endm",
+    ".macro add\n.endm",  # an instruction
+    ".macro m\nMSI r1 1",  # no .endm
+])
+def test_macro_errors(text):
+    with pytest.raises(AssemblySyntaxError):
+        expand(text)
+
+
+def test_expansion_limit(monkeypatch):
+    monkeypatch.setattr(SAYAC_Preprocessor, "MACRO_EXPANSION_LIMIT", 100)
+    text = ".macro a\nMSI r1 1\nMSI r1 1\n.endm\n.macro b\na\na\na\na\n.endm\n"
+    assert len(expand(text + "b\n" * 5)) == 40
+    with pytest.raises(AssemblySyntaxError):
+        expand(text + "b\n" * 30)
+
+
+def test_streams_statements():
+    # the statements are read one at a time, so nothing is kept of a source without directives
+    read = []
+
+    def statements():
+        for line in range(1, 4):
+            read.append(line)
+            yield line, ["MSI", "r1", str(line)]
+
+    expanded = preprocess(statements())
+    assert next(expanded) == (1, ["MSI", "r1", "1"])
+    assert read == [1]
+
+
+def test_include(tmp_path):
+    (tmp_path / "lib").mkdir()
+    (tmp_path / "lib" / "flags.inc").write_text('.macro one r\nMSI r 1\n.endm\nMSI r3 3\n.include "more.inc"\n')
+    (tmp_path / "lib" / "more.inc").write_text("MSI r4 4\n")
+    includes = []
+    statements = expand('MSI r1 1\n.include "lib/flags.inc"\none r2', str(tmp_path), includes=includes)
+    assert statements == [(1, ["MSI", "r1", "1"]), (2, ["MSI", "r3", "3"]), (2, ["MSI", "r4", "4"]),
+                          (3, ["MSI", "r2", "1"])]
+    assert sorted(os.path.basename(path) for path, mtime in includes) == ["flags.inc", "more.inc"]
+
+
+def test_include_cache(tmp_path):
+    lib = tmp_path / "lib.inc"
+    lib.write_text("MSI r3 3\n")
+    statements, macros = includeFile(str(lib), 1, ())
+    # not lexed again while it has not changed
+    assert includeFile(str(lib), 1, ())[0] is statements
+    lib.write_text("MSI r3 4\n")
+    os.utime(lib, ns=(0, 0))
+    assert includeFile(str(lib), 1, ())[0] == [(1, ["MSI", "r3", "4"])]
+
+
+def test_include_errors(tmp_path):
+    (tmp_path / "a.inc").write_text('.include "b.inc"\n')
+    (tmp_path / "b.inc").write_text('.include "a.inc"\n')
+    (tmp_path / "bad.inc").write_text("MSI r1 1\n.endm\n")
+    with pytest.raises(AssemblySyntaxError) as error:
+        expand('.include "a.inc"', str(tmp_path))
+    assert "Circular" in error.value.message
+    with pytest.raises(AssemblySyntaxError) as error:
+        expand('MSI r1 1\n.include "bad.inc"', str(tmp_path))
+    assert error.value.line == 2
+    with pytest.raises(AssemblySyntaxError):
+        expand('.include "a.inc"', None)
+    with pytest.raises(AssemblySyntaxError):
+        expand('.include "../a.inc"', str(tmp_path / "sub"), root=str(tmp_path / "sub"))
+
+
+def test_missing_include_is_watched(tmp_path):
+    includes = []
+    with pytest.raises(AssemblySyntaxError):
+        expand('.include "lib.inc"', str(tmp_path), includes=includes)
+    assert includes == [(os.path.realpath(tmp_path / "lib.inc"), None)]
+    assert includesCurrent(includes)
+    (tmp_path / "lib.inc").write_text("MSI r1 1\n")
+    assert not includesCurrent(includes)
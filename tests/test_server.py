@@ -0,0 +1,84 @@
+import io
+import json
+import socket
+import threading
+
+import pytest
+
+import SAYAC_Server
+
+
+@pytest.fixture
+def server(tmp_path):
+    # a server on a socket in tmp_path, serving in a thread
+    sayac = SAYAC_Server.SayacServer(jobs=1, timeout=5.0)
+    address = str(tmp_path / "sayac.sock")
+    sayac.listen(address)
+    thread = threading.Thread(target=sayac.server.serve_forever)
+    thread.start()
+    yield address
+    sayac.server.shutdown()
+    thread.join()
+    sayac.close()
+
+
+def exchange(address, data: bytes):
+    # --> the response line to data
+    sock = SAYAC_Server.connect(address)
+    try:
+        sock.sendall(data)
+        return json.loads(sock.makefile("rb").readline())
+    finally:
+        sock.close()
+
+
+@pytest.mark.parametrize("jsonLine", [True, False])
+def test_message_round_trip(jsonLine):
+    stream = io.BytesIO()
+    message = {"id": 7, "op": "assemble", "source": "MSI r1 5"}
+    SAYAC_Server.writeMessage(stream, message, jsonLine)
+    SAYAC_Server.writeMessage(stream, {"id": 8}, jsonLine)
+    stream.seek(0)
+    assert SAYAC_Server.readMessage(stream) == (message, jsonLine)
+    assert SAYAC_Server.readMessage(stream) == ({"id": 8}, jsonLine)
+    assert SAYAC_Server.readMessage(stream) == (None, False)
+
+
+@pytest.mark.parametrize("line", [b"[1, 2]\n", b" {}\n", b"5\n"])
+def test_json_lines_of_any_type(line):
+    assert SAYAC_Server.readMessage(io.BytesIO(line)) == (json.loads(line), True)
+
+
+def test_simulate_job(server):
+    job = {"id": 3, "op": "simulate", "source": "MSI r1 5\nADD r2 r1 r1"}
+    response = exchange(server, json.dumps(job).encode() + b"\n")
+    assert response["id"] == 3
+    assert response["ok"]
+    assert response["result"]["state"]["registers"][2] == 10
+
+
+def test_assembly_error(server):
+    response = exchange(server, b'{"op": "assemble", "source": "MSI r1 5\\nFOO r1"}\n')
+    assert not response["ok"]
+    assert response["error"]["line"] == 2
+
+
+def test_job_must_be_an_object(server):
+    response = exchange(server, b"[1, 2]\n")
+    assert response["error"]["message"] == "a job must be a JSON object"
+
+
+def test_listen_refuses_a_live_socket(server):
+    with pytest.raises(OSError):
+        SAYAC_Server.SayacServer(jobs=1).listen(server)
+    assert exchange(server, b'{"op": "assemble", "source": "MSI r1 5"}\n')["ok"]
+
+
+def test_listen_replaces_a_stale_socket(tmp_path):
+    address = str(tmp_path / "sayac.sock")
+    stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    stale.bind(address)
+    stale.close()
+    sayac = SAYAC_Server.SayacServer(jobs=1)
+    sayac.listen(address)
+    sayac.close()
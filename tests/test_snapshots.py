@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import SAYAC_Assembler
+from SAYAC_Assembler import Sayac, parseSnapshotMode
+
+# registers start as 0..15 and the flags as "not equal"
+PROGRAM = [
+    "MSI r1 1",  # no change
+    "MSI r1 7",
+    "STR r1 r1",
+    "CMR r1 r1",
+    "CMR r1 r1",  # no change
+]
+
+
+@pytest.fixture
+def run(tmp_path, monkeypatch):
+    # --> function that assembles and runs the lines, --> (final state, states written during the run)
+    monkeypatch.setattr("builtins.input", lambda: "")
+    writes = []
+    createFile = Sayac.createAssemblerOutJsonFile
+
+    def record(sayac, name, pc=None):
+        writes.append(sayac.state(pc))
+        createFile(sayac, name, pc)
+
+    monkeypatch.setattr(Sayac, "createAssemblerOutJsonFile", record)
+
+    def run(lines: list, snapshotMode: str = "end", deltaLog: bool = False):
+        source = tmp_path / "prog.txt"
+        source.write_text("\n".join(lines) + "\n")
+        deltaLogFileName = str(tmp_path / "prog.delta.jsonl") if deltaLog else None
+        SAYAC_Assembler.assemble(str(source), False, snapshotMode, deltaLogFileName)
+        state = json.loads((tmp_path / "prog.sayac.json").read_text())
+        return state, writes[:-1]
+
+    return run
+
+
+def test_end_writes_the_final_state_once(run):
+    state, writes = run(PROGRAM)
+    assert writes == []
+    assert state["PC"] == len(PROGRAM) - 1
+    assert state["registers"][1] == 7
+    assert state["memory"] == {"7": 7}
+
+
+def test_every(run):
+    state, writes = run(["ADI r1 1"] * 10, "every:3")
+    assert [write["registers"][1] for write in writes] == [4, 7, 10]
+    assert state["registers"][1] == 11
+
+
+def test_on_change(run):
+    state, writes = run(PROGRAM, "on-change")
+    assert [write["PC"] for write in writes] == [1, 2, 3]
+
+
+def test_on_change_matches_end(run):
+    assert run(PROGRAM, "on-change")[0] == run(PROGRAM)[0]
+
+
+def test_delta_log(run, tmp_path):
+    run(PROGRAM, deltaLog=True)
+    deltas = [json.loads(line) for line in (tmp_path / "prog.delta.jsonl").read_text().splitlines()]
+    assert deltas[0] == {"step": 1, "PC": 0}
+    assert deltas[1] == {"step": 2, "PC": 1, "registers": {"1": 7}}
+    assert deltas[2] == {"step": 3, "PC": 2, "memory": {"7": 7}}
+    assert deltas[3]["flags"]["eq"] is True
+    assert deltas[4] == {"step": 5, "PC": 4}
+
+
+@pytest.mark.parametrize("mode, parsed", [("end", ("end", 0)), ("every:0x10", ("every", 16)),
+                                          ("on-halt", ("on-halt", 0)), ("on-change", ("on-change", 0))])
+def test_parse_snapshot_mode(mode, parsed):
+    assert parseSnapshotMode(mode) == parsed
+
+
+@pytest.mark.parametrize("mode", ["every", "every:0", "every:x", "never"])
+def test_invalid_snapshot_mode(mode):
+    with pytest.raises(ValueError):
+        parseSnapshotMode(mode)
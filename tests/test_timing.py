@@ -0,0 +1,82 @@
+import json
+
+import pytest
+
+from SAYAC_Assembler import Sayac, bindProgram, runProgram
+from SAYAC_Timing import Cache, TimingModel, loadTimingModel, timingModelOf
+
+
+def timedRun(program: list, model: TimingModel, stepped: bool = False):
+    # --> machine after the program ran with the model, through run() or step() after every instruction
+    sayac = Sayac()
+    bound = bindProgram(program, sayac)
+    model.attach(sayac, program)
+    if stepped:
+        while 0 <= sayac.PC < len(bound):
+            pc = sayac.PC
+            bound[pc]()
+            sayac.PC += 1
+            model.step(pc)
+    else:
+        model.run(sayac, bound)
+    return sayac
+
+
+def test_latencies_without_caches(decode):
+    program = decode(["MSI r1 5", "MUL r2 r1 r1", "STR r1 r2", "LDR r3 r1", "DIV r4 r2 r1"])
+    model = timingModelOf({"icache": None, "dcache": None, "latencies": {"MSI": 3}})
+    timedRun(program, model)
+    assert (model.cycles, model.instructions) == (3 + 4 + 2 + 2 + 16, 5)
+
+
+def test_model_does_not_change_the_machine(decode, loopLines):
+    program = decode(loopLines)
+    expected = Sayac()
+    runProgram(expected, bindProgram(program, expected))
+    assert timedRun(program, loadTimingModel()).state() == expected.state()
+
+
+@pytest.mark.parametrize("icache", [{}, {"size": 4, "associativity": 1, "line": 1}, {"size": 4, "line": 2},
+                                    {"size": 8, "associativity": 1, "line": 8}])
+def test_run_matches_step(decode, loopLines, icache):
+    # run() skips the lookup of a fetch from the line of the previous fetch
+    program = decode(loopLines)
+    stepped = timingModelOf({"icache": icache, "dcache": {"size": 16}})
+    timedRun(program, stepped, True)
+    model = timingModelOf({"icache": icache, "dcache": {"size": 16}})
+    timedRun(program, model)
+    assert model.report() == stepped.report()
+
+
+def test_cache_lru():
+    # one set of two ways with two-word lines
+    cache = Cache(4, 2, 2, 10)
+    # line 0 was used after line 1, so line 2 replaces line 1
+    assert [cache.access(address) for address in (0, 1, 2, 0, 4, 0, 2)] == [10, 0, 10, 0, 10, 0, 10]
+    assert (cache.hits, cache.misses) == (3, 4)
+
+
+@pytest.mark.parametrize("size, associativity, lineSize", [(256, 2, 3), (256, 2, 0), (6, 2, 4), (256, 0, 4)])
+def test_invalid_cache(size, associativity, lineSize):
+    with pytest.raises(ValueError):
+        Cache(size, associativity, lineSize, 10)
+
+
+@pytest.mark.parametrize("config", [{"cache": {}}, {"icache": {"ways": 2}}, {"latencies": {"FOO": 1}}])
+def test_invalid_config(config):
+    with pytest.raises(ValueError):
+        timingModelOf(config)
+
+
+def test_config_file(tmp_path, decode, loopLines):
+    config = tmp_path / "timing.json"
+    config.write_text(json.dumps({"dcache": None, "icache": {"size": 8, "associativity": 1, "line": 2}}))
+    model = loadTimingModel(str(config))
+    timedRun(decode(loopLines), model)
+    report = model.report()
+    assert report["dcache"] is None
+    assert report["icache"]["size"] == 8 and report["icache"]["miss"] == 10
+    assert report["icache"]["hits"] + report["icache"]["misses"] == report["instructions"]
+    config.write_text("[]")
+    with pytest.raises(ValueError):
+        loadTimingModel(str(config))
@@ -0,0 +1,98 @@
+import gzip
+
+import pytest
+
+import SAYAC_Trace
+from SAYAC_Assembler import Sayac, bindProgram
+from SAYAC_Trace import TraceWriter, diffTraces, dumpTrace, formatRecord, readTrace, NO_REGISTER, MEMORY_DATA
+
+
+def writeTrace(decode, lines: list, fileName: str, stepped: bool = False):
+    # --> record fields of the run of the lines, written to fileName through run() or step()
+    program = decode(lines)
+    sayac = Sayac()
+    bound = bindProgram(program, sayac)
+    trace = TraceWriter(fileName)
+    trace.attach(sayac, program)
+    if stepped:
+        while 0 <= sayac.PC < len(bound):
+            pc = sayac.PC
+            bound[pc]()
+            sayac.PC += 1
+            trace.step(pc)
+    else:
+        trace.run(sayac, bound)
+    trace.close()
+    return list(readTrace(fileName))
+
+
+def test_records(decode, tmp_path):
+    records = writeTrace(decode, ["MSI r1 7", "STR r1 r1", "CMR r1 r1"], str(tmp_path / "prog.trace"))
+    pc, word, flags, register, registerValue, memory, address, value = records[0]
+    assert (pc, register, registerValue, memory) == (0, 1, 7, 0)
+    # STR has an rd operand it does not write
+    assert records[1][3:] == (NO_REGISTER, 0, MEMORY_DATA, 7, 7)
+    assert records[2][2] != records[1][2]
+
+
+def test_run_matches_step(decode, loopLines, tmp_path, monkeypatch):
+    # a small buffer flushes in the middle of the run
+    monkeypatch.setattr(SAYAC_Trace, "TRACE_BUFFER_RECORDS", 7)
+    expected = writeTrace(decode, loopLines, str(tmp_path / "step.trace"), True)
+    assert writeTrace(decode, loopLines, str(tmp_path / "run.trace")) == expected
+    assert len(expected) == 2 + 100 * (len(decode(loopLines)) - 2)
+
+
+def test_compressed_and_text_forms(decode, loopLines, tmp_path):
+    records = writeTrace(decode, loopLines, str(tmp_path / "prog.trace"))
+    assert writeTrace(decode, loopLines, str(tmp_path / "prog.trace.gz")) == records
+    with gzip.open(tmp_path / "prog.trace.gz", "rb") as f:
+        assert f.read(8) == SAYAC_Trace.TRACE_MAGIC
+    dumpTrace(str(tmp_path / "prog.trace"), str(tmp_path / "prog.txt"))
+    assert list(readTrace(str(tmp_path / "prog.txt"))) == records
+    assert diffTraces(str(tmp_path / "prog.trace.gz"), str(tmp_path / "prog.txt")) is None
+
+
+def test_text_with_comments_and_spacing(tmp_path):
+    log = tmp_path / "rtl.log"
+    log.write_text("// reset\n0000 5021 05 02 0001 00 0000 0000\n\n# next\n1 2 3 4 5 6 7 8\n")
+    assert list(readTrace(str(log))) == [(0, 0x5021, 5, 2, 1, 0, 0, 0), (1, 2, 3, 4, 5, 6, 7, 8)]
+    assert formatRecord((1, 2, 3, 4, 5, 6, 7, 8)) == "0001 0002 03 04 0005 06 0007 0008"
+
+
+@pytest.mark.parametrize("text", ["0000 5021 05 02 0001 00 0000\n", "0000 5021 05 02 0001 00 0000 10000\n",
+                                  "0000 5021 05 02 0001 00 0000 zzzz\n"])
+def test_invalid_text(tmp_path, text):
+    log = tmp_path / "rtl.log"
+    log.write_text("1 2 3 4 5 6 7 8\n" + text)
+    with pytest.raises(ValueError) as error:
+        list(readTrace(str(log)))
+    assert "line 2" in str(error.value)
+
+
+def test_diff(decode, loopLines, tmp_path, monkeypatch):
+    # chunks of 3 records, the divergence is found across them
+    monkeypatch.setattr(SAYAC_Trace, "TRACE_CHUNK_RECORDS", 3)
+    expected = str(tmp_path / "expected.trace")
+    records = writeTrace(decode, loopLines, expected)
+    lines = [formatRecord(record) for record in records]
+    lines[40] = lines[40][:-1] + "f"
+    (tmp_path / "actual.txt").write_text("\n".join(lines) + "\n")
+    index, expectedRecord, actualRecord = diffTraces(expected, str(tmp_path / "actual.txt"))
+    assert (index, expectedRecord) == (40, records[40])
+    assert actualRecord[-1] == records[40][-1] | 0xF
+    # a shorter trace ends early
+    (tmp_path / "short.txt").write_text("\n".join(lines[:10]) + "\n")
+    assert diffTraces(expected, str(tmp_path / "short.txt")) == (10, records[10], None)
+
+
+def test_invalid_binary(decode, tmp_path):
+    fileName = tmp_path / "prog.trace"
+    writeTrace(decode, ["MSI r1 7"], str(fileName))
+    data = fileName.read_bytes()
+    fileName.write_bytes(data[:-1])
+    with pytest.raises(ValueError):
+        list(readTrace(str(fileName)))
+    fileName.write_bytes(data[:8] + b"\x00\x02" + data[10:])
+    with pytest.raises(ValueError):
+        list(readTrace(str(fileName)))
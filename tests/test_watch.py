@@ -0,0 +1,96 @@
+import os
+
+import pytest
+
+import SAYAC_Inst2Bin
+from SAYAC_Image import IMAGE_RAW_LE, loadImage
+
+
+def write(path, text: str, age: int = 0):
+    # the mtime is set explicitly, saves within one tick of the file system clock would look unchanged
+    path.write_text(text)
+    mtime = os.stat(path).st_mtime_ns + age * 1000000000
+    os.utime(path, ns=(mtime, mtime))
+
+
+def image(path):
+    return loadImage(SAYAC_Inst2Bin.binFileNameOf(str(path), IMAGE_RAW_LE), IMAGE_RAW_LE)
+
+
+def test_rewrites_changed_words(tmp_path, capsys):
+    source = tmp_path / "main.txt"
+    write(source, "MSI r1 1\nMSI r2 2\nMSI r3 3\n")
+    watched = SAYAC_Inst2Bin.WatchedSource(str(source), IMAGE_RAW_LE)
+    watched.poll()
+    assert "3 words, 3 written" in capsys.readouterr().out
+    write(source, "MSI r1 1\nMSI r2 5\nMSI r3 3\n", 1)
+    watched.poll()
+    assert "3 words, 1 written" in capsys.readouterr().out
+    assert image(source) == SAYAC_Inst2Bin.encodeWords(["MSI r1 1", "MSI r2 5", "MSI r3 3"]).tolist()
+
+
+def test_unchanged_file_is_not_rebuilt(tmp_path, capsys):
+    source = tmp_path / "main.txt"
+    write(source, "MSI r1 1\n")
+    watched = SAYAC_Inst2Bin.WatchedSource(str(source), IMAGE_RAW_LE)
+    watched.poll()
+    capsys.readouterr()
+    watched.poll()
+    write(source, "MSI r1 1\n", 1)  # saved again with the same content
+    watched.poll()
+    assert capsys.readouterr().out == ""
+
+
+def test_failed_build_watches_the_broken_include(tmp_path, capsys):
+    source = tmp_path / "main.txt"
+    library = tmp_path / "lib.txt"
+    write(library, "MSI r1 3\n.endm\n")
+    write(source, '.include "lib.txt"\nMSI r2 2\n')
+    watched = SAYAC_Inst2Bin.WatchedSource(str(source), IMAGE_RAW_LE)
+    watched.poll()
+    assert "Error" in capsys.readouterr().out
+    write(library, "MSI r1 3\n", 1)
+    watched.poll()
+    assert "2 words" in capsys.readouterr().out
+
+
+def test_failed_build_watches_the_missing_include(tmp_path, capsys):
+    source = tmp_path / "main.txt"
+    write(source, '.include "lib.txt"\nMSI r2 2\n')
+    watched = SAYAC_Inst2Bin.WatchedSource(str(source), IMAGE_RAW_LE)
+    watched.poll()
+    assert "not found" in capsys.readouterr().out
+    watched.poll()
+    assert capsys.readouterr().out == ""
+    write(tmp_path / "lib.txt", "MSI r1 3\n")
+    watched.poll()
+    assert "2 words" in capsys.readouterr().out
+
+
+def test_all_picks_up_new_files(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    write(tmp_path / "a.txt", "MSI r1 1\n")
+    checks = []
+
+    def sleep(interval):
+        checks.append(interval)
+        if len(checks) == 1:
+            write(tmp_path / "b.txt", "MSI r1 1\nMSI r2 2\n")
+        else:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(SAYAC_Inst2Bin.time, "sleep", sleep)
+    patterns = ["txt"]
+    SAYAC_Inst2Bin.watch(SAYAC_Inst2Bin.findSources(patterns), IMAGE_RAW_LE, patterns=patterns)
+    out = capsys.readouterr().out
+    assert "a.txt  1 words" in out
+    assert "b.txt  2 words" in out
+    assert image(tmp_path / "b.txt") == SAYAC_Inst2Bin.encodeWords(["MSI r1 1", "MSI r2 2"]).tolist()
+
+
+@pytest.mark.parametrize("content", [b"\xff\xfe", b"MSI r1 1\n/* open"])
+def test_bad_source_stops_only_this_file(tmp_path, capsys, content):
+    source = tmp_path / "main.txt"
+    source.write_bytes(content)
+    SAYAC_Inst2Bin.WatchedSource(str(source), IMAGE_RAW_LE).poll()
+    assert "Error" in capsys.readouterr().out